@@ -1,8 +1,14 @@
 import gurobipy as gp
 from gurobipy import GRB
 import math
+import os
+import sys
 
-class IB_DandJ:
+# NOTE: run as a script from its folder or loaded by ib_tools.models, the repository root gives ib_tools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from ib_tools.result import IB_Model, IB_Result
+
+class IB_DandJ(IB_Model):
 
   def __init__(self, key_size, round_Eb, round_Dis, round_Ef, setX, pgP) -> None:
     if key_size in [128,192]:
@@ -41,6 +47,13 @@ class IB_DandJ:
       cipher_name = 'DeoxysBC'
     self.name = './v3_' +  cipher_name + str(self.key_size) + '_' + str(self.round_Eb + self.round_Dis + self.round_Ef) + 'r'
     self.model = gp.Model(self.name)
+    self.profile = None # path of the JSON build report (see _profile)
+    self._block = None
+    self.export = None # e.g. ['.lp.gz', '.sol'], files written by ib_model() (see _export)
+    self._writer = None
+    self.stop_T4 = True # stop the objective Tc once Tc == T4 (see stop_at_T4)
+    self.handle = {} # constraints depending on x/pgP (set_x, set_pgP)
+    self.pin = None # (round, cells) of the contradiction, None: any cell of the distinguisher
 
   ''' 
   <=======================================================================================================>
@@ -53,7 +66,7 @@ class IB_DandJ:
   <=======================================================================================================>
   '''
 
-  def ib_model(self):
+  def ib_model(self, Tc_cutoff = None, start = None, solve = True):
     '''
     <------------------------------------------------------------------------------------
     ONE_(1-2). Differential propagation in (1).Eb(<-), (2).Eu(->):
@@ -64,6 +77,7 @@ class IB_DandJ:
       Eu: DWw[-1,](plaintext) ={ART(stk)}=> DXx ={SC}=> DYy ={SR}=> DZz ={MC}=> DWz[Eb,]
     ------------------------------------------------------------------------------------>
     '''
+    self._profile('ONE_(1-2). Differential propagation in (1).Eb(<-), (2).Eu(->)', section = True)
     end_round_u = self.round_Eb + self.round_Dis
     uDW  = self.model.addVars(range(-1, end_round_u),          16, vtype = GRB.BINARY, name = 'uDW')
     udw  = self.model.addVars(range(-1, end_round_u),          16, vtype = GRB.BINARY, name = 'udw')# DWw[-1,](plaintext)
@@ -79,6 +93,7 @@ class IB_DandJ:
     uTC  = self.model.addVars(end_round_u,                      4, vtype = GRB.BINARY, name = 'uTC') # Mark truncated in one column
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
     for i in range(16):
       for r in range(-1, end_round_u):
@@ -89,6 +104,7 @@ class IB_DandJ:
         self.model.addConstr(uDZ[r,i] >= udz[r,i], name = 'uBas')
         
     '''Operation: ATK'''
+    self._profile('Operation: ATK')
     for r in range(-1, end_round_u - 1):
       for i in range(16):
         self.model.addConstr(uDW[r,i] - udx[r+1,i] - ucan[r+1,i] >= 0, name = 'uATK')
@@ -98,6 +114,7 @@ class IB_DandJ:
         self.model.addConstr(udw[r,i] == udx[r+1,i], name = 'uATK')
 
     '''Operation: SC'''
+    self._profile('Operation: SC')
     # In Extension     [DX,dx] <= [DY,dy]: [1,1] <= [1,0]/[1,1], [0,0] <= [0,0]
     for r in range(0, self.round_Eb):
       for i in range(16):
@@ -110,6 +127,7 @@ class IB_DandJ:
         self.model.addConstr(udy[r,i] == uDX[r,i], name = 'uSC')
 
     '''Operation: SR''' 
+    self._profile('Operation: SR')
     # [DY,dy] <=> (DZ,dz)
     for r in range(self.round_Eb + self.round_Dis):
       for i in range(16):
@@ -117,6 +135,7 @@ class IB_DandJ:
         self.model.addConstr(udy[r,self.SRpermutation_rev[i]] == udz[r,i], name = 'uSR')
 
     '''Operation: MC'''
+    self._profile('Operation: MC')
     # In Extension: [DZ,dz] => [DW,dw]
     for r in range(self.round_Eb):
       for j in [0,4,8,12]:
@@ -173,6 +192,7 @@ class IB_DandJ:
       uType2:        Type2 cancellation
     -----------------------------------------------------------------------------
     '''
+    self._profile('TWO: Key schedule in Eb+Eu+Em (No direction)', section = True)
     uLANE   = self.model.addVars(16, vtype = GRB.BINARY, name = 'uLANE')
     uT2CanA = self.model.addVars(end_round_u, 4, lb = 0, vtype = GRB.INTEGER, name = 'uT2CanA')
     uT2CanB = self.model.addVars(end_round_u, 4, lb = 0, vtype = GRB.INTEGER, name = 'uT2CanB')
@@ -183,17 +203,20 @@ class IB_DandJ:
     self.model.addConstr(sum(uLANE[i] for i in range(16)) >= 1)
 
     ''' Mark LANE '''
+    self._profile('Mark LANE')
     for i in range(16):
       for r in range(end_round_u + 1):
         self.model.addConstr(uLANE[i] >= ustk[r, self.hTable[i][r]], name = 'uMLANE')
 
     ''' Type 1 cancellation '''
+    self._profile('Type 1 cancellation')
     for i in range(16):
       self.model.addConstr(uType1[i] == (end_round_u + 1) * uLANE[i] - 
                            sum(ustk[r,self.hTable[i][r]] for r in range(end_round_u + 1)), name = 'uType1')
       self.model.addConstr(uType1[i] <= self.s - 1, name = 'uType1') # Cancellation no more than 2/1 in each position (for Deoxys-BC-384/256)
         
     ''' Type 2 cancellation (In Eu and Em) '''
+    self._profile('Type 2 cancellation (In Eu and Em)')
     for r in range(end_round_u):
       for c in range(4):
         # uT2CanA: Active bytes in one column, before MC
@@ -213,6 +236,7 @@ class IB_DandJ:
         self.model.addConstr(uType2[r,c] >= 0, name = 'uType2')
 
     ''' Counting of all cancellations'''
+    self._profile('Counting of all cancellations')
     # NOTE: s*LANE[0~15] - 1 >= Type1Can * (LANE[0~15]-stk[0~r,0~15]) + Type2Can.
     self.model.addConstr(self.s * sum(uLANE[i] for i in range(16)) -  # s * LANE
                          sum(uType1[i] for i in range(16)) - 
@@ -229,6 +253,7 @@ class IB_DandJ:
         Filter tag: uFrSB, uFrMC
     -----------------------------------------------------------------------------------------------
     ''' 
+    self._profile('THREE: Guess-and-Determine (Eb)', section = True)
     uGstk = self.model.addVars(self.round_Eb,            16, vtype = GRB.BINARY, name = 'uGstk')
     uDetX = self.model.addVars(self.round_Eb,            16, vtype = GRB.BINARY, name = 'uDetX')
     uFrSB = self.model.addVars(self.round_Eb,            16, vtype = GRB.BINARY, name = 'uFrSB')
@@ -241,6 +266,7 @@ class IB_DandJ:
     uFrMC = self.model.addVars(self.round_Eb,            16, vtype = GRB.BINARY, name = 'uFrMC')
     
     ''' KR: Guess round key and determine '''
+    self._profile('KR: Guess round key and determine')
     # uDetW -(uGstk)-> uDetX
     for r in range(-1, self.round_Eb-1):
       for i in range(16): 
@@ -249,6 +275,7 @@ class IB_DandJ:
         self.model.addConstr(- uDetW[r,i] - uGstk[r+1,i] + uDetX[r+1,i] >= -1, name = 'bDet_ATK')
 
     ''' KR: Determine and Filter in SC '''
+    self._profile('KR: Determine and Filter in SC')
     for r in range(self.round_Eb):
       for i in range(16):
         # 'Det.' propagation via SC
@@ -259,11 +286,13 @@ class IB_DandJ:
         self.model.addConstr(- uDetY[r,i] - uDY[r,i] + udy[r,i] + uFrSB[r,i] >= -1, name = 'bFr_SC')
     
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(self.round_Eb):
       for i in range(16):
         self.model.addConstr(uDetZ[r,i] == uDetY[r,self.SRpermutation_rev[i]], name = 'bDet_SR')
 
     ''' KR: 'Det.' propagation in MC* '''
+    self._profile("KR: 'Det.' propagation in MC*")
     for r in range(self.round_Eb):
       for c in range(4):
         # 'Det.' propagation via MC
@@ -280,6 +309,7 @@ class IB_DandJ:
         self.model.addConstr(uDetC[r,c] == uDetW[r,4*c+3], name = 'bDet_MC')
 
     ''' KR: Determine whether the difference before MC is determinable '''
+    self._profile('KR: Determine whether the difference before MC is determinable')
     for r in range(self.round_Eb):
       for i in range(16):
         # NOTE: uDiffDetMC = uDetZ when uDZ = 1 (ACTIVE), else uDiffDetMC = 1
@@ -297,6 +327,7 @@ class IB_DandJ:
                              - uDiffDetC[r,c] <= 3, name = 'bDet_MC')
     
     ''' KR: Filter obtain from MC (for cell -> column) '''
+    self._profile('KR: Filter obtain from MC (for cell -> column)')
     for r in range(self.round_Eb):
       for c in range(4):
         for i in range(4):
@@ -322,6 +353,7 @@ class IB_DandJ:
       2. equivalent diff. pro. in ext.
     ------------------------------------------------------------------------------------>
     '''
+    self._profile('ONE_(1-2). Differential propagation in (4).El(<-), (5).Ef(->)', section = True)
     start_round_l = self.round_Eb
     end_round_l = start_round_l + self.round_Dis + self.round_Ef
 
@@ -340,8 +372,10 @@ class IB_DandJ:
     lTC  = self.model.addVars(range(start_round_l, end_round_l - 1),              4, vtype = GRB.BINARY, name = 'lTC') # counting all Truncated
 
     '''========================In distinguisher.(start_round_l, end_round_l - self.round_Ef + self.round_Em (ATK & SC))============================='''
+    self._profile('In distinguisher.(start_round_l, end_round_l - self.round_Ef + self.round_Em (ATK & SC))')
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
     for i in range(16):
       for r in range(start_round_l, end_round_l - self.round_Ef):
@@ -351,6 +385,7 @@ class IB_DandJ:
         self.model.addConstr(lDW[r,i] >= ldw[r,i], name='lBas')
 
     ''' Operation: ATK '''
+    self._profile('Operation: ATK')
     # In Distingusher: [DW,dw]r-1 <=(ustk, ucan)= [DX,dx]
     for r in range(start_round_l - 1, end_round_l - self.round_Ef):
       for i in range(16):
@@ -361,6 +396,7 @@ class IB_DandJ:
         self.model.addConstr(ldw[r,i] == ldx[r+1,i], name='lATK')
 
     ''' Operation: SC '''
+    self._profile('Operation: SC')
     # NOTE: The connecting operation of Ex. and Dis. is SC
     # In distinguisher [DX,dx] <= [DY,dy]
     for r in range(start_round_l, end_round_l - self.round_Ef): 
@@ -369,6 +405,7 @@ class IB_DandJ:
         self.model.addConstr(ldx[r,i] == lDY[r,i], name='lSC')
 
     ''' Operation: SR '''
+    self._profile('Operation: SR')
     # [DY,dy] <=> (DZ,dz)
     for r in range(start_round_l, end_round_l - self.round_Ef):
       for i in range(16):
@@ -376,6 +413,7 @@ class IB_DandJ:
         self.model.addConstr(ldy[r,self.SRpermutation_rev[i]] == ldz[r,i], name='lSC')
 
     ''' Operation: MC '''
+    self._profile('Operation: MC')
       # In Distinguisher [DZ,dz] => [DW,dw]
     for r in range(start_round_l, end_round_l - self.round_Ef):
       for j in [0,4,8,12]:
@@ -407,6 +445,7 @@ class IB_DandJ:
       PART 2: differentail propagation in extension (eqX -(SC)-> eqY -(ART)-> eqZ -(SR)-> eqW -(MC)-> eqX_r+1)
     ==========================================================================================================
     ''' 
+    self._profile('2 parts for equivalent stk', section = True)
     leqDW  = self.model.addVars(range(end_round_l - self.round_Ef, end_round_l - 1),     16, vtype = GRB.BINARY, name = 'leqDW')
     leqdw  = self.model.addVars(range(end_round_l - self.round_Ef, end_round_l - 1),     16, vtype = GRB.BINARY, name = 'leqdw')
     leqDX  = self.model.addVars(range(end_round_l - self.round_Ef + 1, end_round_l),     16, vtype = GRB.BINARY, name = 'leqDX')
@@ -422,6 +461,7 @@ class IB_DandJ:
     # Reuse lAC and lTC from dis
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
     for i in range(16):
       for r in range(end_round_l - self.round_Ef, end_round_l):
@@ -436,6 +476,7 @@ class IB_DandJ:
     PART 1: Transform stk to leqk (leqk = SR^-1(MC^-1(lstk)) in extension)
     --------------------------------------------------------------------------------------------------------
     '''
+    self._profile('PART 1: Transform stk to leqk (leqk = SR^-1(MC^-1(lstk)) in extension)', section = True)
     # leqCan = self.model.addVars(range(end_round_l - self.round_Ef + 1, end_round_l + 1),  4, vtype = GRB.INTEGER, name = 'leqCan')
 
     for r in range(end_round_l - self.round_Ef + 1, end_round_l + 1):
@@ -459,8 +500,10 @@ class IB_DandJ:
     PART 2: differentail propagation in extension (eqX -(SC)-> eqY -(ATK)-> eqZ -(SR)-> eqW -(MC)-> eqX_r+1)
     --------------------------------------------------------------------------------------------------------
     '''
+    self._profile('PART 2: differentail propagation in extension (eqX -(SC)-> eqY -(ATK)-> eqZ -(SR)-> eqW -(MC)-> eqX_r+1)', section = True)
 
     ''' Operation: SC '''
+    self._profile('Operation: SC')
     # Connection of dis. and ext.
     for i in range(16):
       self.model.addConstr(leqDY[start_round_l + self.round_Dis,i] == lDX[start_round_l + self.round_Dis,i], name='lfSC')
@@ -472,6 +515,7 @@ class IB_DandJ:
         self.model.addConstr(leqdy[r,i] == leqDX[r,i], name='lfSC')
 
     ''' Operation: eqATK '''
+    self._profile('Operation: eqATK')
     # In Extension:    [leqDY,leqdy] =(leqk)=> [leqDZ,leqdz]
     # NOTE: No equivalent key.
     for r in range(start_round_l + self.round_Dis, end_round_l):
@@ -481,6 +525,7 @@ class IB_DandJ:
         self.model.addConstr(leqDZ[r,i] >= leqk[r+1,i], name='lfATK')
 
     ''' Operation: eqSR '''
+    self._profile('Operation: eqSR')
     # [DY,dy] <=> (DZ,dz)  end at the last eqATK
     for r in range(start_round_l + self.round_Dis, end_round_l - 1):
       for i in range(16):
@@ -488,6 +533,7 @@ class IB_DandJ:
         self.model.addConstr(leqdz[r,self.SRpermutation_rev[i]] == leqdw[r,i], name='lfSR')
 
     ''' Operation: eqMC '''
+    self._profile('Operation: eqMC')
     # In Extension [DW,dw] <= [DZ,dz]  end at the last eqATK
     for r in range(start_round_l + self.round_Dis, end_round_l - 1):
       for j in range(4):
@@ -521,6 +567,7 @@ class IB_DandJ:
       lType2:        Type2 cancellation
     -------------------------------------------------------------------------------
     '''
+    self._profile('TWO: Key schedule in Em+Ef+Em (No direction)', section = True)
 
     lLANE   = self.model.addVars(16, vtype = GRB.BINARY, name = 'lLANE')
     lT2CanA = self.model.addVars(range(start_round_l - 1, end_round_l - self.round_Ef), 4, lb = 0, vtype = GRB.INTEGER, name = 'lT2CanA')
@@ -532,17 +579,20 @@ class IB_DandJ:
     self.model.addConstr(sum(lLANE[i] for i in range(16)) >= 1)
 
     ''' Mark LANE '''
+    self._profile('Mark LANE')
     for i in range(16):
       for r in range(start_round_l - 1, end_round_l + 1):
         self.model.addConstr(lLANE[i] >= lstk[r, self.hTable[i][r]], name='lMLANE')
 
     ''' Type 1 cancellation '''
+    self._profile('Type 1 cancellation')
     for i in range(16):
       self.model.addConstr(lType1[i] == (end_round_l + 1 - (start_round_l - 1)) * lLANE[i] - 
                            sum(lstk[r, self.hTable[i][r]] for r in range(start_round_l - 1, end_round_l + 1)), name = 'lType1C')
       self.model.addConstr(lType1[i] <= self.s - 1, name = 'lType1C') # Cancellation no more than 2 in each position (for Deoxys-BC-384)
     
     ''' Type 2 cancellation (In Eu and Em) '''
+    self._profile('Type 2 cancellation (In Eu and Em)')
     for r in range(start_round_l, end_round_l - self.round_Ef):
       for c in range(4):
         # T2CanA: Active bytes in one column, before MC
@@ -582,6 +632,7 @@ class IB_DandJ:
         2. Obtaining filters
     -----------------------------------------------------------------------------------------------
     ''' 
+    self._profile('THREE: Guess-and-Determine (Ef)', section = True)
     lGstk   = self.model.addVars(range(end_round_l - self.round_Ef + 1, end_round_l + 1), 16, vtype = GRB.BINARY, name = 'lGstk')
     ldetEQX = self.model.addVars(range(end_round_l - self.round_Ef, end_round_l),         16, vtype = GRB.BINARY, name = 'ldetEQX')
     ldetEQY = self.model.addVars(range(end_round_l - self.round_Ef, end_round_l),         16, vtype = GRB.BINARY, name = 'ldetEQY')
@@ -598,8 +649,10 @@ class IB_DandJ:
     PART 1.  Propagation of determine
     ---------------------------------
     '''
+    self._profile('PART 1.  Propagation of determine', section = True)
 
     ''' KR: Guess round key and determine '''
+    self._profile('KR: Guess round key and determine')
     # lDetY <-(lGstk)- lDetZ
     for r in range(end_round_l - self.round_Ef, end_round_l):
       for i in range(16):
@@ -608,11 +661,13 @@ class IB_DandJ:
         self.model.addConstr(- ldetEQZ[r,i] - lGstk[r+1,i] + ldetEQY[r,i] >= -1, name = 'lDetAK')
 
     ''' KR: Determine in SC '''
+    self._profile('KR: Determine in SC')
     for r in range(end_round_l - self.round_Ef, end_round_l):
       for i in range(16):
         self.model.addConstr(ldetEQX[r,i] == ldetEQY[r,i], name = 'lDetSC') 
 
     ''' KR: 'Det.' propagation in MC '''
+    self._profile("KR: 'Det.' propagation in MC")
     for r in range(end_round_l - self.round_Ef + 1, end_round_l):
       for c in range(4):
         # NOTE: lDetC = 1 when all ldetEQX = 1, else lDetC = 0 
@@ -628,6 +683,7 @@ class IB_DandJ:
         self.model.addConstr(lDetC[r,c] == ldetEQW[r-1,4*c+3], name = 'lDetMC')
 
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(end_round_l - self.round_Ef, end_round_l - 1):
       for i in range(16):
         self.model.addConstr(ldetEQZ[r,self.SRpermutation_rev[i]] == ldetEQW[r,i], name = 'lDetSR')
@@ -637,7 +693,9 @@ class IB_DandJ:
     PART 2.  Obtaining filters
     ---------------------------------
     '''
+    self._profile('PART 2.  Obtaining filters', section = True)
     ''' KR: Filter in SC '''
+    self._profile('KR: Filter in SC')
     # At the point of connection
     for i in range(16):
       temp_r = end_round_l - self.round_Ef
@@ -652,6 +710,7 @@ class IB_DandJ:
         self.model.addConstr(- ldetEQX[r,i] - leqDX[r,i] + leqdx[r,i] + lFrSB[r,i] >= -1, name = 'lFrSC')
 
     ''' KR: Filter obtain from MC (for cell -> column) '''
+    self._profile('KR: Filter obtain from MC (for cell -> column)')
     # KR: Determine whether the difference before MC is determinable '''
     for r in range(end_round_l - self.round_Ef, end_round_l - 1):
       for i in range(16):
@@ -718,8 +777,21 @@ class IB_DandJ:
       At last one FIXED appear in in/out-put of BCT to get constraints.
     -----------------------------------------------------------------------------------------------
     ''' 
-    self.model.addConstr(sum((uDX[r,i] - udx[r,i]) * 
-                             (lDY[r,i] - ldy[r,i]) for i in range(16) for r in range(self.round_Eb, self.round_Eb + self.round_Dis)) >= 1)
+    self._profile('FOUR: Miss-In-The-Middle', section = True)
+    # Fixed (upper) - fixed (lower) contradiction in the cell (r,i): cFF[r,i] = (DX - dx) AND (DY - dy)
+    # NOTE: DX >= dx and DY >= dy (Basic Constrs), both differences are binary and the product is linear
+    cells = [(r, i) for r in range(self.round_Eb, self.round_Eb + self.round_Dis) for i in range(16)]
+    # Pinned contradiction (one subproblem of the decomposition over its position, see ib_tools.decompose)
+    if self.pin is not None:
+      cells = [(self.pin[0], i) for i in self.pin[1]]
+    cFF = self.model.addVars(cells, vtype = GRB.BINARY, name = 'cFF')
+    for r, i in cells:
+      uF = uDX[r,i] - udx[r,i]
+      lF = lDY[r,i] - ldy[r,i]
+      self.model.addConstr(cFF[r,i] <= uF, name = 'cFF')
+      self.model.addConstr(cFF[r,i] <= lF, name = 'cFF')
+      self.model.addConstr(cFF[r,i] >= uF + lF - 1, name = 'cFF')
+    self.model.addConstr(cFF.sum() >= 1)
 
 
 
@@ -787,9 +859,11 @@ class IB_DandJ:
         2. Time complexity computing
     -----------------------------------------------------------------------------------------------
     '''
+    self._profile('FIVE: Complexities', section = True)
     '''
     Choosen plaintext/ciphertext
     '''
+    self._profile('Choosen plaintext/ciphertext', section = True)
     for i in range(16):
       self.model.addConstr(uDetW[-1,i] == 1)
       self.model.addConstr(ldetEQZ[end_round_l - 1,i] == 1)
@@ -833,7 +907,9 @@ class IB_DandJ:
       cbp/cfp: determined key of Eb/Ef
     ------------------------------------------------------------
     '''
+    self._profile('PART 1. Parameters definition (in this model)', section = True)
     ''' Defination of PARA. in Eb'''
+    self._profile('Defination of PARA. in Eb')
     self.model.addConstr(rb  == self.cell_size * sum(udw[-1,i] for i in range(16)))
     self.model.addConstr(cb  == rb - self.cell_size * sum(udx[self.round_Eb,i] for i in range(16)))
     self.model.addConstr(mb  == self.cell_size * sum(udx[r,i] for r in range(self.round_Eb) for i in range(16)))
@@ -841,6 +917,7 @@ class IB_DandJ:
     self.model.addConstr(cbp == self.cell_size * sum(uFrSB[r,i] + uFrMC[r,i] for r in range(self.round_Eb) for i in range(16)))
 
     ''' Defination of PARA. in Ef'''
+    self._profile('Defination of PARA. in Ef')
     self.model.addConstr(rf  == self.cell_size * sum(leqdz[end_round_l - 1,i] for i in range(16)))
     self.model.addConstr(cf  == rf - self.cell_size * sum(ldx[end_round_l - self.round_Ef,i] for i in range(16)))
     self.model.addConstr(mf  == self.cell_size * sum(leqdz[r,i] for r in range(end_round_l - self.round_Ef, end_round_l) for i in range(16)))
@@ -860,29 +937,35 @@ class IB_DandJ:
       epsilon: estimated complexity para. of T32
     -----------------------------------------------------
     '''
+    self._profile('2. Time complexity computing', section = True)
     # Data
-    self.model.addConstr(Dc == self.block_size + self.tz/2)
+    self.handle['Dc'] = self.model.addConstr(Dc == self.block_size + self.tz/2, name = 'Dc')
     # Quartet
-    self.model.addConstr(Qc == 2 * (cb + cf) + self.tz)
+    self.handle['Qc'] = self.model.addConstr(Qc == 2 * (cb + cf) + self.tz, name = 'Qc')
 
     '''
     Complexity for related key
     '''
+    self._profile('Complexity for related key', section = True)
     # T0 (T0 = D · 4)
     self.model.addConstr(T0 == Dc + 2)
     # T1 (T1 = 2^{mb'+mf'} · D · 4)
     self.model.addConstr(T1 == (mbp + mfp) + Dc + 2)
     # T2 (T2 = 2^{mb'+mf'} · D · min[ 2^{rb-cb'}, D · 2^{rf-cf'-n} ] · 2)
-    if self.pgP == True:
-      self.model.addConstr(T2 == (mbp + mfp) + Dc + rb - cbp + 1)
-    else:
-      self.model.addConstr(T2 == (mbp + mfp) + Dc + (Dc + rf - cfp - self.block_size) + 1)
+    # NOTE: kept as a function of pgP, so that set_pgP() can switch the branch of the built model
+    def pgP_branch(pgP):
+      if pgP == True:
+        return [self.model.addConstr(T2 == (mbp + mfp) + Dc + rb - cbp + 1, name = 'T2')]
+      else:
+        return [self.model.addConstr(T2 == (mbp + mfp) + Dc + (Dc + rf - cfp - self.block_size) + 1, name = 'T2')]
+    self.pgP_branch = pgP_branch
+    self.handle['pgP'] = pgP_branch(self.pgP)
     # T31 (T31 = 2^{mb'+mf'-2cb'-2cf'} · Q)
     self.model.addConstr(T31 == (mbp + mfp - 2*cbp - 2*cfp) + Qc)
     # T32 (T32 = 2^{mb+mf+z} · epsilon)
-    self.model.addConstr(T32 == (mb + mf + self.tz) + eps)
+    self.handle['T32'] = self.model.addConstr(T32 == (mb + mf + self.tz) + eps, name = 'T32')
     # T4 (T4 = 2^{k-x}, where 2^z = xln2)
-    self.model.addConstr(T4 == self.key_size - self.tx)
+    self.handle['T4'] = self.model.addConstr(T4 == self.key_size - self.tx, name = 'T4')
 
     # Objective function
     self.model.addConstr(Tc >= T0)
@@ -891,22 +974,43 @@ class IB_DandJ:
     self.model.addConstr(Tc >= T31)
     self.model.addConstr(Tc >= T32)
     self.model.addConstr(Tc >= T4)
+    # Cutoff: best Tc found so far (e.g. in a sweep), a model that cannot reach it stops early
+    if Tc_cutoff is not None:
+      Tc.UB = Tc_cutoff
 
 
     ''' Objective function'''
+    self._profile('Objective function')
     self.model.ModelSense = GRB.MINIMIZE
     self.model.setObjectiveN(Tc, index=0, priority=2, name='Tc')
     self.model.setObjectiveN(T32, index=1, priority=1, name='T32')
 
 
-    self.model.write(self.name + '.lp')
-    self.model.optimize()
-
-    if self.model.Status == GRB.INFEASIBLE:
+    self._profile(None)
+    # Build only (e.g. to cache the built model, see ib_tools.cache)
+    if not solve:
+      self.model.update()
+      return self.model
+    self._export()
+    # MIP start from a previous .sol (matched by variable name, a partial start is completed by Gurobi)
+    if start is not None:
+      # NOTE: read() matches the variables by name, the pending ones (export and profile off) need an update first
+      self.model.update()
+      self.model.read(start)
+    self.model.optimize(self.stop_at_T4(self.model) if self.stop_T4 else None)
+    self._export(solved = True)
+
+    # NOTE: no solution (pruned by the cutoff, infeasible, time limit, interrupted): nothing to print
+    if self.model.SolCount == 0:
+      if self.model.Status == GRB.INFEASIBLE and Tc_cutoff is not None:
+        print('| Pruned: Tc > {} |'.format(Tc_cutoff))
+      elif self.model.Status == GRB.INFEASIBLE:
         print('-'*40 + '\n| Model is infeasible, computing IIS...|\n' + '-'*40)
         self.model.computeIIS()
         self.model.write(self.name + '.ilp')
-    self.model.write(self.name + '.sol')
+      else:
+        print('| No solution (status {}) |'.format(self.model.Status))
+      return self.result()
 
     print('>>>>> Solution <<<<<')
     print('='*90)
@@ -924,6 +1028,7 @@ class IB_DandJ:
     print('-'*90)
     print('|| Tc = {:5} ||'.format(Tc.x))
     print('='*90)
+    return self.result()
 
   '''
   =====================
@@ -935,6 +1040,34 @@ class IB_DandJ:
     # ln2 = 0.69
     return round(math.log2(0.7 * x), 1)
 
+  '''
+  =====================
+  Parameter update of the built model (no rebuilding),
+  then self.model.optimize() again
+  =====================
+  '''
+  def set_x(self, x):
+    self.tx = x
+    self.tz = self.x_to_z(x)
+    self.handle['Dc'].RHS = self.block_size + self.tz/2
+    self.handle['Qc'].RHS = self.tz
+    self.handle['T32'].RHS = self.tz
+    self.handle['T4'].RHS = self.key_size - self.tx
+
+  ''' Switch chosen plaintext/ciphertext of the built model (only the T2 branch is replaced) '''
+  def set_pgP(self, pgP):
+    self.pgP = pgP
+    self.model.remove(self.handle['pgP'])
+    self.handle['pgP'] = self.pgP_branch(pgP)
+
+  '''
+  =====================
+  Solution of the last solve in memory (see IB_Result)
+  =====================
+  '''
+  def result(self):
+    return IB_Result(self.model, self.tx)
+
 
 if __name__ == '__main__':
     
@@ -1,8 +1,14 @@
 import gurobipy as gp
 from gurobipy import GRB
 import math
+import os
+import sys
 
-class IB_ForkSKINNY:
+# NOTE: run as a script from its folder or loaded by ib_tools.models, the repository root gives ib_tools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ib_tools.result import IB_Model, IB_Result
+
+class IB_ForkSKINNY(IB_Model):
 
   def __init__(self, b_size, Vs, ri, r0, r1, rEb, rEu, rEl, rEf, Vx, cP) -> None:
     '''
@@ -39,8 +45,13 @@ class IB_ForkSKINNY:
       self.b_size, self.k_size, rEb+rEl+rEu+rEf, rEb, rEu, rEl, rEf, cP
     )
     self.model = gp.Model(self.name)
+    self.profile = None # path of the JSON build report (see _profile)
+    self._block = None
+    self.export = None # e.g. ['.lp.gz', '.sol'], files written by ib_model() (see _export)
+    self._writer = None
+    self.stop_T4 = True # stop the objective Tc once Tc == T4 (see stop_at_T4)
 
-  def ib_model(self):
+  def ib_model(self, Tc_cutoff = None, start = None, solve = True):
     '''
     ==========================================================================================
     (Begin) - Upper differential propagation
@@ -48,6 +59,7 @@ class IB_ForkSKINNY:
     Note:
     X -(SC&AC)-> Y -(ATK)-> Z -(SR)-> W -(MC)-> X^{r+1}
     '''
+    self._profile('(Begin) - Upper differential propagation', section = True)
 
     uR = self.rEb+self.rEu
     uDX  = self.model.addVars(range(1, uR+1), 16, vtype = GRB.BINARY, name = 'uDX')
@@ -61,6 +73,7 @@ class IB_ForkSKINNY:
     ustk = self.model.addVars(uR+self.r0,     16, vtype = GRB.BINARY, name = 'ustk')
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
     for i in range(16): 
       for r in range(1, uR+1):
@@ -72,6 +85,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(uDW[r, i] >= udw[r, i], name = 'uBasic')
 
     '''Operation: SC'''
+    self._profile('Operation: SC')
     # In Extension
     for r in range(1, self.rEb+1):
       for i in range(16):
@@ -85,12 +99,14 @@ class IB_ForkSKINNY:
 
 
     '''(*ri-(r0)-r1)Operation: ATK'''
+    self._profile('(*ri-(r0)-r1)Operation: ATK')
   
     ''' 
     ----------------------------------
     Equivalent Key for the first round
     ----------------------------------
     '''
+    self._profile('Equivalent Key for the first round', section = True)
     eqk = self.model.addVars(16, vtype = GRB.BINARY, name = 'eqk')
 
     for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
@@ -142,12 +158,14 @@ class IB_ForkSKINNY:
         self.model.addConstr(udy[r,i] == udz[r,i], name='uATKr1')
 
     '''(*)Operation: SR''' 
+    self._profile('(*)Operation: SR')
     for r in range(1,uR):
       for i in range(16):
         self.model.addConstr(uDZ[r,i] == uDW[r,self.SRp[i]], name = 'uSR')
         self.model.addConstr(udz[r,i] == udw[r,self.SRp[i]], name = 'uSR')
 
     '''Operation: MC'''
+    self._profile('Operation: MC')
     # ************ In extension (backword) ************
     for r in range(1, self.rEb):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
@@ -233,6 +251,7 @@ class IB_ForkSKINNY:
     Key Schedule 
     ------------------------------
     '''
+    self._profile('Key Schedule', section = True)
     uLANE = self.model.addVars(16, vtype = GRB.BINARY, name = 'uLANE')
 
     trans_pos = [1,7,0,5,2,6,4,3,9,15,8,13,10,14,12,11]
@@ -257,6 +276,7 @@ class IB_ForkSKINNY:
     ==========================================================================================
     (End) - Upper propagation
     '''
+    self._profile('(End) - Upper propagation', section = True)
 
 
     '''
@@ -266,6 +286,7 @@ class IB_ForkSKINNY:
     Note:
     X -(SC&AC)-> Y -(ATK)-> Z -(SR)-> W -(MC)-> X^{r+1}
     '''
+    self._profile('(Begin) - Lower differential propagation', section = True)
     lR = self.rEl + self.rEf
     lDX  = self.model.addVars(range(uR+1,uR+lR+1),              16, vtype = GRB.BINARY, name = 'lDX')
     ldx  = self.model.addVars(range(uR+1,uR+lR+1),              16, vtype = GRB.BINARY, name = 'ldx')
@@ -278,6 +299,7 @@ class IB_ForkSKINNY:
     lstk = self.model.addVars(range(uR+self.r0, uR+self.r0+lR), 16, vtype = GRB.BINARY, name = 'lstk')
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
     for r in range(uR+1,uR+lR):
       for i in range(16):
@@ -293,6 +315,7 @@ class IB_ForkSKINNY:
       self.model.addConstr(lDX[uR+lR, i] >= ldx[uR+lR, i], name='lBasic')
 
     '''Operation: SC'''
+    self._profile('Operation: SC')
     # In distinglisher
     for r in range(uR+1, uR+self.rEl):
       for i in range(16):
@@ -305,6 +328,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(ldy[r,i] == lDX[r,i], name='leSC')
     
     '''(*)Operation: ATK'''
+    self._profile('(*)Operation: ATK')
     for r in range(uR,uR+lR):
       for i in range(8):
         tlr = self.r0 + r
@@ -318,12 +342,14 @@ class IB_ForkSKINNY:
         self.model.addConstr(ldy[r,i] == ldz[r,i], name='lATK')
 
     '''(*)Operation: SR''' 
+    self._profile('(*)Operation: SR')
     for r in range(uR,uR+lR):
       for i in range(16):
         self.model.addConstr(lDZ[r,i] == lDW[r,self.SRp[i]], name='lSR')
         self.model.addConstr(ldz[r,i] == ldw[r,self.SRp[i]], name='lSR')
 
     '''Operation: MC'''
+    self._profile('Operation: MC')
     # ************ In distinguisher (backword) ************
     for r in range(uR, uR+self.rEl):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
@@ -410,6 +436,7 @@ class IB_ForkSKINNY:
     Key Schedule 
     ------------------------------
     '''
+    self._profile('Key Schedule', section = True)
     lLANE = self.model.addVars(16, vtype = GRB.BINARY, name = 'lLANE')
 
     for i in range(16):
@@ -428,6 +455,7 @@ class IB_ForkSKINNY:
     ==========================================================================================
     (Begin) - Lower differential propagation
     '''
+    self._profile('(Begin) - Lower differential propagation', section = True)
 
 
 
@@ -436,6 +464,7 @@ class IB_ForkSKINNY:
             Guess-and-Determine (u)
     ============================================
     '''
+    self._profile('Guess-and-Determine (u)', section = True)
     # NOTE: Assert rEb <= ri and rEb+rEu >= ri
     ugEQK = self.model.addVars(range(self.rEb),      16, vtype = GRB.BINARY, name = 'ugEQK')
     uGstk = self.model.addVars(range(self.rEb),      16, vtype = GRB.BINARY, name = 'uGstk')
@@ -492,6 +521,7 @@ class IB_ForkSKINNY:
     # ----------------- Guessing Eqk -----------------------
 
     ''' KR: Determine and Filter in SC '''
+    self._profile('KR: Determine and Filter in SC')
     for r in range(1, self.rEb+1):
       for i in range(16):
         # 'Det.' propagation via SC (AND ADD EQK)
@@ -513,6 +543,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(- udetYa[r,i] - uDY[r,i] + udy[r,i] + ufrSCa[r,i] >= -1, name = 'ufrSCa')
 
     ''' 'Det.' trans Y to Z '''
+    self._profile("'Det.' trans Y to Z")
     for r in range(1, self.rEb):
       for i in range(16):
         self.model.addConstr(uDetY[r,i] == uDetZ[r,i], 'udetY2Z')
@@ -520,6 +551,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(udetYa[r,i] == udetZa[r,i], 'udety2zA')
 
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(1, self.rEb):
       for i in range(16): 
         self.model.addConstr(uDetW[r,i] == uDetZ[r,self.SRpv[i]], name = 'udetSR')
@@ -527,6 +559,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(udetWa[r,i] == udetZa[r,self.SRpv[i]], name = 'udetsrA')
 
     ''' KR: 'Det.' propagation in MC '''
+    self._profile("KR: 'Det.' propagation in MC")
     for r in range(1, self.rEb):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -566,6 +599,7 @@ class IB_ForkSKINNY:
           # ===============================================================================================
 
     ''' KR: 'Filter' obtain from MC '''
+    self._profile("KR: 'Filter' obtain from MC")
     for r in range(2,self.rEb+1):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -627,6 +661,7 @@ class IB_ForkSKINNY:
             Guess-and-Determine (l)
     ============================================
     '''
+    self._profile('Guess-and-Determine (l)', section = True)
     leR = uR+self.rEl
     totR = uR+lR
     # NOTE: Assert rEb <= ri
@@ -657,6 +692,7 @@ class IB_ForkSKINNY:
     self.model.addConstr(sum(lDetZ[totR-1,i] for i in range(16)) == 16, name = 'VC')
 
     ''' KR: Determine and Filter in SC '''
+    self._profile('KR: Determine and Filter in SC')
     for r in range(leR, totR):
       for i in range(16):
         # 'Det.' propagation via SC
@@ -674,6 +710,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(- ldetXa[r,i] - lDX[r,i] + ldx[r,i] + lfrSCa[r,i] >= -1, name = 'lfrSCa')
 
     ''' KR: Guess round key and determine'''
+    self._profile('KR: Guess round key and determine')
     for r in range(leR, totR):
       rk = r + self.r0
       for i in range(8):
@@ -690,12 +727,14 @@ class IB_ForkSKINNY:
         self.model.addConstr(ldetYa[r,i] == ldetZa[r,i], name = 'lgkiLa')
 
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(leR, totR-1):
       for i in range(16): 
         self.model.addConstr(lDetZ[r,i] == lDetW[r,self.SRp[i]], name = 'ldetSR')
         self.model.addConstr(ldetZa[r,i] == ldetWa[r,self.SRp[i]], name = 'ldetSRa')
 
     ''' KR: 'Det.' propagation in MC '''
+    self._profile("KR: 'Det.' propagation in MC")
     for r in range(leR+1, totR):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -737,6 +776,7 @@ class IB_ForkSKINNY:
           self.model.addConstr( - ldetXa[r,c0] - ldetXa[r,c3] + ldetWa[r-1,c3] + 1 >= 0, name = 'ldetMC3a')
 
     ''' KR: 'Filter' obtain from MC '''
+    self._profile("KR: 'Filter' obtain from MC")
     for r in range(leR, totR-1):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -803,9 +843,11 @@ class IB_ForkSKINNY:
             Key Bridge
     ============================
     '''
+    self._profile('Key Bridge', section = True)
     '''
     For involved key
     '''
+    self._profile('For involved key', section = True)
     iLANE = self.model.addVars(16, vtype = GRB.INTEGER, name = 'iLANE') # Count the number of stk in a LANE
     ikSUM = self.model.addVars(16, ub = self.Vs, vtype = GRB.INTEGER, name = 'ikSUM') # Judge the broundary Vs
     ikz = self.model.addVars(16, vtype = GRB.BINARY, name = 'ikz') # Auxiliary vars. for ikSUM
@@ -826,6 +868,7 @@ class IB_ForkSKINNY:
     '''
     For pre-guessed key
     '''
+    self._profile('For pre-guessed key', section = True)
     gLANE = self.model.addVars(16, vtype = GRB.INTEGER, name = 'gLANE') # Count the number of Gstk in a LANE
     gkSUM = self.model.addVars(16, ub = 2, vtype = GRB.INTEGER, name = 'gkSUM') # Judge the broundary Vs
     gkz = self.model.addVars(16, vtype = GRB.BINARY, name = 'gkz') # Auxiliary vars. for gkSUM
@@ -847,9 +890,11 @@ class IB_ForkSKINNY:
     ==========================================================================================
          (Begin) - Complexity
     '''
+    self._profile('(Begin) - Complexity', section = True)
     '''
     Parameters
     '''
+    self._profile('Parameters', section = True)
     rb  = self.model.addVar(vtype = GRB.INTEGER, name = 'rb')
     rf  = self.model.addVar(vtype = GRB.INTEGER, name = 'rf')
     cb  = self.model.addVar(vtype = GRB.INTEGER, name = 'cb')
@@ -880,6 +925,7 @@ class IB_ForkSKINNY:
     '''
     Complexities
     '''
+    self._profile('Complexities', section = True)
     D   = self.model.addVar(lb = 0, vtype = GRB.CONTINUOUS, name = 'D')
     Dc  = self.model.addVar(lb = 0, vtype = GRB.CONTINUOUS, name = 'Dc')
     Qc  = self.model.addVar(lb = 0, vtype = GRB.CONTINUOUS, name = 'Qc')
@@ -928,14 +974,19 @@ class IB_ForkSKINNY:
     self.model.addConstr(Tc >= T31, name = 'Tc')
     self.model.addConstr(Tc >= T32, name = 'Tc')
     self.model.addConstr(Tc >= T4, name = 'Tc')
+    # Cutoff: best Tc found so far (e.g. in a sweep), a model that cannot reach it stops early
+    if Tc_cutoff is not None:
+      Tc.UB = Tc_cutoff
 
     # ******************************************************
     ''' Contradiction '''
+    self._profile('Contradiction')
     self.model.addConstr(sum((uDX[uR,i] - udx[uR,i]) * (lDY[uR,i] - ldy[uR,i]) for i in range(16)) >= 1, name = 'iBCT')
     # ******************************************************
 
 
     ''' Objective function'''
+    self._profile('Objective function')
     self.model.ModelSense = GRB.MINIMIZE
     self.model.setObjectiveN(Tc, index=0, priority=4, name='Min_Tc')
     self.model.setObjectiveN(T32, index=1, priority=3, name='Min_T32')
@@ -948,7 +999,7 @@ class IB_ForkSKINNY:
     
     # -------------------- To count mb and mf ------------------------
     mbi  = self.model.addVar(lb = 0, vtype = GRB.INTEGER, name = 'mbi')
-    self.model.addConstr(mbi == sum(ugstka[r,i] for r in range(rEb) for i in range(8)), name = 'mb')
+    self.model.addConstr(mbi == sum(ugstka[r,i] for r in range(self.rEb) for i in range(8)), name = 'mb')
     mfi  = self.model.addVar(lb = 0, vtype = GRB.INTEGER, name = 'mfi')
     self.model.addConstr(mfi == sum(lgstka[r,i] for r in range(leR+self.r0, totR+self.r0) for i in range(8)), name = 'mf')
     
@@ -957,18 +1008,34 @@ class IB_ForkSKINNY:
     # -----------------------------------------------------------------
 
     # self.model.setParam("OutputFlag", 0)
-    self.model.write(self.name + '.lp')
-    self.model.optimize()
+    self._profile(None)
+    # Build only (e.g. to cache the built model, see ib_tools.cache)
+    if not solve:
+      self.model.update()
+      return self.model
+    self._export()
+    # MIP start from a previous .sol (matched by variable name, a partial start is completed by Gurobi)
+    if start is not None:
+      # NOTE: read() matches the variables by name, the pending ones (export and profile off) need an update first
+      self.model.update()
+      self.model.read(start)
+    self.model.optimize(self.stop_at_T4(self.model) if self.stop_T4 else None)
+    self._export(solved = True)
+
+    # NOTE: no solution (pruned by the cutoff, infeasible, time limit, interrupted): nothing to print
+    if self.model.SolCount == 0:
+      if self.model.Status == GRB.INFEASIBLE and Tc_cutoff is not None:
+        print('| Pruned: Tc > {} |'.format(Tc_cutoff))
+      else:
+        print('| No solution (status {}) |'.format(self.model.Status))
+      return self.result()
 
     # if self.model.Status == GRB.INFEASIBLE:
     #     print('-'*40 + '\n| Model is infeasible, computing IIS...|\n' + '-'*40)
     #     self.model.computeIIS()
     #     self.model.write(self.name + '.ilp')
-    self.model.write(self.name + '.sol')
 
-    if self.model.Status == 2:
-      return Tc.x
-    return self.model.Status
+    return self.result()
 
 
   '''
@@ -982,6 +1049,19 @@ class IB_ForkSKINNY:
     # ln2 = 0.69...
     return round(math.log2(0.7 * x), 1)
 
+  ''' Change x of the built model (RHS only, no rebuilding), then self.model.optimize() again '''
+  def set_x(self, Vx):
+    self.Vx = Vx
+    self.Vz = self.x_to_z(Vx)
+    self.model.getConstrByName('D').RHS = self.b_size + self.Vz/2
+    self.model.getConstrByName('Qc').RHS = self.Vz
+    self.model.getConstrByName('T32').RHS = self.Vz
+    self.model.getConstrByName('T4').RHS = self.k_size - self.Vx
+
+  ''' Solution of the last solve in memory (see IB_Result) '''
+  def result(self):
+    return IB_Result(self.model, self.Vx)
+
   ''' n iterations hPermutation '''
   def iterate_hTable(self, pGstk, n):
     current = pGstk
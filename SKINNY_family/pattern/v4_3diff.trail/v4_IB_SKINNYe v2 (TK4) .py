@@ -1,8 +1,16 @@
 import gurobipy as gp
 from gurobipy import GRB
 import math
+import os
+import sys
+import numpy as np
+import scipy.sparse as sp
 
-class IB_ForkSKINNY:
+# NOTE: run as a script from its folder or loaded by ib_tools.models, the repository root gives ib_tools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from ib_tools.result import IB_Model, IB_Result
+
+class IB_ForkSKINNY(IB_Model):
 
   def __init__(self, b_size, Vs, rEb, rDis, rEf, Vx, cP) -> None:
     '''
@@ -34,12 +42,21 @@ class IB_ForkSKINNY:
     self.SRp = [0,1,2,3, 5,6,7,4, 10,11,8,9, 15,12,13,14]
     self.SRpv = [0,1,2,3, 7,4,5,6, 10,11,8,9, 13,14,15,12]
     self.hTable = [8,9,10,11, 12,13,14,15,  2,0,4,7, 6,3,5,1]
+    # Rows of the state, MC mixes the column j: MCrow[0][j], ..., MCrow[3][j]
+    self.MCrow = [[0,1,2,3], [4,5,6,7], [8,9,10,11], [12,13,14,15]]
+    # Cell of the lane i in the r-th round key: hLane[r][i] = h^r(i)
+    self.hLane = [[self.iterate_hTable(i, r) for i in range(16)] for r in range(rEb+rDis+rEf+1)]
     self.name = './v4_SKINNYe-{}-{}_{}-{}+{}+{}_{}'.format(
       self.b_size, self.k_size, rEb+rDis+rEf, rEb, rDis, rEf, cP
     )
     self.model = gp.Model(self.name)
+    self.profile = None # path of the JSON build report (see _profile)
+    self._block = None
+    self.export = None # e.g. ['.lp.gz', '.sol'], files written by ib_model() (see _export)
+    self._writer = None
+    self.stop_T4 = True # stop the objective Tc once Tc == T4 (see stop_at_T4)
 
-  def ib_model(self):
+  def ib_model(self, Tc_cutoff = None, start = None, solve = True):
     '''
     ==========================================================================================
     (Begin) - Upper differential propagation
@@ -47,6 +64,7 @@ class IB_ForkSKINNY:
     Note:
     X -(SC&AC)-> Y -(ATK)-> Z -(SR)-> W -(MC)-> X^{r+1}
     '''
+    self._profile('(Begin) - Upper differential propagation', section = True)
 
     uR = self.rEb+self.rDis
     uDX0  = self.model.addVars(range(1, uR+1), 16, vtype = GRB.BINARY, name = 'uDX0')
@@ -60,36 +78,34 @@ class IB_ForkSKINNY:
     ustk0 = self.model.addVars(uR,     16, vtype = GRB.BINARY, name = 'ustk0')
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
-    for i in range(16): 
-      for r in range(1, uR+1):
-        self.model.addConstr(uDX0[r, i] >= udx0[r, i], name = 'uBasic')
-      for r in range(1, uR):
-        self.model.addConstr(uDY0[r, i] >= udy0[r, i], name = 'uBasic')
-        self.model.addConstr(uDZ0[r, i] >= udz0[r, i], name = 'uBasic')
-      for r in range(uR):
-        self.model.addConstr(uDW0[r, i] >= udw0[r, i], name = 'uBasic')
+    self._geq(self._cells(uDX0, range(1, uR+1)), self._cells(udx0, range(1, uR+1)), 'uBasic')
+    self._geq(self._cells(uDY0, range(1, uR)),   self._cells(udy0, range(1, uR)),   'uBasic')
+    self._geq(self._cells(uDZ0, range(1, uR)),   self._cells(udz0, range(1, uR)),   'uBasic')
+    self._geq(self._cells(uDW0, range(uR)),      self._cells(udw0, range(uR)),      'uBasic')
 
     '''Operation: SC'''
+    self._profile('Operation: SC')
     # In Extension
-    for r in range(1, self.rEb+1):
-      for i in range(16):
-        self.model.addConstr(uDX0[r,i] == uDY0[r,i], name='ueSC')
-        self.model.addConstr(udx0[r,i] == uDY0[r,i], name='ueSC')
+    R = range(1, self.rEb+1)
+    self._eq(self._cells(uDX0, R), self._cells(uDY0, R), 'ueSC')
+    self._eq(self._cells(udx0, R), self._cells(uDY0, R), 'ueSC')
     # In distinguisher
-    for r in range(self.rEb+1, uR):
-      for i in range(16):
-        self.model.addConstr(uDY0[r,i] == uDX0[r,i], name='udSC')
-        self.model.addConstr(udy0[r,i] == uDX0[r,i], name='udSC')
+    R = range(self.rEb+1, uR)
+    self._eq(self._cells(uDY0, R), self._cells(uDX0, R), 'udSC')
+    self._eq(self._cells(udy0, R), self._cells(uDX0, R), 'udSC')
 
 
     '''(*ri-(r0)-r1)Operation: ATK'''
+    self._profile('(*ri-(r0)-r1)Operation: ATK')
   
     ''' 
     ----------------------------------
     Equivalent Key for the first round
     ----------------------------------
     '''
+    self._profile('Equivalent Key for the first round', section = True)
     eqk0 = self.model.addVars(16, vtype = GRB.BINARY, name = 'eqk_0')
 
     for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
@@ -139,131 +155,80 @@ class IB_ForkSKINNY:
     #   for i in range(8,16):
     #     self.model.addConstr(uDY0[r,i] == uDZ0[r,i], name='uATKr1')
     #     self.model.addConstr(udy0[r,i] == udz0[r,i], name='uATKr1')
-    for r in range(1, uR):
-      for i in range(8):
-        self.model.addConstr(udy0[r,i] == udz0[r,i], name='uATK')
-        self.model.addConstr(ustk0[r,i] + uDY0[r,i] - uDZ0[r,i] >= 0, name='uATK')
-        self.model.addConstr(ustk0[r,i] - uDY0[r,i] + uDZ0[r,i] >= 0, name='uATK')
-        self.model.addConstr(-ustk0[r,i] + uDY0[r,i] + uDZ0[r,i] - udz0[r,i] >= 0, name='uATK')
-        self.model.addConstr(uDY0[r,i] >= udz0[r,i], name='uATK')
-      for i in range(8,16):
-        self.model.addConstr(uDY0[r,i] == uDZ0[r,i], name='uATK')
-        self.model.addConstr(udy0[r,i] == udz0[r,i], name='uATK')
+    R, L, H = range(1, uR), range(8), range(8, 16)
+    self._eq(self._cells(udy0, R, L), self._cells(udz0, R, L), 'uATK')
+    stk, DY, DZ, dz = self._cells(ustk0, R, L), self._cells(uDY0, R, L), self._cells(uDZ0, R, L), self._cells(udz0, R, L)
+    self._mconstr([(1, stk), (1, DY), (-1, DZ)], '>', 0, 'uATK')
+    self._mconstr([(1, stk), (-1, DY), (1, DZ)], '>', 0, 'uATK')
+    self._mconstr([(-1, stk), (1, DY), (1, DZ), (-1, dz)], '>', 0, 'uATK')
+    self._geq(DY, dz, 'uATK')
+    self._eq(self._cells(uDY0, R, H), self._cells(uDZ0, R, H), 'uATK')
+    self._eq(self._cells(udy0, R, H), self._cells(udz0, R, H), 'uATK')
 
 
     '''(*)Operation: SR''' 
-    for r in range(1,uR):
-      for i in range(16):
-        self.model.addConstr(uDZ0[r,i] == uDW0[r,self.SRp[i]], name = 'uSR')
-        self.model.addConstr(udz0[r,i] == udw0[r,self.SRp[i]], name = 'uSR')
+    self._profile('(*)Operation: SR')
+    self._eq(self._cells(uDZ0, R), self._cells(uDW0, R, self.SRp), 'uSR')
+    self._eq(self._cells(udz0, R), self._cells(udw0, R, self.SRp), 'uSR')
 
     '''Operation: MC'''
+    self._profile('Operation: MC')
+    # NOTE: the 4 columns at once, c0..c3 are the rows of the state
+    c0, c1, c2, c3 = self.MCrow
     # ************ In extension (backword) ************
-    for r in range(1, self.rEb):
-      for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
-        c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
-
-        # --- POSITION -- 0: W[c0] = X[c1] ---
-        self.model.addConstr(udw0[r,c0] == udx0[r+1,c1], name = 'ueMC0')
-
-        self.model.addConstr(uDW0[r,c0] == uDX0[r+1,c1], name = 'ueMC0')
-
-        # --- POSITION -- 1: W[c1] = W[c2] + X[c2] ---
-        self.model.addConstr(udw0[r,c1] >= udw0[r,c2], name = 'ueMC1')
-        self.model.addConstr(udw0[r,c1] >= udx0[r+1,c2], name = 'ueMC1')
-        self.model.addConstr(udw0[r,c1] <= udw0[r,c2] + udx0[r+1,c2], name = 'ueMC1')
-
-        self.model.addConstr(uDW0[r,c1] + uDW0[r,c2] + uDX0[r+1,c2] >= 2*uDW0[r,c1], name = 'ueMC1')
-        self.model.addConstr(uDW0[r,c1] + uDW0[r,c2] + uDX0[r+1,c2] >= 2*uDW0[r,c2], name = 'ueMC1')
-        self.model.addConstr(uDW0[r,c1] + uDW0[r,c2] + uDX0[r+1,c2] >= 2*uDX0[r+1,c2], name = 'ueMC1')
-        self.model.addConstr(uDW0[r,c1] <= uDW0[r,c2] + uDX0[r+1,c2], name = 'ueMC1')
-
-        # --- POSITION -- 2: W[c2] = X[c1] + X[c3] ---
-        self.model.addConstr(udw0[r,c2] >= udx0[r+1,c1], name = 'ueMC2')
-        self.model.addConstr(udw0[r,c2] >= udx0[r+1,c3], name = 'ueMC2')
-        self.model.addConstr(udw0[r,c2] <= udx0[r+1,c1] + udx0[r+1,c3], name = 'ueMC2')
-
-        self.model.addConstr(uDW0[r,c2] + uDX0[r+1,c1] + uDX0[r+1,c3] >= 2*uDW0[r,c2], name = 'ueMC2')
-        self.model.addConstr(uDW0[r,c2] + uDX0[r+1,c1] + uDX0[r+1,c3] >= 2*uDX0[r+1,c1], name = 'ueMC2')
-        self.model.addConstr(uDW0[r,c2] + uDX0[r+1,c1] + uDX0[r+1,c3] >= 2*uDX0[r+1,c3], name = 'ueMC2')
-        self.model.addConstr(uDW0[r,c2] <= uDX0[r+1,c1] + uDX0[r+1,c3], name = 'ueMC2')
-
-        # --- POSITION -- 3: W[c3] = X[c0] + X[c3] ---
-        self.model.addConstr(udw0[r,c3] >= udx0[r+1,c0], name = 'ueMC3')
-        self.model.addConstr(udw0[r,c3] >= udx0[r+1,c3], name = 'ueMC3')
-        self.model.addConstr(udw0[r,c3] <= udx0[r+1,c0] + udx0[r+1,c3], name = 'ueMC3')
-
-        self.model.addConstr(uDW0[r,c3] + uDX0[r+1,c0] + uDX0[r+1,c3] >= 2*uDW0[r,c3], name = 'ueMC3')
-        self.model.addConstr(uDW0[r,c3] + uDX0[r+1,c0] + uDX0[r+1,c3] >= 2*uDX0[r+1,c0], name = 'ueMC3')
-        self.model.addConstr(uDW0[r,c3] + uDX0[r+1,c0] + uDX0[r+1,c3] >= 2*uDX0[r+1,c3], name = 'ueMC3')
-        self.model.addConstr(uDW0[r,c3] <= uDX0[r+1,c0] + uDX0[r+1,c3], name = 'ueMC3')
+    W, X = range(1, self.rEb), range(2, self.rEb+1)
+    # --- POSITION -- 0: W[c0] = X[c1] ---
+    self._eq(self._cells(udw0, W, c0), self._cells(udx0, X, c1), 'ueMC0')
+    self._eq(self._cells(uDW0, W, c0), self._cells(uDX0, X, c1), 'ueMC0')
+    # --- POSITION -- 1: W[c1] = W[c2] + X[c2] ---
+    self._or(self._cells(udw0, W, c1), self._cells(udw0, W, c2), self._cells(udx0, X, c2), 'ueMC1')
+    self._xor(self._cells(uDW0, W, c1), self._cells(uDW0, W, c2), self._cells(uDX0, X, c2), 'ueMC1')
+    # --- POSITION -- 2: W[c2] = X[c1] + X[c3] ---
+    self._or(self._cells(udw0, W, c2), self._cells(udx0, X, c1), self._cells(udx0, X, c3), 'ueMC2')
+    self._xor(self._cells(uDW0, W, c2), self._cells(uDX0, X, c1), self._cells(uDX0, X, c3), 'ueMC2')
+    # --- POSITION -- 3: W[c3] = X[c0] + X[c3] ---
+    self._or(self._cells(udw0, W, c3), self._cells(udx0, X, c0), self._cells(udx0, X, c3), 'ueMC3')
+    self._xor(self._cells(uDW0, W, c3), self._cells(uDX0, X, c0), self._cells(uDX0, X, c3), 'ueMC3')
     
     # ************ In distinguisher (forward) ************
-    for r in range(self.rEb, uR):
-      for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
-          c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
-
-          # --- POSITION -- 0: X[c0] = X[c3] + W[c3] ---
-          self.model.addConstr(udx0[r+1,c0] >= udw0[r,c3], name = 'udMC0')
-          self.model.addConstr(udx0[r+1,c0] >= udx0[r+1,c3], name = 'udMC0')
-          self.model.addConstr(udx0[r+1,c0] <= udw0[r,c3] + udx0[r+1,c3], name = 'udMC0')
-
-          self.model.addConstr(uDX0[r+1,c0] + uDW0[r,c3] + uDX0[r+1,c3] >= 2*uDX0[r+1,c0], name = 'udMC0')
-          self.model.addConstr(uDX0[r+1,c0] + uDW0[r,c3] + uDX0[r+1,c3] >= 2*uDW0[r,c3], name = 'udMC0')
-          self.model.addConstr(uDX0[r+1,c0] + uDW0[r,c3] + uDX0[r+1,c3] >= 2*uDX0[r+1,c3], name = 'udMC0')
-          self.model.addConstr(uDX0[r+1,c0] <= uDW0[r,c3] + uDX0[r+1,c3], name = 'udMC0')
-
-          # --- POSITION -- 1: X[c1] = W[c0] ---
-          self.model.addConstr(udx0[r+1,c1] == udw0[r,c0], name = 'udMC1')
-
-          self.model.addConstr(uDX0[r+1,c1] == uDW0[r,c0], name = 'udMC1')
-
-          # --- POSITION -- 2: X[c2] = X[c1] + W[c2] ---
-          self.model.addConstr(udx0[r+1,c2] >= udw0[r,c1], name = 'udMC2')
-          self.model.addConstr(udx0[r+1,c2] >= udw0[r,c2], name = 'udMC2')
-          self.model.addConstr(udx0[r+1,c2] <= udw0[r,c1] + udw0[r,c2], name = 'udMC2')
-
-          self.model.addConstr(uDX0[r+1,c2] + uDW0[r,c1] + uDW0[r,c2] >= 2*uDX0[r+1,c2], name = 'udMC2')
-          self.model.addConstr(uDX0[r+1,c2] + uDW0[r,c1] + uDW0[r,c2] >= 2*uDW0[r,c1], name = 'udMC2')
-          self.model.addConstr(uDX0[r+1,c2] + uDW0[r,c1] + uDW0[r,c2] >= 2*uDW0[r,c2], name = 'udMC2')
-          self.model.addConstr(uDX0[r+1,c2] <= uDW0[r,c1] + uDW0[r,c2], name = 'udMC2')
-
-          # --- POSITION -- 3: X[c3] = W[c0] + W[c2] ---
-          self.model.addConstr(udx0[r+1,c3] >= udw0[r,c0], name = 'udMC3')
-          self.model.addConstr(udx0[r+1,c3] >= udw0[r,c2], name = 'udMC3')
-          self.model.addConstr(udx0[r+1,c3] <= udw0[r,c0] + udw0[r,c2], name = 'udMC3')
-
-          self.model.addConstr(uDX0[r+1,c3] + uDW0[r,c0] + uDW0[r,c2] >= 2*uDX0[r+1,c3], name = 'udMC3')
-          self.model.addConstr(uDX0[r+1,c3] + uDW0[r,c0] + uDW0[r,c2] >= 2*uDW0[r,c0], name = 'udMC3')
-          self.model.addConstr(uDX0[r+1,c3] + uDW0[r,c0] + uDW0[r,c2] >= 2*uDW0[r,c2], name = 'udMC3')
-          self.model.addConstr(uDX0[r+1,c3] <= uDW0[r,c0] + uDW0[r,c2], name = 'udMC3')
+    W, X = range(self.rEb, uR), range(self.rEb+1, uR+1)
+    # --- POSITION -- 0: X[c0] = X[c3] + W[c3] ---
+    self._or(self._cells(udx0, X, c0), self._cells(udw0, W, c3), self._cells(udx0, X, c3), 'udMC0')
+    self._xor(self._cells(uDX0, X, c0), self._cells(uDW0, W, c3), self._cells(uDX0, X, c3), 'udMC0')
+    # --- POSITION -- 1: X[c1] = W[c0] ---
+    self._eq(self._cells(udx0, X, c1), self._cells(udw0, W, c0), 'udMC1')
+    self._eq(self._cells(uDX0, X, c1), self._cells(uDW0, W, c0), 'udMC1')
+    # --- POSITION -- 2: X[c2] = W[c1] + W[c2] ---
+    self._or(self._cells(udx0, X, c2), self._cells(udw0, W, c1), self._cells(udw0, W, c2), 'udMC2')
+    self._xor(self._cells(uDX0, X, c2), self._cells(uDW0, W, c1), self._cells(uDW0, W, c2), 'udMC2')
+    # --- POSITION -- 3: X[c3] = W[c0] + W[c2] ---
+    self._or(self._cells(udx0, X, c3), self._cells(udw0, W, c0), self._cells(udw0, W, c2), 'udMC3')
+    self._xor(self._cells(uDX0, X, c3), self._cells(uDW0, W, c0), self._cells(uDW0, W, c2), 'udMC3')
     
     ''' 
     ------------------------------
     Key Schedule 
     ------------------------------
     '''
+    self._profile('Key Schedule', section = True)
     uLANE0 = self.model.addVars(16, vtype = GRB.BINARY, name = 'uLANE0')
 
     trans_pos = [1,7,0,5,2,6,4,3,9,15,8,13,10,14,12,11]
 
+    # Cell of the lane i in the round key r: hLane[r][i]
+    R = range(uR)
+    self._geq((uLANE0, [i for r in R for i in range(16)]), (ustk0, [(r, self.hLane[r][i]) for r in R for i in range(16)]), 'uKS')
     for i in range(16):
-      lane_pos = i
-      total_stack_sum = 0
-      for r in range(uR):
-        self.model.addConstr(uLANE0[i] >= ustk0[r, lane_pos], name = 'uKS')
-        total_stack_sum += ustk0[r, lane_pos]
-        lane_pos = self.hTable[lane_pos]
+      total_stack_sum = gp.quicksum(ustk0[r, self.hLane[r][i]] for r in R)
       # math.ceil((uR + self.r0)/16) = cancellations from key schedule
       self.model.addConstr((uR)*uLANE0[i] - total_stack_sum <= 
                             (self.Vs - 1)*math.ceil((uR)/30), name = 'uKS')
 
     # make Key reuse
-    for r in range(30, uR):
-        for i in range(16):
-          self.model.addConstr(ustk0[r-30,i] == ustk0[r,trans_pos[i]], name = 'uKS')
+    self._eq(self._cells(ustk0, range(uR-30)), self._cells(ustk0, range(30, uR), trans_pos), 'uKS')
     
     ''' the second diff. trail '''
+    self._profile('the second diff. trail')
     uDX1  = self.model.addVars(range(1, uR+1), 16, vtype = GRB.BINARY, name = 'uDX1')
     udx1  = self.model.addVars(range(1, uR+1), 16, vtype = GRB.BINARY, name = 'udx1')
     uDY1  = self.model.addVars(range(1, uR),   16, vtype = GRB.BINARY, name = 'uDY1')
@@ -275,36 +240,34 @@ class IB_ForkSKINNY:
     ustk1 = self.model.addVars(uR,     16, vtype = GRB.BINARY, name = 'ustk1')
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
-    for i in range(16): 
-      for r in range(1, uR+1):
-        self.model.addConstr(uDX1[r, i] >= udx1[r, i], name = 'uBasic')
-      for r in range(1, uR):
-        self.model.addConstr(uDY1[r, i] >= udy1[r, i], name = 'uBasic')
-        self.model.addConstr(uDZ1[r, i] >= udz1[r, i], name = 'uBasic')
-      for r in range(uR):
-        self.model.addConstr(uDW1[r, i] >= udw1[r, i], name = 'uBasic')
+    self._geq(self._cells(uDX1, range(1, uR+1)), self._cells(udx1, range(1, uR+1)), 'uBasic')
+    self._geq(self._cells(uDY1, range(1, uR)),   self._cells(udy1, range(1, uR)),   'uBasic')
+    self._geq(self._cells(uDZ1, range(1, uR)),   self._cells(udz1, range(1, uR)),   'uBasic')
+    self._geq(self._cells(uDW1, range(uR)),      self._cells(udw1, range(uR)),      'uBasic')
 
     '''Operation: SC'''
+    self._profile('Operation: SC')
     # In Extension
-    for r in range(1, self.rEb+1):
-      for i in range(16):
-        self.model.addConstr(uDX1[r,i] == uDY1[r,i], name='ueSC')
-        self.model.addConstr(udx1[r,i] == uDY1[r,i], name='ueSC')
+    R = range(1, self.rEb+1)
+    self._eq(self._cells(uDX1, R), self._cells(uDY1, R), 'ueSC')
+    self._eq(self._cells(udx1, R), self._cells(uDY1, R), 'ueSC')
     # In distinguisher
-    for r in range(self.rEb+1, uR):
-      for i in range(16):
-        self.model.addConstr(uDY1[r,i] == uDX1[r,i], name='udSC')
-        self.model.addConstr(udy1[r,i] == uDX1[r,i], name='udSC')
+    R = range(self.rEb+1, uR)
+    self._eq(self._cells(uDY1, R), self._cells(uDX1, R), 'udSC')
+    self._eq(self._cells(udy1, R), self._cells(uDX1, R), 'udSC')
 
 
     '''(*ri-(r0)-r1)Operation: ATK'''
+    self._profile('(*ri-(r0)-r1)Operation: ATK')
   
     ''' 
     ----------------------------------
     Equivalent Key for the first round
     ----------------------------------
     '''
+    self._profile('Equivalent Key for the first round', section = True)
     eqk1 = self.model.addVars(16, vtype = GRB.BINARY, name = 'eqk_1')
 
     for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
@@ -354,134 +317,83 @@ class IB_ForkSKINNY:
     #   for i in range(8,16):
     #     self.model.addConstr(uDY1[r,i] == uDZ1[r,i], name='uATKr1')
     #     self.model.addConstr(udy1[r,i] == udz1[r,i], name='uATKr1')
-    for r in range(1, uR):
-      for i in range(8):
-        self.model.addConstr(udy1[r,i] == udz1[r,i], name='uATK')
-        self.model.addConstr(ustk1[r,i] + uDY1[r,i] - uDZ1[r,i] >= 0, name='uATK')
-        self.model.addConstr(ustk1[r,i] - uDY1[r,i] + uDZ1[r,i] >= 0, name='uATK')
-        self.model.addConstr(-ustk1[r,i] + uDY1[r,i] + uDZ1[r,i] - udz1[r,i] >= 0, name='uATK')
-        self.model.addConstr(uDY1[r,i] >= udz1[r,i], name='uATK')
-      for i in range(8,16):
-        self.model.addConstr(uDY1[r,i] == uDZ1[r,i], name='uATK')
-        self.model.addConstr(udy1[r,i] == udz1[r,i], name='uATK')
+    R, L, H = range(1, uR), range(8), range(8, 16)
+    self._eq(self._cells(udy1, R, L), self._cells(udz1, R, L), 'uATK')
+    stk, DY, DZ, dz = self._cells(ustk1, R, L), self._cells(uDY1, R, L), self._cells(uDZ1, R, L), self._cells(udz1, R, L)
+    self._mconstr([(1, stk), (1, DY), (-1, DZ)], '>', 0, 'uATK')
+    self._mconstr([(1, stk), (-1, DY), (1, DZ)], '>', 0, 'uATK')
+    self._mconstr([(-1, stk), (1, DY), (1, DZ), (-1, dz)], '>', 0, 'uATK')
+    self._geq(DY, dz, 'uATK')
+    self._eq(self._cells(uDY1, R, H), self._cells(uDZ1, R, H), 'uATK')
+    self._eq(self._cells(udy1, R, H), self._cells(udz1, R, H), 'uATK')
 
 
     '''(*)Operation: SR''' 
-    for r in range(1,uR):
-      for i in range(16):
-        self.model.addConstr(uDZ1[r,i] == uDW1[r,self.SRp[i]], name = 'uSR')
-        self.model.addConstr(udz1[r,i] == udw1[r,self.SRp[i]], name = 'uSR')
+    self._profile('(*)Operation: SR')
+    self._eq(self._cells(uDZ1, R), self._cells(uDW1, R, self.SRp), 'uSR')
+    self._eq(self._cells(udz1, R), self._cells(udw1, R, self.SRp), 'uSR')
 
     '''Operation: MC'''
+    self._profile('Operation: MC')
+    # NOTE: the 4 columns at once, c0..c3 are the rows of the state
+    c0, c1, c2, c3 = self.MCrow
     # ************ In extension (backword) ************
-    for r in range(1, self.rEb):
-      for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
-        c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
-
-        # --- POSITION -- 0: W[c0] = X[c1] ---
-        self.model.addConstr(udw1[r,c0] == udx1[r+1,c1], name = 'ueMC0')
-
-        self.model.addConstr(uDW1[r,c0] == uDX1[r+1,c1], name = 'ueMC0')
-
-        # --- POSITION -- 1: W[c1] = W[c2] + X[c2] ---
-        self.model.addConstr(udw1[r,c1] >= udw1[r,c2], name = 'ueMC1')
-        self.model.addConstr(udw1[r,c1] >= udx1[r+1,c2], name = 'ueMC1')
-        self.model.addConstr(udw1[r,c1] <= udw1[r,c2] + udx1[r+1,c2], name = 'ueMC1')
-
-        self.model.addConstr(uDW1[r,c1] + uDW1[r,c2] + uDX1[r+1,c2] >= 2*uDW1[r,c1], name = 'ueMC1')
-        self.model.addConstr(uDW1[r,c1] + uDW1[r,c2] + uDX1[r+1,c2] >= 2*uDW1[r,c2], name = 'ueMC1')
-        self.model.addConstr(uDW1[r,c1] + uDW1[r,c2] + uDX1[r+1,c2] >= 2*uDX1[r+1,c2], name = 'ueMC1')
-        self.model.addConstr(uDW1[r,c1] <= uDW1[r,c2] + uDX1[r+1,c2], name = 'ueMC1')
-
-        # --- POSITION -- 2: W[c2] = X[c1] + X[c3] ---
-        self.model.addConstr(udw1[r,c2] >= udx1[r+1,c1], name = 'ueMC2')
-        self.model.addConstr(udw1[r,c2] >= udx1[r+1,c3], name = 'ueMC2')
-        self.model.addConstr(udw1[r,c2] <= udx1[r+1,c1] + udx1[r+1,c3], name = 'ueMC2')
-
-        self.model.addConstr(uDW1[r,c2] + uDX1[r+1,c1] + uDX1[r+1,c3] >= 2*uDW1[r,c2], name = 'ueMC2')
-        self.model.addConstr(uDW1[r,c2] + uDX1[r+1,c1] + uDX1[r+1,c3] >= 2*uDX1[r+1,c1], name = 'ueMC2')
-        self.model.addConstr(uDW1[r,c2] + uDX1[r+1,c1] + uDX1[r+1,c3] >= 2*uDX1[r+1,c3], name = 'ueMC2')
-        self.model.addConstr(uDW1[r,c2] <= uDX1[r+1,c1] + uDX1[r+1,c3], name = 'ueMC2')
-
-        # --- POSITION -- 3: W[c3] = X[c0] + X[c3] ---
-        self.model.addConstr(udw1[r,c3] >= udx1[r+1,c0], name = 'ueMC3')
-        self.model.addConstr(udw1[r,c3] >= udx1[r+1,c3], name = 'ueMC3')
-        self.model.addConstr(udw1[r,c3] <= udx1[r+1,c0] + udx1[r+1,c3], name = 'ueMC3')
-
-        self.model.addConstr(uDW1[r,c3] + uDX1[r+1,c0] + uDX1[r+1,c3] >= 2*uDW1[r,c3], name = 'ueMC3')
-        self.model.addConstr(uDW1[r,c3] + uDX1[r+1,c0] + uDX1[r+1,c3] >= 2*uDX1[r+1,c0], name = 'ueMC3')
-        self.model.addConstr(uDW1[r,c3] + uDX1[r+1,c0] + uDX1[r+1,c3] >= 2*uDX1[r+1,c3], name = 'ueMC3')
-        self.model.addConstr(uDW1[r,c3] <= uDX1[r+1,c0] + uDX1[r+1,c3], name = 'ueMC3')
+    W, X = range(1, self.rEb), range(2, self.rEb+1)
+    # --- POSITION -- 0: W[c0] = X[c1] ---
+    self._eq(self._cells(udw1, W, c0), self._cells(udx1, X, c1), 'ueMC0')
+    self._eq(self._cells(uDW1, W, c0), self._cells(uDX1, X, c1), 'ueMC0')
+    # --- POSITION -- 1: W[c1] = W[c2] + X[c2] ---
+    self._or(self._cells(udw1, W, c1), self._cells(udw1, W, c2), self._cells(udx1, X, c2), 'ueMC1')
+    self._xor(self._cells(uDW1, W, c1), self._cells(uDW1, W, c2), self._cells(uDX1, X, c2), 'ueMC1')
+    # --- POSITION -- 2: W[c2] = X[c1] + X[c3] ---
+    self._or(self._cells(udw1, W, c2), self._cells(udx1, X, c1), self._cells(udx1, X, c3), 'ueMC2')
+    self._xor(self._cells(uDW1, W, c2), self._cells(uDX1, X, c1), self._cells(uDX1, X, c3), 'ueMC2')
+    # --- POSITION -- 3: W[c3] = X[c0] + X[c3] ---
+    self._or(self._cells(udw1, W, c3), self._cells(udx1, X, c0), self._cells(udx1, X, c3), 'ueMC3')
+    self._xor(self._cells(uDW1, W, c3), self._cells(uDX1, X, c0), self._cells(uDX1, X, c3), 'ueMC3')
     
     # ************ In distinguisher (forward) ************
-    for r in range(self.rEb, uR):
-      for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
-          c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
-
-          # --- POSITION -- 0: X[c0] = X[c3] + W[c3] ---
-          self.model.addConstr(udx1[r+1,c0] >= udw1[r,c3], name = 'udMC0')
-          self.model.addConstr(udx1[r+1,c0] >= udx1[r+1,c3], name = 'udMC0')
-          self.model.addConstr(udx1[r+1,c0] <= udw1[r,c3] + udx1[r+1,c3], name = 'udMC0')
-
-          self.model.addConstr(uDX1[r+1,c0] + uDW1[r,c3] + uDX1[r+1,c3] >= 2*uDX1[r+1,c0], name = 'udMC0')
-          self.model.addConstr(uDX1[r+1,c0] + uDW1[r,c3] + uDX1[r+1,c3] >= 2*uDW1[r,c3], name = 'udMC0')
-          self.model.addConstr(uDX1[r+1,c0] + uDW1[r,c3] + uDX1[r+1,c3] >= 2*uDX1[r+1,c3], name = 'udMC0')
-          self.model.addConstr(uDX1[r+1,c0] <= uDW1[r,c3] + uDX1[r+1,c3], name = 'udMC0')
-
-          # --- POSITION -- 1: X[c1] = W[c0] ---
-          self.model.addConstr(udx1[r+1,c1] == udw1[r,c0], name = 'udMC1')
-
-          self.model.addConstr(uDX1[r+1,c1] == uDW1[r,c0], name = 'udMC1')
-
-          # --- POSITION -- 2: X[c2] = X[c1] + W[c2] ---
-          self.model.addConstr(udx1[r+1,c2] >= udw1[r,c1], name = 'udMC2')
-          self.model.addConstr(udx1[r+1,c2] >= udw1[r,c2], name = 'udMC2')
-          self.model.addConstr(udx1[r+1,c2] <= udw1[r,c1] + udw1[r,c2], name = 'udMC2')
-
-          self.model.addConstr(uDX1[r+1,c2] + uDW1[r,c1] + uDW1[r,c2] >= 2*uDX1[r+1,c2], name = 'udMC2')
-          self.model.addConstr(uDX1[r+1,c2] + uDW1[r,c1] + uDW1[r,c2] >= 2*uDW1[r,c1], name = 'udMC2')
-          self.model.addConstr(uDX1[r+1,c2] + uDW1[r,c1] + uDW1[r,c2] >= 2*uDW1[r,c2], name = 'udMC2')
-          self.model.addConstr(uDX1[r+1,c2] <= uDW1[r,c1] + uDW1[r,c2], name = 'udMC2')
-
-          # --- POSITION -- 3: X[c3] = W[c0] + W[c2] ---
-          self.model.addConstr(udx1[r+1,c3] >= udw1[r,c0], name = 'udMC3')
-          self.model.addConstr(udx1[r+1,c3] >= udw1[r,c2], name = 'udMC3')
-          self.model.addConstr(udx1[r+1,c3] <= udw1[r,c0] + udw1[r,c2], name = 'udMC3')
-
-          self.model.addConstr(uDX1[r+1,c3] + uDW1[r,c0] + uDW1[r,c2] >= 2*uDX1[r+1,c3], name = 'udMC3')
-          self.model.addConstr(uDX1[r+1,c3] + uDW1[r,c0] + uDW1[r,c2] >= 2*uDW1[r,c0], name = 'udMC3')
-          self.model.addConstr(uDX1[r+1,c3] + uDW1[r,c0] + uDW1[r,c2] >= 2*uDW1[r,c2], name = 'udMC3')
-          self.model.addConstr(uDX1[r+1,c3] <= uDW1[r,c0] + uDW1[r,c2], name = 'udMC3')
+    W, X = range(self.rEb, uR), range(self.rEb+1, uR+1)
+    # --- POSITION -- 0: X[c0] = X[c3] + W[c3] ---
+    self._or(self._cells(udx1, X, c0), self._cells(udw1, W, c3), self._cells(udx1, X, c3), 'udMC0')
+    self._xor(self._cells(uDX1, X, c0), self._cells(uDW1, W, c3), self._cells(uDX1, X, c3), 'udMC0')
+    # --- POSITION -- 1: X[c1] = W[c0] ---
+    self._eq(self._cells(udx1, X, c1), self._cells(udw1, W, c0), 'udMC1')
+    self._eq(self._cells(uDX1, X, c1), self._cells(uDW1, W, c0), 'udMC1')
+    # --- POSITION -- 2: X[c2] = W[c1] + W[c2] ---
+    self._or(self._cells(udx1, X, c2), self._cells(udw1, W, c1), self._cells(udw1, W, c2), 'udMC2')
+    self._xor(self._cells(uDX1, X, c2), self._cells(uDW1, W, c1), self._cells(uDW1, W, c2), 'udMC2')
+    # --- POSITION -- 3: X[c3] = W[c0] + W[c2] ---
+    self._or(self._cells(udx1, X, c3), self._cells(udw1, W, c0), self._cells(udw1, W, c2), 'udMC3')
+    self._xor(self._cells(uDX1, X, c3), self._cells(uDW1, W, c0), self._cells(uDW1, W, c2), 'udMC3')
     
     ''' 
     ------------------------------
     Key Schedule 
     ------------------------------
     '''
+    self._profile('Key Schedule', section = True)
     uLANE1 = self.model.addVars(16, vtype = GRB.BINARY, name = 'uLANE1')
 
     trans_pos = [1,7,0,5,2,6,4,3,9,15,8,13,10,14,12,11]
 
+    # Cell of the lane i in the round key r: hLane[r][i]
+    R = range(uR)
+    self._geq((uLANE1, [i for r in R for i in range(16)]), (ustk1, [(r, self.hLane[r][i]) for r in R for i in range(16)]), 'uKS')
     for i in range(16):
-      lane_pos = i
-      total_stack_sum = 0
-      for r in range(uR):
-        self.model.addConstr(uLANE1[i] >= ustk1[r, lane_pos], name = 'uKS')
-        total_stack_sum += ustk1[r, lane_pos]
-        lane_pos = self.hTable[lane_pos]
+      total_stack_sum = gp.quicksum(ustk1[r, self.hLane[r][i]] for r in R)
       # math.ceil((uR + self.r0)/16) = cancellations from key schedule
       self.model.addConstr((uR)*uLANE1[i] - total_stack_sum <= 
                             (self.Vs - 1)*math.ceil((uR)/30), name = 'uKS')
 
     # make Key reuse
-    for r in range(30, uR):
-        for i in range(16):
-          self.model.addConstr(ustk1[r-30,i] == ustk1[r,trans_pos[i]], name = 'uKS')
+    self._eq(self._cells(ustk1, range(uR-30)), self._cells(ustk1, range(30, uR), trans_pos), 'uKS')
 
     '''
     ==========================================================================================
     (End) - Upper propagation
     '''
+    self._profile('(End) - Upper propagation', section = True)
 
     '''
     ==========================================================================================
@@ -490,6 +402,7 @@ class IB_ForkSKINNY:
     Note:
     X -(SC&AC)-> Y -(ATK)-> Z -(SR)-> W -(MC)-> X^{r+1}
     '''
+    self._profile('(Begin) - Lower differential propagation', section = True)
     lR = self.rDis + self.rEf
     lDX  = self.model.addVars(range(self.rEb+1, self.rEb+lR+1), 16, vtype = GRB.BINARY, name = 'lDX')
     ldx  = self.model.addVars(range(self.rEb+1, self.rEb+lR+1), 16, vtype = GRB.BINARY, name = 'ldx')
@@ -502,131 +415,75 @@ class IB_ForkSKINNY:
     lstk = self.model.addVars(range(self.rEb, self.rEb+lR), 16, vtype = GRB.BINARY, name = 'lstk')
 
     '''Basic Constrs:'''
+    self._profile('Basic Constrs')
     # Remove dx[r,i] > DX[r,i]
-    for r in range(self.rEb+1,self.rEb+lR):
-      for i in range(16):
-        self.model.addConstr(lDX[r, i] >= ldx[r, i], name='lBasic')
-        self.model.addConstr(lDY[r, i] >= ldy[r, i], name='lBasic')
-        self.model.addConstr(lDZ[r, i] >= ldz[r, i], name='lBasic')
-        self.model.addConstr(lDW[r, i] >= ldw[r, i], name='lBasic')
-    for i in range(16):
-      self.model.addConstr(lDY[self.rEb, i] >= ldy[self.rEb, i], name='lBasic')
-      self.model.addConstr(lDZ[self.rEb, i] >= ldz[self.rEb, i], name='lBasic')
-      self.model.addConstr(lDW[self.rEb, i] >= ldw[self.rEb, i], name='lBasic')
-    for i in range(16):
-      self.model.addConstr(lDX[self.rEb+lR, i] >= ldx[self.rEb+lR, i], name='lBasic')
+    X, R = range(self.rEb+1, self.rEb+lR+1), range(self.rEb, self.rEb+lR)
+    self._geq(self._cells(lDX, X), self._cells(ldx, X), 'lBasic')
+    self._geq(self._cells(lDY, R), self._cells(ldy, R), 'lBasic')
+    self._geq(self._cells(lDZ, R), self._cells(ldz, R), 'lBasic')
+    self._geq(self._cells(lDW, R), self._cells(ldw, R), 'lBasic')
 
     '''Operation: SC'''
+    self._profile('Operation: SC')
     # In distinglisher
-    for r in range(self.rEb+1, self.rEb+self.rDis):
-      for i in range(16):
-        self.model.addConstr(lDX[r,i] == lDY[r,i], name='ldSC')
-        self.model.addConstr(ldx[r,i] == lDY[r,i], name='ldSC')
+    D = range(self.rEb+1, self.rEb+self.rDis)
+    self._eq(self._cells(lDX, D), self._cells(lDY, D), 'ldSC')
+    self._eq(self._cells(ldx, D), self._cells(lDY, D), 'ldSC')
     # In Extension
-    for r in range(self.rEb+self.rDis, self.rEb+lR):
-      for i in range(16):
-        self.model.addConstr(lDY[r,i] == lDX[r,i], name='leSC')
-        self.model.addConstr(ldy[r,i] == lDX[r,i], name='leSC')
+    E = range(self.rEb+self.rDis, self.rEb+lR)
+    self._eq(self._cells(lDY, E), self._cells(lDX, E), 'leSC')
+    self._eq(self._cells(ldy, E), self._cells(lDX, E), 'leSC')
     
     '''(*)Operation: ATK'''
-    for r in range(self.rEb,self.rEb+lR):
-      for i in range(8):
-        # tlr = self.r0 + r
-        self.model.addConstr(ldy[r,i] == ldz[r,i], name='lATK')
-        self.model.addConstr(lstk[r,i] + lDY[r,i] - lDZ[r,i] >= 0, name='lATK')
-        self.model.addConstr(lstk[r,i] - lDY[r,i] + lDZ[r,i] >= 0, name='lATK')
-        self.model.addConstr(-lstk[r,i] + lDY[r,i] + lDZ[r,i] - ldz[r,i] >= 0, name='lATK')
-        self.model.addConstr(lDY[r,i] >= ldz[r,i], name='lATK')
-      for i in range(8,16):
-        self.model.addConstr(lDY[r,i] == lDZ[r,i], name='lATK')
-        self.model.addConstr(ldy[r,i] == ldz[r,i], name='lATK')
+    self._profile('(*)Operation: ATK')
+    L, H = range(8), range(8, 16)
+    self._eq(self._cells(ldy, R, L), self._cells(ldz, R, L), 'lATK')
+    stk, DY, DZ, dz = self._cells(lstk, R, L), self._cells(lDY, R, L), self._cells(lDZ, R, L), self._cells(ldz, R, L)
+    self._mconstr([(1, stk), (1, DY), (-1, DZ)], '>', 0, 'lATK')
+    self._mconstr([(1, stk), (-1, DY), (1, DZ)], '>', 0, 'lATK')
+    self._mconstr([(-1, stk), (1, DY), (1, DZ), (-1, dz)], '>', 0, 'lATK')
+    self._geq(DY, dz, 'lATK')
+    self._eq(self._cells(lDY, R, H), self._cells(lDZ, R, H), 'lATK')
+    self._eq(self._cells(ldy, R, H), self._cells(ldz, R, H), 'lATK')
 
     '''(*)Operation: SR''' 
-    for r in range(self.rEb,self.rEb+lR):
-      for i in range(16):
-        self.model.addConstr(lDZ[r,i] == lDW[r,self.SRp[i]], name='lSR')
-        self.model.addConstr(ldz[r,i] == ldw[r,self.SRp[i]], name='lSR')
+    self._profile('(*)Operation: SR')
+    self._eq(self._cells(lDZ, R), self._cells(lDW, R, self.SRp), 'lSR')
+    self._eq(self._cells(ldz, R), self._cells(ldw, R, self.SRp), 'lSR')
 
     '''Operation: MC'''
+    self._profile('Operation: MC')
+    # NOTE: the 4 columns at once, c0..c3 are the rows of the state
+    c0, c1, c2, c3 = self.MCrow
     # ************ In distinguisher (backword) ************
-    for r in range(self.rEb, self.rEb+self.rDis):
-      for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
-          c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
-
-          # --- POSITION -- 0: W[c0] = X[c1] ---
-          self.model.addConstr(ldw[r,c0] == ldx[r+1,c1], name = 'ldMC0')
-
-          self.model.addConstr(lDW[r,c0] == lDX[r+1,c1], name = 'ldMC0')
-
-          # --- POSITION -- 1: W[c1] = W[c2] + X[c2] ---
-          self.model.addConstr(ldw[r,c1] >= ldw[r,c2], name = 'ldMC1')
-          self.model.addConstr(ldw[r,c1] >= ldx[r+1,c2], name = 'ldMC1')
-          self.model.addConstr(ldw[r,c1] <= ldw[r,c2] + ldx[r+1,c2], name = 'ldMC1')
-
-          self.model.addConstr(lDW[r,c1] + lDW[r,c2] + lDX[r+1,c2] >= 2*lDW[r,c1], name = 'ldMC1')
-          self.model.addConstr(lDW[r,c1] + lDW[r,c2] + lDX[r+1,c2] >= 2*lDW[r,c2], name = 'ldMC1')
-          self.model.addConstr(lDW[r,c1] + lDW[r,c2] + lDX[r+1,c2] >= 2*lDX[r+1,c2], name = 'ldMC1')
-          self.model.addConstr(lDW[r,c1] <= lDW[r,c2] + lDX[r+1,c2], name = 'ldMC1')
-
-          # --- POSITION -- 2: W[c2] = X[c1] + X[c3] ---
-          self.model.addConstr(ldw[r,c2] >= ldx[r+1,c1], name = 'ldMC2')
-          self.model.addConstr(ldw[r,c2] >= ldx[r+1,c3], name = 'ldMC2')
-          self.model.addConstr(ldw[r,c2] <= ldx[r+1,c1] + ldx[r+1,c3], name = 'ldMC2')
-
-          self.model.addConstr(lDW[r,c2] + lDX[r+1,c1] + lDX[r+1,c3] >= 2*lDW[r,c2], name = 'ldMC2')
-          self.model.addConstr(lDW[r,c2] + lDX[r+1,c1] + lDX[r+1,c3] >= 2*lDX[r+1,c1], name = 'ldMC2')
-          self.model.addConstr(lDW[r,c2] + lDX[r+1,c1] + lDX[r+1,c3] >= 2*lDX[r+1,c3], name = 'ldMC2')
-          self.model.addConstr(lDW[r,c2] <= lDX[r+1,c1] + lDX[r+1,c3], name = 'ldMC2')
-
-          # --- POSITION -- 3: W[c3] = X[c0] + X[c3] ---
-          self.model.addConstr(ldw[r,c3] >= ldx[r+1,c0], name = 'ldMC3')
-          self.model.addConstr(ldw[r,c3] >= ldx[r+1,c3], name = 'ldMC3')
-          self.model.addConstr(ldw[r,c3] <= ldx[r+1,c0] + ldx[r+1,c3], name = 'ldMC3')
-
-          self.model.addConstr(lDW[r,c3] + lDX[r+1,c0] + lDX[r+1,c3] >= 2*lDW[r,c3], name = 'ldMC3')
-          self.model.addConstr(lDW[r,c3] + lDX[r+1,c0] + lDX[r+1,c3] >= 2*lDX[r+1,c0], name = 'ldMC3')
-          self.model.addConstr(lDW[r,c3] + lDX[r+1,c0] + lDX[r+1,c3] >= 2*lDX[r+1,c3], name = 'ldMC3')
-          self.model.addConstr(lDW[r,c3] <= lDX[r+1,c0] + lDX[r+1,c3], name = 'ldMC3')
+    W, X = range(self.rEb, self.rEb+self.rDis), range(self.rEb+1, self.rEb+self.rDis+1)
+    # --- POSITION -- 0: W[c0] = X[c1] ---
+    self._eq(self._cells(ldw, W, c0), self._cells(ldx, X, c1), 'ldMC0')
+    self._eq(self._cells(lDW, W, c0), self._cells(lDX, X, c1), 'ldMC0')
+    # --- POSITION -- 1: W[c1] = W[c2] + X[c2] ---
+    self._or(self._cells(ldw, W, c1), self._cells(ldw, W, c2), self._cells(ldx, X, c2), 'ldMC1')
+    self._xor(self._cells(lDW, W, c1), self._cells(lDW, W, c2), self._cells(lDX, X, c2), 'ldMC1')
+    # --- POSITION -- 2: W[c2] = X[c1] + X[c3] ---
+    self._or(self._cells(ldw, W, c2), self._cells(ldx, X, c1), self._cells(ldx, X, c3), 'ldMC2')
+    self._xor(self._cells(lDW, W, c2), self._cells(lDX, X, c1), self._cells(lDX, X, c3), 'ldMC2')
+    # --- POSITION -- 3: W[c3] = X[c0] + X[c3] ---
+    self._or(self._cells(ldw, W, c3), self._cells(ldx, X, c0), self._cells(ldx, X, c3), 'ldMC3')
+    self._xor(self._cells(lDW, W, c3), self._cells(lDX, X, c0), self._cells(lDX, X, c3), 'ldMC3')
 
     # ************ In extension (forward)  ************
-    for r in range(self.rEb+self.rDis, self.rEb+lR):
-      for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
-          c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
-
-          # --- POSITION -- 0: X[c0] = X[c3] + W[c3] ---
-          self.model.addConstr(ldx[r+1,c0] >= ldw[r,c3], name = 'leMC0')
-          self.model.addConstr(ldx[r+1,c0] >= ldx[r+1,c3], name = 'leMC0')
-          self.model.addConstr(ldx[r+1,c0] <= ldw[r,c3] + ldx[r+1,c3], name = 'leMC0')
-
-          self.model.addConstr(lDX[r+1,c0] + lDW[r,c3] + lDX[r+1,c3] >= 2*lDX[r+1,c0], name = 'leMC0')
-          self.model.addConstr(lDX[r+1,c0] + lDW[r,c3] + lDX[r+1,c3] >= 2*lDW[r,c3], name = 'leMC0')
-          self.model.addConstr(lDX[r+1,c0] + lDW[r,c3] + lDX[r+1,c3] >= 2*lDX[r+1,c3], name = 'leMC0')
-          self.model.addConstr(lDX[r+1,c0] <= lDW[r,c3] + lDX[r+1,c3], name = 'leMC0')
-
-          # --- POSITION -- 1: X[c1] = W[c0] ---
-          self.model.addConstr(ldx[r+1,c1] == ldw[r,c0], name = 'leMC1')
-
-          self.model.addConstr(lDX[r+1,c1] == lDW[r,c0], name = 'leMC1')
-
-          # --- POSITION -- 2: X[c2] = X[c1] + W[c2] ---
-          self.model.addConstr(ldx[r+1,c2] >= ldw[r,c1], name = 'leMC2')
-          self.model.addConstr(ldx[r+1,c2] >= ldw[r,c2], name = 'leMC2')
-          self.model.addConstr(ldx[r+1,c2] <= ldw[r,c1] + ldw[r,c2], name = 'leMC2')
-
-          self.model.addConstr(lDX[r+1,c2] + lDW[r,c1] + lDW[r,c2] >= 2*lDX[r+1,c2], name = 'leMC2')
-          self.model.addConstr(lDX[r+1,c2] + lDW[r,c1] + lDW[r,c2] >= 2*lDW[r,c1], name = 'leMC2')
-          self.model.addConstr(lDX[r+1,c2] + lDW[r,c1] + lDW[r,c2] >= 2*lDW[r,c2], name = 'leMC2')
-          self.model.addConstr(lDX[r+1,c2] <= lDW[r,c1] + lDW[r,c2], name = 'leMC2')
-
-          # --- POSITION -- 3: X[c3] = W[c0] + W[c2] ---
-          self.model.addConstr(ldx[r+1,c3] >= ldw[r,c0], name = 'leMC3')
-          self.model.addConstr(ldx[r+1,c3] >= ldw[r,c2], name = 'leMC3')
-          self.model.addConstr(ldx[r+1,c3] <= ldw[r,c0] + ldw[r,c2], name = 'leMC3')
-
-          self.model.addConstr(lDX[r+1,c3] + lDW[r,c0] + lDW[r,c2] >= 2*lDX[r+1,c3], name = 'leMC3')
-          self.model.addConstr(lDX[r+1,c3] + lDW[r,c0] + lDW[r,c2] >= 2*lDW[r,c0], name = 'leMC3')
-          self.model.addConstr(lDX[r+1,c3] + lDW[r,c0] + lDW[r,c2] >= 2*lDW[r,c2], name = 'leMC3')
-          self.model.addConstr(lDX[r+1,c3] <= lDW[r,c0] + lDW[r,c2], name = 'leMC3')
+    W, X = range(self.rEb+self.rDis, self.rEb+lR), range(self.rEb+self.rDis+1, self.rEb+lR+1)
+    # --- POSITION -- 0: X[c0] = X[c3] + W[c3] ---
+    self._or(self._cells(ldx, X, c0), self._cells(ldw, W, c3), self._cells(ldx, X, c3), 'leMC0')
+    self._xor(self._cells(lDX, X, c0), self._cells(lDW, W, c3), self._cells(lDX, X, c3), 'leMC0')
+    # --- POSITION -- 1: X[c1] = W[c0] ---
+    self._eq(self._cells(ldx, X, c1), self._cells(ldw, W, c0), 'leMC1')
+    self._eq(self._cells(lDX, X, c1), self._cells(lDW, W, c0), 'leMC1')
+    # --- POSITION -- 2: X[c2] = W[c1] + W[c2] ---
+    self._or(self._cells(ldx, X, c2), self._cells(ldw, W, c1), self._cells(ldw, W, c2), 'leMC2')
+    self._xor(self._cells(lDX, X, c2), self._cells(lDW, W, c1), self._cells(lDW, W, c2), 'leMC2')
+    # --- POSITION -- 3: X[c3] = W[c0] + W[c2] ---
+    self._or(self._cells(ldx, X, c3), self._cells(ldw, W, c0), self._cells(ldw, W, c2), 'leMC3')
+    self._xor(self._cells(lDX, X, c3), self._cells(lDW, W, c0), self._cells(lDW, W, c2), 'leMC3')
 
 
     ''' 
@@ -634,15 +491,13 @@ class IB_ForkSKINNY:
     Key Schedule 
     ------------------------------
     '''
+    self._profile('Key Schedule', section = True)
     lLANE = self.model.addVars(16, vtype = GRB.BINARY, name = 'lLANE')
 
+    # Cell of the lane i in the round key r: hLane[r - rEb][i]
+    self._geq((lLANE, [i for r in R for i in range(16)]), (lstk, [(r, self.hLane[r-self.rEb][i]) for r in R for i in range(16)]), 'lKS')
     for i in range(16):
-      lane_pos = i
-      kSUM = 0
-      for r in range(self.rEb, self.rEb+lR):
-        self.model.addConstr(lLANE[i] >= lstk[r, lane_pos], name = 'lKS')
-        kSUM += lstk[r, lane_pos]
-        lane_pos = self.hTable[lane_pos]
+      kSUM = gp.quicksum(lstk[r, self.hLane[r-self.rEb][i]] for r in R)
       # math.ceil((self.rEb + self.r0)/16) = cancellations from key schedule
       # Since the statement “lR < 30” and the lR span is only in r1, there are only (Vs-1) cancelations
       self.model.addConstr(kSUM >= (lR)*lLANE[i] - (self.Vs - 1), name = 'lKS')
@@ -652,13 +507,16 @@ class IB_ForkSKINNY:
     ==========================================================================================
     (End) - Lower differential propagation
     '''
+    self._profile('(End) - Lower differential propagation', section = True)
 
     ''' 
     ============================================
             Guess-and-Determine (u)
     ============================================
     '''
+    self._profile('Guess-and-Determine (u)', section = True)
     ''' The first diff. trail '''
+    self._profile('The first diff. trail')
     # NOTE: Assert rEb <= ri and rEb+rEu >= ri
     ugEQK0 = self.model.addVars(range(self.rEb),      16, vtype = GRB.BINARY, name = 'ugEQK0')
     uGstk0 = self.model.addVars(range(self.rEb),      16, vtype = GRB.BINARY, name = 'uGstk0')
@@ -715,6 +573,7 @@ class IB_ForkSKINNY:
     # ----------------- Guessing Eqk -----------------------
 
     ''' KR: Determine and Filter in SC '''
+    self._profile('KR: Determine and Filter in SC')
     for r in range(1, self.rEb+1):
       for i in range(16):
         # 'Det.' propagation via SC (AND ADD EQK)
@@ -736,6 +595,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(- udetYa0[r,i] - uDY0[r,i] + udy0[r,i] + ufrSCa0[r,i] >= -1, name = 'ufrSCa0')
 
     ''' 'Det.' trans Y to Z '''
+    self._profile("'Det.' trans Y to Z")
     for r in range(1, self.rEb):
       for i in range(16):
         self.model.addConstr(uDetY0[r,i] == uDetZ0[r,i], 'udetY2Z')
@@ -743,6 +603,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(udetYa0[r,i] == udetZa0[r,i], 'udety2zA')
 
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(1, self.rEb):
       for i in range(16): 
         self.model.addConstr(uDetW0[r,i] == uDetZ0[r,self.SRpv[i]], name = 'udetSR')
@@ -750,6 +611,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(udetWa0[r,i] == udetZa0[r,self.SRpv[i]], name = 'udetsrA')
 
     ''' KR: 'Det.' propagation in MC '''
+    self._profile("KR: 'Det.' propagation in MC")
     for r in range(1, self.rEb):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -789,6 +651,7 @@ class IB_ForkSKINNY:
           # ===============================================================================================
 
     ''' KR: 'Filter' obtain from MC '''
+    self._profile("KR: 'Filter' obtain from MC")
     for r in range(2,self.rEb+1):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -846,6 +709,7 @@ class IB_ForkSKINNY:
     # -------------------------------------------------------------------------------------
 
     ''' The second diff. trail '''
+    self._profile('The second diff. trail')
     # NOTE: Assert rEb <= ri and rEb+rEu >= ri
     ugEQK1 = self.model.addVars(range(self.rEb),      16, vtype = GRB.BINARY, name = 'ugEQK1')
     uGstk1 = self.model.addVars(range(self.rEb),      16, vtype = GRB.BINARY, name = 'uGstk1')
@@ -902,6 +766,7 @@ class IB_ForkSKINNY:
     # ----------------- Guessing Eqk -----------------------
 
     ''' KR: Determine and Filter in SC '''
+    self._profile('KR: Determine and Filter in SC')
     for r in range(1, self.rEb+1):
       for i in range(16):
         # 'Det.' propagation via SC (AND ADD EQK)
@@ -923,6 +788,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(- udetYa1[r,i] - uDY1[r,i] + udy1[r,i] + ufrSCa1[r,i] >= -1, name = 'ufrSCa1')
 
     ''' 'Det.' trans Y to Z '''
+    self._profile("'Det.' trans Y to Z")
     for r in range(1, self.rEb):
       for i in range(16):
         self.model.addConstr(uDetY1[r,i] == uDetZ1[r,i], 'udetY2Z')
@@ -930,6 +796,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(udetYa1[r,i] == udetZa1[r,i], 'udety2zA')
 
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(1, self.rEb):
       for i in range(16): 
         self.model.addConstr(uDetW1[r,i] == uDetZ1[r,self.SRpv[i]], name = 'udetSR')
@@ -937,6 +804,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(udetWa1[r,i] == udetZa1[r,self.SRpv[i]], name = 'udetsrA')
 
     ''' KR: 'Det.' propagation in MC '''
+    self._profile("KR: 'Det.' propagation in MC")
     for r in range(1, self.rEb):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -976,6 +844,7 @@ class IB_ForkSKINNY:
           # ===============================================================================================
 
     ''' KR: 'Filter' obtain from MC '''
+    self._profile("KR: 'Filter' obtain from MC")
     for r in range(2,self.rEb+1):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -1037,6 +906,7 @@ class IB_ForkSKINNY:
             Guess-and-Determine (l)
     ============================================
     ''' 
+    self._profile('Guess-and-Determine (l)', section = True)
     leR = self.rEb + self.rDis
     totR = self.rEb + self.rDis + self.rEf
     # NOTE: Assert rEb <= ri
@@ -1067,6 +937,7 @@ class IB_ForkSKINNY:
     self.model.addConstr(sum(lDetZ[totR-1,i] for i in range(16)) == 16, name = 'VC')
 
     ''' KR: Determine and Filter in SC '''
+    self._profile('KR: Determine and Filter in SC')
     for r in range(leR, totR):
       for i in range(16):
         # 'Det.' propagation via SC
@@ -1084,6 +955,7 @@ class IB_ForkSKINNY:
         self.model.addConstr(- ldetXa[r,i] - lDX[r,i] + ldx[r,i] + lfrSCa[r,i] >= -1, name = 'lfrSCa')
 
     ''' KR: Guess round key and determine'''
+    self._profile('KR: Guess round key and determine')
     for r in range(leR, totR):
       # rk = r + self.r0
       for i in range(8):
@@ -1100,12 +972,14 @@ class IB_ForkSKINNY:
         self.model.addConstr(ldetYa[r,i] == ldetZa[r,i], name = 'lgkiLa')
 
     ''' KR: 'Det.' propagation in SR '''
+    self._profile("KR: 'Det.' propagation in SR")
     for r in range(leR, totR-1):
       for i in range(16): 
         self.model.addConstr(lDetZ[r,i] == lDetW[r,self.SRp[i]], name = 'ldetSR')
         self.model.addConstr(ldetZa[r,i] == ldetWa[r,self.SRp[i]], name = 'ldetSRa')
 
     ''' KR: 'Det.' propagation in MC '''
+    self._profile("KR: 'Det.' propagation in MC")
     for r in range(leR+1, totR):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -1147,6 +1021,7 @@ class IB_ForkSKINNY:
           self.model.addConstr( - ldetXa[r,c0] - ldetXa[r,c3] + ldetWa[r-1,c3] + 1 >= 0, name = 'ldetMC3a')
 
     ''' KR: 'Filter' obtain from MC '''
+    self._profile("KR: 'Filter' obtain from MC")
     for r in range(leR, totR-1):
       for c in [[0,4,8,12],[1,5,9,13],[2,6,10,14],[3,7,11,15]]:
           c0, c1, c2, c3 = c[0], c[1], c[2], c[3]
@@ -1210,6 +1085,7 @@ class IB_ForkSKINNY:
 
 
     ''' Some para. for clustering two trails '''
+    self._profile('Some para. for clustering two trails')
     pxt = self.model.addVars(16, vtype = GRB.BINARY, name = 'pxt')
     udy = self.model.addVars(16, vtype = GRB.BINARY, name = 'udy')
     uGstk = self.model.addVars(range(self.rEb), 16, vtype = GRB.BINARY, name = 'uGstk')
@@ -1236,9 +1112,11 @@ class IB_ForkSKINNY:
             Key Bridge
     ============================
     '''
+    self._profile('Key Bridge', section = True)
     '''
     For involved key
     '''
+    self._profile('For involved key', section = True)
     iLANE = self.model.addVars(16, vtype = GRB.INTEGER, name = 'iLANE') # Count the number of stk in a LANE
     ikSUM = self.model.addVars(16, ub = self.Vs, vtype = GRB.INTEGER, name = 'ikSUM') # Judge the broundary Vs
     ikz = self.model.addVars(16, vtype = GRB.BINARY, name = 'ikz') # Auxiliary vars. for ikSUM
@@ -1259,6 +1137,7 @@ class IB_ForkSKINNY:
     '''
     For pre-guessed key
     '''
+    self._profile('For pre-guessed key', section = True)
     gLANE = self.model.addVars(16, vtype = GRB.INTEGER, name = 'gLANE') # Count the number of Gstk in a LANE
     gkSUM = self.model.addVars(16, ub = 2, vtype = GRB.INTEGER, name = 'gkSUM') # Judge the broundary Vs
     gkz = self.model.addVars(16, vtype = GRB.BINARY, name = 'gkz') # Auxiliary vars. for gkSUM
@@ -1278,6 +1157,7 @@ class IB_ForkSKINNY:
    
     # ******************************************************
     ''' Contradiction '''
+    self._profile('Contradiction')
     duFX0 = self.model.addVars(range(self.rEb, self.rEb + self.rDis), 16, vtype = GRB.BINARY, name = 'duFX0')
     duFX1 = self.model.addVars(range(self.rEb, self.rEb + self.rDis), 16, vtype = GRB.BINARY, name = 'duFX1')
     duTX0 = self.model.addVars(range(self.rEb, self.rEb + self.rDis), 16, vtype = GRB.BINARY, name = 'duTX0')
@@ -1347,6 +1227,7 @@ class IB_ForkSKINNY:
     ==========================================================================================
          (Begin) - Complexity
     '''
+    self._profile('(Begin) - Complexity', section = True)
 
     rb0  = self.model.addVar(vtype = GRB.INTEGER, name = 'rb0')
     rb1  = self.model.addVar(vtype = GRB.INTEGER, name = 'rb1')
@@ -1356,6 +1237,7 @@ class IB_ForkSKINNY:
     '''
     Parameters
     '''
+    self._profile('Parameters', section = True)
     rb  = self.model.addVar(vtype = GRB.INTEGER, name = 'rb')
     rf  = self.model.addVar(vtype = GRB.INTEGER, name = 'rf')
     cb  = self.model.addVar(vtype = GRB.INTEGER, name = 'cb')
@@ -1394,6 +1276,7 @@ class IB_ForkSKINNY:
     '''
     Complexities
     '''
+    self._profile('Complexities', section = True)
     D   = self.model.addVar(lb = 0, vtype = GRB.CONTINUOUS, name = 'D')
     Dc  = self.model.addVar(lb = 0, vtype = GRB.CONTINUOUS, name = 'Dc')
     Qc  = self.model.addVar(lb = 0, vtype = GRB.CONTINUOUS, name = 'Qc')
@@ -1443,12 +1326,16 @@ class IB_ForkSKINNY:
     self.model.addConstr(Tc >= T31, name = 'Tc')
     self.model.addConstr(Tc >= T32, name = 'Tc')
     self.model.addConstr(Tc >= T4, name = 'Tc')
+    # Cutoff: best Tc found so far (e.g. in a sweep), a model that cannot reach it stops early
+    if Tc_cutoff is not None:
+      Tc.UB = Tc_cutoff
 
 
     
 
 
     ''' Objective function'''
+    self._profile('Objective function')
     self.model.ModelSense = GRB.MINIMIZE
     self.model.setObjectiveN(Tc, index=0, priority=4, name='Min_Tc')
     self.model.setObjectiveN(T32, index=1, priority=3, name='Min_T32')
@@ -1461,7 +1348,7 @@ class IB_ForkSKINNY:
     
     # -------------------- To count mb and mf ------------------------
     mbi  = self.model.addVar(lb = 0, vtype = GRB.INTEGER, name = 'mbi')
-    self.model.addConstr(mbi == sum(ugstka[r,i] for r in range(rEb) for i in range(8)), name = 'mb')
+    self.model.addConstr(mbi == sum(ugstka[r,i] for r in range(self.rEb) for i in range(8)), name = 'mb')
     mfi  = self.model.addVar(lb = 0, vtype = GRB.INTEGER, name = 'mfi')
     self.model.addConstr(mfi == sum(lgstka[r,i] for r in range(leR, totR) for i in range(8)), name = 'mf')
     
@@ -1473,18 +1360,37 @@ class IB_ForkSKINNY:
 
 
     # self.model.setParam("OutputFlag", 0)
-    self.model.write(self.name + '.lp')
-    self.model.optimize()
+    self._profile(None)
+    # Build only (e.g. to cache the built model, see ib_tools.cache)
+    if not solve:
+      self.model.update()
+      return self.model
+    self._export()
+    # MIP start from a previous .sol (matched by variable name, a partial start is completed by Gurobi)
+    if start is not None:
+      # NOTE: read() matches the variables by name, the pending ones (export and profile off) need an update first
+      self.model.update()
+      self.model.read(start)
+    self.model.optimize(self.stop_at_T4(self.model) if self.stop_T4 else None)
+    self._export(solved = True)
+
+    # NOTE: no solution (pruned by the cutoff, infeasible, time limit, interrupted): nothing to print
+    if self.model.SolCount == 0:
+      if self.model.Status == GRB.INFEASIBLE and Tc_cutoff is not None:
+        print('| Pruned: Tc > {} |'.format(Tc_cutoff))
+      else:
+        print('| No solution (status {}) |'.format(self.model.Status))
+      return self.result()
 
     # if self.model.Status == GRB.INFEASIBLE:
     #     print('-'*40 + '\n| Model is infeasible, computing IIS...|\n' + '-'*40)
     #     self.model.computeIIS()
     #     self.model.write(self.name + '.ilp')
-    self.model.write(self.name + '.sol')
 
     # if self.model.Status == 2:
     #   return Tc.x
     # return self.model.Status
+    return self.result()
 
 
   '''
@@ -1498,6 +1404,60 @@ class IB_ForkSKINNY:
     # ln2 = 0.69...
     return round(math.log2(0.7 * x), 1)
 
+  ''' Change x of the built model (RHS only, no rebuilding), then self.model.optimize() again '''
+  def set_x(self, Vx):
+    self.Vx = Vx
+    self.Vz = self.x_to_z(Vx)
+    self.model.getConstrByName('D').RHS = self.b_size + self.Vz/2
+    self.model.getConstrByName('Qc').RHS = self.Vz
+    self.model.getConstrByName('T32').RHS = self.Vz
+    self.model.getConstrByName('T4').RHS = self.k_size - self.Vx
+
+  ''' Solution of the last solve in memory (see IB_Result) '''
+  def result(self):
+    return IB_Result(self.model, self.Vx)
+
+  ''' (X, cells (r,i) of the rounds R) for _mconstr, all 16 cells by default, cells = self.SRp to permute '''
+  def _cells(self, X, R, cells = range(16)):
+    return (X, [(r, i) for r in R for i in cells])
+
+  '''
+  One block of constraints with the matrix API (one sparse row per cell, no addConstr loop):
+    sum(coef * X[k-th cell] for coef, (X, cells) in terms) <sense> rhs, for each k
+  '''
+  def _mconstr(self, terms, sense, rhs, name):
+    n = len(terms[0][1][1])
+    if n == 0:
+      return
+    self.model.update() # Var.index
+    xs = [X[k] for _, (X, cells) in terms for k in cells]
+    # NOTE: only the columns of the variables used (addMConstr over all variables is slow for large models)
+    _, first, col = np.unique([x.index for x in xs], return_index = True, return_inverse = True)
+    row = np.tile(np.arange(n), len(terms))
+    val = np.repeat([coef for coef, _ in terms], n)
+    A = sp.csr_matrix((val, (row, col)), shape = (n, len(first))) # duplicates are summed
+    self.model.addMConstr(A, gp.MVar.fromlist([xs[j] for j in first]), sense, np.full(n, rhs), name = name)
+
+  ''' a == b '''
+  def _eq(self, a, b, name):
+    self._mconstr([(1, a), (-1, b)], '=', 0, name)
+
+  ''' a >= b '''
+  def _geq(self, a, b, name):
+    self._mconstr([(1, a), (-1, b)], '>', 0, name)
+
+  ''' a = b OR c (truncated differences) '''
+  def _or(self, a, b, c, name):
+    self._geq(a, b, name)
+    self._geq(a, c, name)
+    self._mconstr([(1, a), (-1, b), (-1, c)], '<', 0, name)
+
+  ''' a = b XOR c (differences): a + b + c >= 2a, 2b, 2c and a <= b + c '''
+  def _xor(self, a, b, c, name):
+    for t in [a, b, c]:
+      self._mconstr([(1, a), (1, b), (1, c), (-2, t)], '>', 0, name)
+    self._mconstr([(1, a), (-1, b), (-1, c)], '<', 0, name)
+
   ''' n iterations hPermutation '''
   def iterate_hTable(self, pGstk, n):
     current = pGstk
@@ -0,0 +1,21 @@
+'''
+Tools shared by the IB model generators (sweeps, solver drivers, ...).
+
+Run the drivers from the repository root, e.g.:
+  python -m ib_tools.sweep 256 10 104 --pgP --workers 16 --threads 4
+  python -m ib_tools.xsearch 256 2 3 1 3 2 16
+  python -m ib_tools.warmstart old.sol new.sol --shift 1
+  python -m ib_tools.decompose 256 2 7 2 16 --by column --workers 16
+  python -m ib_tools.staged JandD_v2 256 2 3 1 3 2 16 True --time 3600 600 600 300
+  python -m ib_tools.pareto JandD_v2 256 2 3 1 3 2 16 True --x 8 16 24 32 --Mc 40 60 80 --workers 12
+  python -m ib_tools.pool JandD 256 2 3 1 3 2 16 True --delta 0.5 --limit 5000
+  python -m ib_tools.twolevel JandD 256 2 3 1 3 2 16 True -k 32 --workers 16
+  python -m ib_tools.reach 2 1 --weights 1 2
+  python -m ib_tools.presolve SKINNYe_v4 64 4 2 6 2 16 1 --write reduced.lp.bz2
+  python -m ib_tools.cuts JandD 256 2 3 1 3 2 16 True --write JandD_cuts.lp.bz2
+  python -m ib_tools.bct --check --dzn Deoxys Deoxys_tables.dzn
+  python -m ib_tools.verify Deoxys_and_Joltik/verification/Deoxys256_10r.mzn
+  python -m ib_tools.schedule SKINNY64 4 29
+  python -m ib_tools.mznout Deoxys_and_Joltik/verification/Deoxys384_14r.txt
+  python -m ib_tools.instances JandD 256 2 3 1 3 2 16 True --sol patterns/sol --mzn patterns/mzn
+'''
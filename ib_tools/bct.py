@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from ib_tools.models import ROOT
+
+'''
+=====================================================================
+Impossible-BCT (contradiction) tables of the S-boxes, computed with
+NumPy instead of pasted in the verification models
+  BCT[a, b] = #{x : S^-1(S(x) ^ b) ^ S^-1(S(x ^ a) ^ b) == a}
+  contradiction (a, b), a, b != 0: BCT[a, b] == 0, the upper input
+  difference a and the lower output difference b of the S-box of the
+  switch are incompatible
+  S-boxes: Deoxys (AES), Joltik (4-bit), SKINNY64 (4-bit), SKINNY128
+  MiniZinc formats of the verification models:
+    lists:  contr_BCT_table[a, 1..w] = the b of the contradictions
+            (Deoxys*.mzn, _IBCT_Deoxys.txt)
+    masked: iBCT[a, b] = b if contradiction else -1
+            (Joltik*.mzn, _IBCT_Joltik.txt, SKINNYe v2.mzn)
+  and the tables of the MC/key schedule: FF2/FF3 (bits of 2x/3x in
+  GF(2^8)), XOR, A2/N4/N9/Nd (2x/4x/9x/13x in GF(2^4))
+  NOTE: the tables are cached as .npy (<cache_dir>/<S-box>_bct_<hash>.npy),
+        write_dzn() emits them as a compact MiniZinc data file (one line
+        per array) for the models declaring them without value
+=====================================================================
+'''
+
+CACHE_DIR = os.path.join(ROOT, '.ib_cache', 'tables')
+AES_POLY = 0x11b  # x^8 + x^4 + x^3 + x + 1
+GF16_POLY = 0x13  # x^4 + x + 1
+
+
+def gf_mul(a, b, poly, n):
+  ''' a * b in GF(2^n) mod poly '''
+  r = 0
+  while b:
+    if b & 1:
+      r ^= a
+    b >>= 1
+    a <<= 1
+    if a >> n:
+      a ^= poly
+  return r
+
+
+def mul_table(c, poly, n):
+  ''' [c * x for x in GF(2^n)] '''
+  return np.array([gf_mul(c, x, poly, n) for x in range(1 << n)])
+
+
+def _aes_sbox():
+  inv = np.zeros(256, dtype = int)
+  for x in range(1, 256):
+    inv[x] = next(y for y in range(1, 256) if gf_mul(x, y, AES_POLY, 8) == 1)
+  bits = (inv[:, np.newaxis] >> np.arange(8)) & 1
+  out = np.zeros(256, dtype = int)
+  for i in range(8):
+    bit = bits[:, i] ^ bits[:, (i + 4) % 8] ^ bits[:, (i + 5) % 8] ^ bits[:, (i + 6) % 8] ^ bits[:, (i + 7) % 8] ^ (0x63 >> i & 1)
+    out |= bit << i
+  return out
+
+
+def _skinny128_sbox():
+  ''' 4 rounds of x4 ^= ~(x7 | x6), x0 ^= ~(x3 | x2) and a bit permutation (the last one swaps x1 and x2) '''
+  x = np.arange(256)
+  for k in range(4):
+    b = [(x >> i) & 1 for i in range(8)]
+    b[4] = b[4] ^ 1 ^ (b[7] | b[6])
+    b[0] = b[0] ^ 1 ^ (b[3] | b[2])
+    # NOTE: new bits (x7, ..., x0) = old bits perm
+    perm = (2, 1, 7, 6, 4, 0, 3, 5) if k < 3 else (7, 6, 5, 4, 3, 1, 2, 0)
+    x = sum(b[src] << j for j, src in zip(range(7, -1, -1), perm))
+  return x
+
+
+SBOXES = {
+  'Deoxys':    _aes_sbox(),
+  'Joltik':    np.array([0xe, 0x4, 0xb, 0x2, 0x3, 0x8, 0x0, 0x9, 0x1, 0xa, 0x7, 0xf, 0x6, 0xc, 0x5, 0xd]),
+  'SKINNY64':  np.array([0xc, 0x6, 0x9, 0x0, 0x1, 0xa, 0x2, 0xb, 0x3, 0x8, 0x5, 0xd, 0x4, 0xe, 0x7, 0xf]),
+  'SKINNY128': _skinny128_sbox(),
+}
+
+
+def ddt(S):
+  ''' DDT[a, b] = #{x : S(x) ^ S(x ^ a) == b} '''
+  n = len(S)
+  x = np.arange(n)
+  out = S[x] ^ S[x[np.newaxis, :] ^ x[:, np.newaxis]]
+  return np.stack([np.bincount(row, minlength = n) for row in out])
+
+
+def bct(S):
+  ''' BCT[a, b] (boomerang connectivity table), one vectorized pass per b '''
+  n = len(S)
+  x = np.arange(n)
+  S_inv = np.argsort(S)
+  shifted = S[x[np.newaxis, :] ^ x[:, np.newaxis]]  # [a, x] = S(x ^ a)
+  table = np.zeros((n, n), dtype = np.int64)
+  for b in range(n):
+    table[:, b] = ((S_inv[S ^ b][np.newaxis, :] ^ S_inv[shifted ^ b]) == x[:, np.newaxis]).sum(axis = 1)
+  return table
+
+
+def contradictions(name, cache_dir = CACHE_DIR):
+  ''' bool [n, n], True = (a, b) impossible at the switch (BCT == 0, a, b != 0), cached as .npy '''
+  S = np.asarray(SBOXES[name])
+  path = None
+  if cache_dir is not None:
+    key = hashlib.sha256(S.astype(np.int64).tobytes()).hexdigest()[:16]
+    path = os.path.join(cache_dir, '{}_bct_{}.npy'.format(name, key))
+    if os.path.exists(path):
+      return np.load(path)
+  table = bct(S) == 0
+  table[0, :] = table[:, 0] = False
+  if path is not None:
+    os.makedirs(cache_dir, exist_ok = True)
+    # NOTE: written under a temporary name then renamed (several processes may compute the same table)
+    tmp = '{}.{}.npy'.format(path[:-len('.npy')], os.getpid())
+    np.save(tmp, table)
+    os.replace(tmp, path)
+  return table
+
+
+def as_lists(table):
+  '''
+  lists format [n-1, w]: the b of the contradictions of each a != 0, ascending, padded with the last one
+  (a row without contradiction is -1)
+  '''
+  rows = [np.nonzero(row)[0] for row in table[1:]]
+  width = max(1, max(len(row) for row in rows))
+  return np.array([np.pad(row, (0, width - len(row)), mode = 'edge') if len(row) else np.full(width, -1) for row in rows])
+
+
+def as_masked(table):
+  ''' masked format [n-1, n-1]: b if (a, b) is a contradiction else -1 '''
+  b = np.arange(1, len(table))
+  return np.where(table[1:, 1:], b[np.newaxis, :], -1)
+
+
+def ff_bits(c, poly = AES_POLY, n = 8):
+  ''' FF[x, i] = bit i of c * x in GF(2^n) '''
+  return (mul_table(c, poly, n)[:, np.newaxis] >> np.arange(n)) & 1
+
+
+def xor_table(n = 4):
+  x = np.arange(1 << n)
+  return x[:, np.newaxis] ^ x[np.newaxis, :]
+
+
+def tables(cipher, cache_dir = CACHE_DIR):
+  ''' {MiniZinc name: (array, index base)} of the verification models of a cipher '''
+  if cipher == 'Deoxys':
+    return {'contr_BCT_table': (as_lists(contradictions('Deoxys', cache_dir)), 1),
+            'FF2': (ff_bits(2), 0), 'FF3': (ff_bits(3), 0)}
+  table = contradictions(cipher, cache_dir)
+  out = {'iBCT': (as_masked(table), 1), 'XOR': (xor_table(len(table).bit_length() - 1), 0)}
+  if cipher == 'Joltik':
+    out.update({name: (mul_table(c, GF16_POLY, 4), 0) for name, c in [('A2', 2), ('N4', 4), ('N9', 9), ('Nd', 13)]})
+  return out
+
+
+def mzn_array(name, array, base = 0):
+  ''' One line: name = arrayNd(base..., [values]); '''
+  array = np.asarray(array)
+  ranges = ', '.join('{}..{}'.format(base, base + size - 1) for size in array.shape)
+  return '{} = array{}d({}, [{}]);'.format(name, array.ndim, ranges, ','.join(map(str, array.ravel())))
+
+
+def write_dzn(path, cipher, cache_dir = CACHE_DIR):
+  ''' MiniZinc data file of the tables of a cipher (minizinc model.mzn path.dzn) '''
+  with open(path, 'w') as f:
+    f.write('% {} tables (ib_tools.bct)\n'.format(cipher))
+    for name, (array, base) in tables(cipher, cache_dir).items():
+      f.write(mzn_array(name, array, base) + '\n')
+
+
+def read_mzn_array(path, name = None):
+  '''
+  Values of the array `name` of a MiniZinc file (name = array2d(..., [...]);), the % comments are skipped.
+  name None: the whole file is one [...] list (_IBCT_*.txt)
+  '''
+  with open(path) as f:
+    text = re.sub(r'%[^\n]*', '', f.read())
+  if name is not None:
+    match = re.search(r'\b{}\s*=\s*array\dd\((.*?)\]\s*\)\s*;'.format(re.escape(name)), text, re.S)
+    if match is None:
+      raise KeyError('{} not in {}'.format(name, path))
+    text = match.group(1)
+    text = text[text.index('['):]
+  return np.array([int(v) for v in re.findall(r'-?\d+', text)])
+
+
+def checksum(array):
+  return hashlib.sha256(','.join(map(str, np.asarray(array).ravel())).encode()).hexdigest()[:16]
+
+
+# (file, array name, cipher): the tables pasted in the verification models
+PASTED = [
+  ('Deoxys_and_Joltik/verification/_IBCT_Deoxys.txt', None, 'Deoxys'),
+  ('Deoxys_and_Joltik/verification/_IBCT_Joltik.txt', None, 'Joltik'),
+] + [('Deoxys_and_Joltik/verification/{}.mzn'.format(model), name, 'Deoxys')
+     for model in ['Deoxys256_10r', 'Deoxys256_11r', 'Deoxys384_13r', 'Deoxys384_14r']
+     for name in ['contr_BCT_table', 'FF2', 'FF3']
+] + [('Deoxys_and_Joltik/verification/{}.mzn'.format(model), name, 'Joltik')
+     for model in ['Joltik128_10r', 'Joltik128_11r', 'Joltik192_13r', 'Joltik192_14r']
+     for name in ['iBCT', 'XOR', 'A2', 'N4', 'N9', 'Nd']
+] + [('SKINNY_family/verification/SKINNYe v2.mzn', name, 'SKINNY64') for name in ['iBCT', 'XOR']]
+
+
+def check(cache_dir = CACHE_DIR):
+  ''' Compare the computed tables with the pasted ones, one row (dict) per (file, array) '''
+  rows = []
+  for path, name, cipher in PASTED:
+    computed = tables(cipher, cache_dir)['contr_BCT_table' if name is None and cipher == 'Deoxys' else
+                                         'iBCT' if name is None else name][0]
+    pasted = read_mzn_array(os.path.join(ROOT, path), name)
+    rows.append({'file': path, 'array': name or '-', 'cipher': cipher, 'size': pasted.size,
+                 'pasted': checksum(pasted), 'computed': checksum(computed),
+                 'ok': pasted.size == computed.size and (pasted == computed.ravel()).all()})
+  return rows
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Impossible-BCT (contradiction) tables of the S-boxes')
+  parser.add_argument('--check', action = 'store_true', help = 'compare with the tables pasted in the verification models')
+  parser.add_argument('--dzn', nargs = 2, metavar = ('CIPHER', 'PATH'), help = 'write the tables of CIPHER ({}) to PATH'.format(
+    ', '.join(sorted(SBOXES))))
+  parser.add_argument('--cache', default = CACHE_DIR, help = 'directory of the .npy (default: {})'.format(CACHE_DIR))
+  args = parser.parse_args()
+
+  if args.check:
+    rows = check(args.cache)
+    print('='*110)
+    print('|| {:55} | {:15} || {:>6} | {:16} | {:16} || {:3} ||'.format('file', 'array', 'size', 'pasted', 'computed', 'ok'))
+    print('-'*110)
+    for row in rows:
+      print('|| {file:55} | {array:15} || {size:6} | {pasted:16} | {computed:16} || {0:3} ||'.format('yes' if row['ok'] else 'NO', **row))
+    print('='*110)
+  if args.dzn is not None:
+    write_dzn(args.dzn[1], args.dzn[0], args.cache)
+  for name in sorted(SBOXES):
+    table = contradictions(name, args.cache)
+    print('|| {:9} | {:3}-bit | {:6} contradictions ||'.format(name, len(table).bit_length() - 1, int(table.sum())))
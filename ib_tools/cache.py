@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import gurobipy as gp
+
+from ib_tools.models import MODELS, ROOT, load_class, source_hash
+
+'''
+=====================================================================
+Cache of the built models
+  key:  class, sha256 of the generator source, constructor arguments
+        (a change of the generator gives a new key, old files are
+        simply not used anymore)
+  file: <cache_dir>/<entry>_<key>.lp.bz2, the format of the .lp
+        written by every run (multi-objectives, general and quadratic
+        constraints, names of the vars and constrs are kept)
+  NOTE: not MPS, the row names of MPS must be unique (the generators
+        reuse constraint names, and name objectives like constraints)
+  NOTE: the model is built without Tc cutoff/MIP start, apply them
+        after loading (Tc.UB, model.read(sol))
+=====================================================================
+'''
+
+CACHE_DIR = os.path.join(ROOT, '.ib_cache')
+
+
+def cache_key(entry, args):
+  key = repr((MODELS[entry][1], source_hash(entry), tuple(args)))
+  return hashlib.sha256(key.encode()).hexdigest()[:24]
+
+
+def cache_path(entry, args, cache_dir = CACHE_DIR):
+  return os.path.join(cache_dir, '{}_{}.lp.bz2'.format(entry, cache_key(entry, args)))
+
+
+def load_model(entry, args, cache_dir = CACHE_DIR, env = None):
+  '''
+  Built model of load_class(entry)(*args), read from the cache if it is there,
+  otherwise built and written to the cache.
+  Return (model, from_cache)
+  '''
+  path = cache_path(entry, args, cache_dir)
+  if os.path.exists(path):
+    return (gp.read(path, env) if env is not None else gp.read(path)), True
+  ib = load_class(entry)(*args)
+  model = ib.ib_model(solve = False)
+  os.makedirs(cache_dir, exist_ok = True)
+  # NOTE: written under a temporary name then renamed, the workers of a sweep may build the same model
+  tmp = '{}.{}.lp.bz2'.format(path[:-len('.lp.bz2')], os.getpid())
+  model.write(tmp)
+  os.replace(tmp, path)
+  return model, False
+
+
+def clear(cache_dir = CACHE_DIR, entry = None):
+  ''' Remove the cached models (of one entry) '''
+  if not os.path.isdir(cache_dir):
+    return
+  for name in os.listdir(cache_dir):
+    if name.endswith('.lp.bz2') and (entry is None or name.startswith(entry + '_')):
+      os.remove(os.path.join(cache_dir, name))
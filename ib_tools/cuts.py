@@ -0,0 +1,245 @@
+import argparse
+import ast
+import re
+
+import gurobipy as gp
+from gurobipy import GRB
+import numpy as np
+import scipy.sparse as sp
+
+from ib_tools.models import load_class
+
+'''
+=====================================================================
+Library of cipher-aware valid inequalities (cuts) of the built models
+  The MC blocks are small systems of binary variables (one column:
+  4 cells before, 4 cells after MC, the uAC/lAC/leqT column marks)
+  written row by row in the generators. Their LP relaxation is weak,
+  e.g. Deoxys/Joltik: sum(DW) + sum(DZ) >= 5*AC with AC fractional.
+  1. Groups: the rows of the model whose variables all match the
+     cipher pattern, connected by shared variables, one group per
+     column and round (<= max_size variables)
+  2. Patterns: all 0/1 points of the group satisfying its rows
+     (2^size points, NumPy), i.e. the MDS branch number of Deoxys/Joltik
+     (weight 0 or >= 5), the binary MC of SKINNY (SRp, c0..c3)
+  3. Cuts: sum(x[T]) >= k*x[h], k = min of sum(x[T]) over the patterns
+     with x[h] = 1, for every head h and the sets T:
+       - all the other cells of the column
+       - all the other cells but one (disaggregated branch number)
+       - the cells of one side (before/after MC)
+       - one mark (x[h] <= AC)
+     the dominated ones (a subset of T with the same k) are dropped
+  The cuts are valid for the model by construction (true for every
+  pattern of the group rows), added up front (add_cuts) or separated
+  at the nodes (cut_callback, user cuts on the node relaxation)
+=====================================================================
+'''
+
+CIPHERS = {
+  # uDW/uDZ/uAC (MC of the distinguisher/Eb), lDW/lDZ/lAC, leqDW/leqDX/lAC (Ef), leqk/lstk/leqT (stk of Ef)
+  'Deoxys': r'^(u|l|leq)(D[WXZ]|AC|T|k)\d?\[|^lstk\[',
+  # uDW[r]/uDX[r+1] (ueMC/udMC), lDW[r]/lDX[r+1]
+  'SKINNY': r'^[ul]D[WX]\d?\[',
+}
+
+
+def cipher_of(entry):
+  ''' Cut pattern of a registered model '''
+  return 'Deoxys' if entry.startswith('JandD') else 'SKINNY'
+
+
+def _side(name):
+  ''' Side of a cell: name without the last index (e.g. uDW[3,5] -> uDW[3) '''
+  return name.rsplit(',', 1)[0] if ',' in name else name
+
+
+def groups(model, pattern, max_size = 14):
+  '''
+  Groups of binary variables matching pattern, connected by the rows made only of them.
+  Return [(variable indices, row indices)] of the groups with 2..max_size variables
+  '''
+  model.update()
+  variables = model.getVars()
+  A = model.getA().tocsr()
+  match = np.array([re.match(pattern, v.VarName) is not None and v.VType == GRB.BINARY for v in variables], dtype = bool)
+  # NOTE: rows with a variable outside the pattern do not describe the column alone
+  outside = np.asarray(A[:, ~match].getnnz(axis = 1)).ravel() > 0
+  rows = np.nonzero(~outside & (np.diff(A.indptr) > 0))[0]
+  parent = np.arange(len(variables))
+
+  def find(x):
+    while parent[x] != x:
+      parent[x] = parent[parent[x]]
+      x = parent[x]
+    return x
+
+  # NOTE: the columns are joined by their rows of >= 3 variables only, a 2-variable row (SR equality,
+  #       implication between two blocks) only attaches a variable of no column (e.g. X[c1] = W[c0])
+  size = np.diff(A.indptr)
+  joined = np.zeros(len(variables), dtype = bool)
+  for r in sorted(rows, key = lambda r: size[r] < 3):
+    cols = A.indices[A.indptr[r]:A.indptr[r + 1]]
+    if size[r] < 3:
+      cols = cols[np.argsort(joined[cols])[::-1]]
+      if joined[cols].all():
+        continue
+    root = find(cols[0])
+    for c in cols[1:]:
+      parent[find(c)] = root
+    joined[cols] = True
+  members, owner = {}, {}
+  for r in rows:
+    cols = A.indices[A.indptr[r]:A.indptr[r + 1]]
+    root = find(cols[0])
+    if all(find(c) == root for c in cols[1:]):
+      owner.setdefault(root, []).append(r)
+      members.setdefault(root, set()).update(cols)
+  return [(np.array(sorted(members[root])), np.array(owner[root])) for root in members if 2 <= len(members[root]) <= max_size]
+
+
+def _patterns(A, sense, rhs, lb, ub):
+  ''' All 0/1 points [points, n] within the bounds satisfying the rows '''
+  n = A.shape[1]
+  points = ((np.arange(1 << n)[:, np.newaxis] >> np.arange(n)) & 1).astype(float)
+  points = points[((points >= lb) & (points <= ub)).all(axis = 1)]
+  act = points @ A.T
+  ok = np.ones(len(points), dtype = bool)
+  ok &= ((act <= rhs + 1e-9) | (sense != '<')).all(axis = 1)
+  ok &= ((act >= rhs - 1e-9) | (sense != '>')).all(axis = 1)
+  ok &= ((np.abs(act - rhs) <= 1e-9) | (sense != '=')).all(axis = 1)
+  return points[ok]
+
+
+def _group_cuts(points, names):
+  ''' Cuts (h, T, k) of one group (local indices) valid on its patterns '''
+  n = len(names)
+  sides = {}
+  for i, name in enumerate(names):
+    sides.setdefault(_side(name), []).append(i)
+  cells = [i for i in range(n) if len(sides[_side(names[i])]) > 1]
+  marks = [i for i in range(n) if len(sides[_side(names[i])]) == 1]
+  cuts = []
+  for h in range(n):
+    others = [i for i in cells if i != h]
+    sets = [others] + [[i for i in others if i != m] for m in others]
+    sets += [[i for i in side if i != h] for side in sides.values() if len(side) > 1]
+    sets += [[m] for m in marks if m != h]
+    active = points[points[:, h] == 1]
+    found = []
+    for T in sets:
+      if not T:
+        continue
+      k = int(active[:, T].sum(axis = 1).min()) if len(active) else len(T)
+      if k >= 1:
+        found.append((frozenset(T), k))
+    # NOTE: (T, k) is dominated by (T' subset of T, k' >= k)
+    for T, k in set(found):
+      if not any(T2 < T and k2 >= k for T2, k2 in found):
+        cuts.append((h, sorted(T), k))
+  return cuts
+
+
+class Cuts:
+  '''
+  Valid inequalities sum(x[T]) >= k*x[h] of a built model (indices of model.getVars()):
+    matrix [cuts, vars] (sum(x[T]) - k*x[h] >= 0), heads h, number of groups
+  '''
+
+  def __init__(self, matrix, heads, groups):
+    self.matrix, self.heads, self.groups = matrix, heads, groups
+
+  def __len__(self):
+    return self.matrix.shape[0]
+
+  def __repr__(self):
+    return 'Cuts({} cuts, {} groups)'.format(len(self), self.groups)
+
+
+def derive(model, cipher, max_size = 14):
+  '''
+  Cuts of the MC blocks of the built model (cipher: key of CIPHERS or a regex of the names of the variables).
+  Return Cuts
+  '''
+  pattern = CIPHERS.get(cipher, cipher)
+  found = groups(model, pattern, max_size)
+  variables = model.getVars()
+  names = model.getAttr('VarName', variables)
+  lb = np.array(model.getAttr('LB', variables))
+  ub = np.array(model.getAttr('UB', variables))
+  constrs = model.getConstrs()
+  A = model.getA().tocsr()
+  sense = np.array(model.getAttr('Sense', constrs))
+  rhs = np.array(model.getAttr('RHS', constrs))
+  data, row, col, heads = [], [], [], []
+  for idx, rows in found:
+    points = _patterns(A[rows][:, idx].toarray(), sense[rows], rhs[rows], lb[idx], ub[idx])
+    for h, T, k in _group_cuts(points, [names[i] for i in idx]):
+      c = len(heads)
+      heads.append(idx[h])
+      row += [c] * (len(T) + 1)
+      col += [idx[t] for t in T] + [idx[h]]
+      data += [1.0] * len(T) + [-float(k)]
+  matrix = sp.csr_matrix((data, (row, col)), shape = (len(heads), len(variables)))
+  return Cuts(matrix, np.array(heads), len(found))
+
+
+def add_cuts(model, cuts, name = 'cut'):
+  ''' Add all the cuts up front (as constraints), return them (model.remove(...) to drop them) '''
+  x = model.getVars()
+  added = model.addMConstr(cuts.matrix, x, GRB.GREATER_EQUAL, np.zeros(len(cuts)), name = name)
+  model.update()
+  return added
+
+
+def cut_callback(model, cuts, tol = 1e-4, max_cuts = 200, then = None):
+  '''
+  Callback separating the cuts violated by the node relaxations (user cuts, sets PreCrush = 1).
+  then: callback called after (e.g. ib.stop_at_T4(model))
+  '''
+  model.setParam('PreCrush', 1)
+  x = model.getVars()
+  matrix = cuts.matrix
+
+  def callback(model, where):
+    if where == GRB.Callback.MIPNODE and model.cbGet(GRB.Callback.MIPNODE_STATUS) == GRB.OPTIMAL:
+      values = np.array(model.cbGetNodeRel(x))
+      slack = matrix @ values
+      for c in np.argsort(slack)[:max_cuts]:
+        if slack[c] >= -tol:
+          break
+        start, end = matrix.indptr[c], matrix.indptr[c + 1]
+        model.cbCut(sum(a * x[i] for a, i in zip(matrix.data[start:end], matrix.indices[start:end])) >= 0)
+    if then is not None:
+      then(model, where)
+  return callback
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Cipher-aware valid inequalities of the MC blocks of a built model')
+  parser.add_argument('entry', help = 'registered model (ib_tools.models), e.g. JandD, SKINNYe_v4')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, e.g. 256 2 3 1 3 2 16 True')
+  parser.add_argument('--max-size', type = int, default = 14, help = 'maximum number of variables of a group')
+  parser.add_argument('--write', default = None, help = 'write the model with the cuts (e.g. xxx.lp.bz2)')
+  args = parser.parse_args()
+
+  model = load_class(args.entry)(*args.args).ib_model(solve = False)
+  cuts = derive(model, cipher_of(args.entry), args.max_size)
+  relaxed = model.relax()
+  relaxed.setParam('OutputFlag', 0)
+  bounds = []
+  for with_cuts in [False, True]:
+    if with_cuts:
+      add_cuts(relaxed, cuts)
+    try:
+      relaxed.optimize()
+    except gp.GurobiError:
+      pass
+    bounds.append(relaxed.getVarByName('Tc').X if relaxed.Status == GRB.OPTIMAL else None)
+  print('='*90)
+  print('|| {} ||'.format(cuts))
+  print('|| LP bound of Tc: {} -> {} ||'.format(*bounds))
+  print('='*90)
+  if args.write is not None:
+    add_cuts(model, cuts)
+    model.write(args.write)
@@ -0,0 +1,107 @@
+import argparse
+import contextlib
+import os
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from ib_tools.models import load_class
+from ib_tools.sweep import _collect, solve_pool, write_table
+
+'''
+=====================================================================
+Decomposition of IB_DandJ v3 (arbitrary contradiction) over the
+position of the contradiction
+  1. Pin the contradiction (ib.pin) to one (round, cell) or one
+     (round, column) of the distinguisher [round_Eb, round_Eb+round_Dis)
+  2. Solve the small subproblems in a process pool, with the best Tc
+     found so far as cutoff (see ib_tools.sweep.solve_pool)
+  3. min Tc of the subproblems = Tc of the whole model
+  NOTE: every contradiction lies in (at least) one pin, no solution is
+        lost, an INFEASIBLE pin without cutoff has no contradiction
+=====================================================================
+'''
+
+def enumerate_pins(round_Eb, round_Dis, by = 'cell'):
+  ''' (round, cells) of the distinguisher, by 'cell' (16 per round) or 'column' (4 per round, cells 4c..4c+3) '''
+  if by == 'cell':
+    cells = [[i] for i in range(16)]
+  else:
+    cells = [[4*c + i for i in range(4)] for c in range(4)]
+  return [(r, c) for r in range(round_Eb, round_Eb + round_Dis) for c in cells]
+
+
+def _solve_pin(entry, args, pin, out_dir, threads, time_limit, Tc_cutoff = None):
+  ''' Worker: build and solve the model with the contradiction pinned to pin, Gurobi log and table go to out_dir '''
+  ib = load_class(entry)(*args)
+  ib.pin = pin
+  ib.name = os.path.join(out_dir, os.path.basename(ib.name) + '_pin{}-{}'.format(pin[0], '-'.join(map(str, pin[1]))))
+  with open(ib.name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    ib.model.setParam('LogToConsole', 0)
+    ib.model.setParam('LogFile', ib.name + '.log')
+    ib.model.setParam('Threads', threads)
+    if time_limit is not None:
+      ib.model.setParam('TimeLimit', time_limit)
+    try:
+      ib.ib_model(Tc_cutoff)
+    except gp.GurobiError:
+      pass # Gurobi error (e.g. license limits), the row has no solution
+  return _collect(ib.model)
+
+
+def decompose(key_size, round_Eb, round_Dis, round_Ef, setX, pgP, by = 'cell', workers = None, threads = 1,
+              out_dir = './decompose', time_limit = None, prune = True, Tc_cutoff = None, entry = 'JandD_v3'):
+  '''
+  Solve IB_DandJ(key_size, round_Eb, round_Dis, round_Ef, setX, pgP) as one subproblem per pin.
+  Return one row (dict) per pin, sorted by Tc (the first row is the optimum if no pin hit the time limit).
+  '''
+  assert(key_size in [128, 192, 256, 384]), 'ERROR: key_size not in Joltik-BC/Deoxys-BC'
+  if workers is None:
+    workers = max(1, os.cpu_count() // threads)
+  os.makedirs(out_dir, exist_ok = True)
+
+  args = (key_size, round_Eb, round_Dis, round_Ef, setX, pgP)
+  jobs = ((pin, _solve_pin, (entry, args, pin, out_dir, threads, time_limit)) for pin in enumerate_pins(round_Eb, round_Dis, by))
+  rows = []
+  for pin, cutoff, result in solve_pool(jobs, workers, Tc_cutoff, prune):
+    row = {'round': pin[0], 'cells': '-'.join(map(str, pin[1])), 'cutoff': cutoff}
+    row.update(result)
+    rows.append(row)
+    pruned = row['status'] == GRB.INFEASIBLE and cutoff is not None
+    print('|| round = {:2} | cells = {:11} | status = {:2} | Tc = {} ||{}'.format(
+      pin[0], row['cells'], row['status'], row['Tc'], ' pruned (Tc > {})'.format(cutoff) if pruned else ''))
+  rows.sort(key = lambda row: (row['Tc'] is None, row['Tc'], row['T32']))
+  return rows
+
+
+def print_table(rows):
+  print('='*90)
+  print('|| round |    cells    || status ||     Tc     |     T32    |     Dc     || time(s) ||')
+  print('-'*90)
+  for row in rows:
+    print('|| {round:5} | {cells:11} || {status:6} || '.format(**row) +
+          ' | '.join('{:10}'.format('-' if row[k] is None else round(row[k], 2)) for k in ['Tc', 'T32', 'Dc']) +
+          ' || {:7} ||'.format(row['time']))
+  print('='*90)
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Decomposition of IB_DandJ v3 over the position of the contradiction')
+  parser.add_argument('key_size', type = int, help = '128/192 (Joltik-BC), 256/384 (Deoxys-BC)')
+  parser.add_argument('split', type = int, nargs = 3, metavar = 'R', help = 'round_Eb round_Dis round_Ef')
+  parser.add_argument('setX', type = int)
+  parser.add_argument('--pgP', action = 'store_true', help = 'chosen plaintext (default: chosen ciphertext)')
+  parser.add_argument('--by', choices = ['cell', 'column'], default = 'cell', help = 'one subproblem per (round, cell) or (round, column)')
+  parser.add_argument('--workers', type = int, default = None, help = 'default: cpu_count // threads')
+  parser.add_argument('--threads', type = int, default = 1, help = 'Gurobi threads per worker')
+  parser.add_argument('--time-limit', type = float, default = None, help = 'per subproblem (s)')
+  parser.add_argument('--no-prune', action = 'store_true', help = 'solve every subproblem to optimality')
+  parser.add_argument('--cutoff', type = float, default = None, help = 'initial Tc cutoff')
+  parser.add_argument('--out', default = './decompose', help = 'directory of the logs/table')
+  args = parser.parse_args()
+
+  rows = decompose(args.key_size, *args.split, args.setX, args.pgP, args.by, args.workers, args.threads, args.out,
+                   args.time_limit, not args.no_prune, args.cutoff)
+  print_table(rows)
+  write_table(rows, os.path.join(args.out, 'decompose_{}_{}_{}_x{}.csv'.format(args.key_size, '-'.join(map(str, args.split)), args.by, args.setX)))
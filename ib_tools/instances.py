@@ -0,0 +1,251 @@
+import argparse
+import ast
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from ib_tools import verify
+from ib_tools.models import ROOT
+from ib_tools.result import IB_Result
+from ib_tools.warmstart import read_sol
+
+'''
+=====================================================================
+Verification instances of the solved MILP patterns (JandD, JandD_v2,
+Deoxys-BC-256/384), no hand transcription of the pattern facts
+  Source: an IB_Result (ib.result(), .npz of IB_Result.save) or a .sol
+  (export, pool --sol), read as {name: {index: value}}
+  Pattern (ib_tools.verify, same round index as the MILP, tR = the
+  last lstk round):
+    stk:  ustk/lstk of every round, 0: "= 0", 1: ">= 1"
+    _MC:  a column of DZ[r] active in the distinguisher (upper: Eb..
+          end_u-1, lower: start_l-Em..end_l-Ef-1) whose DX[r+1] is
+          zero, i.e. stk[r+1] cancels MC(DZ[r]) completely, with the
+          dz of its cells (DZ = 0: "= 0", DZ - dz = 1: ">= 1",
+          truncated: free)
+    BCT:  the first cell i fixed in both trails (cFF[i] = (uDX -
+          udx)[end_u, i] * (lDY - ldy)[start_l-1, i]) with uDW[end_u-1,
+          i] = 0 (upper input difference = ustk[end_u, i]) and the
+          lower dz cell of SR(i) defined by a _MC
+  the conditions out of these forms (partial cancellation of a
+  column, contradiction on a state difference) are not expressible
+  with the tweakey alone, they are listed as skipped
+  1. check(): the native checker (verify.find) on the pattern
+  2. write_mzn(): the MODEL part of a Deoxys*.mzn template replaced
+     by the conditions (minizinc ... > xxx.txt, ib_tools.mznout)
+  NOTE: a pattern with skipped conditions is only partly verified, a
+        pattern without a BCT condition is reported as partial and
+        failed (the contradiction itself is not verified)
+=====================================================================
+'''
+
+ENTRIES = ['JandD', 'JandD_v2']
+TEMPLATES = {2: 'Deoxys_and_Joltik/verification/Deoxys256_10r.mzn',
+             3: 'Deoxys_and_Joltik/verification/Deoxys384_13r.mzn'}
+SR = [0, 5, 10, 15, 4, 9, 14, 3, 8, 13, 2, 7, 12, 1, 6, 11] # SRpermutation_rev of the generators
+
+_indexed = re.compile(r'^([^\[]+)\[(-?\d+)(?:,(\d+))?\]$')
+
+
+class Split:
+  ''' Round split of IB_DandJ(key_size, round_Eb, round_Eu, round_Em, round_El, round_Ef, ...) '''
+
+  def __init__(self, key_size, round_Eb, round_Eu, round_Em, round_El, round_Ef):
+    if key_size not in [256, 384]:
+      raise ValueError('only Deoxys-BC-256/384 patterns are verified natively (key size {})'.format(key_size))
+    self.s = key_size // 128
+    self.round_Eb, self.round_Em, self.round_Ef = round_Eb, round_Em, round_Ef
+    self.end_round_u = round_Eb + round_Eu
+    self.start_round_l = self.end_round_u + round_Em
+    self.end_round_l = self.start_round_l + round_El + round_Ef
+
+  def __repr__(self):
+    return 'Split(TK{}, end_u = {}, start_l = {}, end_l = {})'.format(self.s, self.end_round_u, self.start_round_l, self.end_round_l)
+
+
+def values_of_result(result):
+  ''' {name: {(r, i) or (i,): value}} of an IB_Result '''
+  values = {}
+  for name, array in result.trails.items():
+    values[name] = {(result.first[name] + k, i): int(v) for (k, i), v in np.ndenumerate(array) if v >= 0}
+  for name, array in result.cells.items():
+    values[name] = {(i,): int(v) for (i,), v in np.ndenumerate(array) if v >= 0}
+  return values
+
+
+def values_of_sol(sol):
+  ''' {name: {(r, i) or (i,): value}} of a .sol ({name: value}, read_sol) '''
+  values = {}
+  for name, value in sol.items():
+    m = _indexed.match(name)
+    if m is not None:
+      index = (int(m.group(2)),) if m.group(3) is None else (int(m.group(2)), int(m.group(3)))
+      values.setdefault(m.group(1), {})[index] = int(round(value))
+  return values
+
+
+def load(path):
+  ''' {name: {index: value}} of a .npz (IB_Result.save) or a .sol '''
+  return values_of_result(IB_Result.load(path)) if path.endswith('.npz') else values_of_sol(read_sol(path))
+
+
+def _get(values, name, *index):
+  return values.get(name, {}).get(index, 0)
+
+
+def _state(values, trail, name, r, c):
+  ''' False: zero, True: fixed nonzero (D - d = 1), None: truncated '''
+  D, d = _get(values, trail + name.upper(), r, c), _get(values, trail + name.lower(), r, c)
+  return False if not D else (None if d else True)
+
+
+def pattern_of(values, split):
+  '''
+  Pattern (ib_tools.verify) of a solution {name: {index: value}} of a split.
+  Return (Pattern, skipped [str])
+  '''
+  pattern = verify.Pattern(split.s, split.end_round_l)
+  skipped = []
+  ranges = {'u': (range(split.end_round_u + split.round_Em + 1), range(split.round_Eb, split.end_round_u)),
+            'l': (range(split.start_round_l - 1, split.end_round_l + 1),
+                  range(split.start_round_l - split.round_Em, split.end_round_l - split.round_Ef))}
+  for trail, (stk_rounds, mc_rounds) in ranges.items():
+    for r in stk_rounds:
+      for c in range(16):
+        pattern.stk[(trail, r, c)] = bool(_get(values, trail + 'stk', r, c))
+    for r in mc_rounds:
+      for col in range(4):
+        cells = range(4*col, 4*col + 4)
+        if not any(_get(values, trail + 'DZ', r, c) for c in cells):
+          continue
+        if any(_get(values, trail + 'DX', r + 1, c) for c in cells):
+          if any(_get(values, trail + 'can', r + 1, c) for c in cells):
+            skipped.append('{}: partial cancellation of MC(DZ[{},{}])'.format(trail, r, col))
+          continue
+        pattern.mc.append((trail, r, col))
+        for c in cells:
+          state = _state(values, trail, 'DZ', r, c)
+          if state is not None:
+            pattern.dz[(r, c)] = state
+  # contradiction
+  r_u, r_l = split.end_round_u, split.start_round_l - 1
+  covered = verify._covered(pattern)
+  # NOTE: cFF[i] recomputed from the trails, the solutions of the models before cFF (.sol of the repository) have none
+  for i in [i for i in range(16) if _state(values, 'u', 'DX', r_u, i) and _state(values, 'l', 'DY', r_l, i)]:
+    j = SR.index(i)
+    if _get(values, 'uDW', r_u - 1, i):
+      skipped.append('cFF[{}]: upper difference of the state (uDW[{},{}] active)'.format(i, r_u - 1, i))
+    elif (r_l, j) not in covered:
+      skipped.append('cFF[{}]: lower dz[{},{}] not defined by a _MC'.format(i, r_l, j))
+    elif not pattern.bct:
+      pattern.bct.append(((r_l, j), ('u', r_u, i)))
+  if not pattern.bct:
+    skipped.append('no contradiction expressible with the tweakey alone')
+  return pattern, skipped
+
+
+def _cell_list(cells):
+  return '0..15' if cells == list(range(16)) else '[{}]'.format(','.join(map(str, cells)))
+
+
+def model_lines(pattern):
+  ''' Constraints of the MODEL part (the forms read by verify.read_pattern) '''
+  lines = []
+  for trail in verify.TRAILS:
+    for r in sorted({r for t, r, _ in pattern.stk if t == trail}):
+      for active, op in [(True, '>= 1'), (False, '= 0')]:
+        cells = [c for c in range(16) if pattern.stk.get((trail, r, c)) is active]
+        if cells:
+          lines.append('constraint forall(c in {})({}stk_int[{},c] {});'.format(_cell_list(cells), trail, r, op))
+    for t, r, col in pattern.mc:
+      if t != trail:
+        continue
+      lines.append('constraint _MC({},{},dz_int,dz,{}stk);'.format(r, col, trail))
+      for active, op in [(True, '>= 1'), (False, '= 0')]:
+        cells = [c for c in range(4*col, 4*col + 4) if pattern.dz.get((r, c)) is active]
+        if cells:
+          lines.append('constraint forall(c in {})(dz_int[{},c] {});'.format(_cell_list(cells), r, op))
+    lines.append('%---------------')
+  for (r, c), (t, r2, c2) in pattern.bct:
+    lines.append('constraint dz_int[{},{}] in [contr_BCT_table[{}stk_int[{},{}],i] | i in 1..128];'.format(r, c, t, r2, c2))
+  return lines
+
+
+def write_mzn(pattern, path, template = None, comment = None):
+  '''
+  Verification model of the pattern: the template (default: the Deoxys .mzn of TKs) with tR and the MODEL part
+  replaced (the declarations, schedule and _MC predicate are kept)
+  '''
+  with open(os.path.join(ROOT, template or TEMPLATES[pattern.s])) as f:
+    lines = f.readlines()
+  begin = next(k for k, line in enumerate(lines) if line.startswith('%') and 'MODEL' in line)
+  end = next(k for k, line in enumerate(lines) if line.startswith('%   Mix'))
+  head = re.sub(r'\bint:\s*tR\s*=\s*\d+\s*;', 'int: tR = {};'.format(pattern.rounds), ''.join(lines[:begin]))
+  bar = '='*47
+  with open(path, 'w') as f:
+    f.write(head)
+    if comment is not None:
+      f.write('% {}\n'.format(comment))
+    f.write('% {} MODEL (begin) {}\n'.format(bar, bar))
+    f.write('\n'.join(model_lines(pattern)) + '\n')
+    f.write('% {} MODEL (end) {}\n\n\n'.format(bar, bar))
+    f.write(''.join(lines[end:]))
+
+
+def check(pattern, **kwargs):
+  ''' verify.find on the pattern, return (tk or None, stats) '''
+  return verify.find(pattern, **kwargs)
+
+
+def solutions(paths):
+  ''' The .npz/.sol of the paths (directories: their .npz/.sol, sorted) '''
+  for path in paths:
+    if os.path.isdir(path):
+      for f in sorted(os.listdir(path)):
+        if f.endswith(('.npz', '.sol')):
+          yield os.path.join(path, f)
+    else:
+      yield path
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Verification instances of solved MILP patterns (native check, .mzn)')
+  parser.add_argument('entry', choices = ENTRIES, help = 'registered model of the solutions (ib_tools.models)')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, e.g. 256 2 3 1 3 2 16 True')
+  parser.add_argument('--sol', nargs = '+', required = True, help = '.npz (IB_Result.save), .sol or directories (pool --sol)')
+  parser.add_argument('--mzn', default = None, help = 'also write <dir>/<name>.mzn (verification model) of each solution')
+  parser.add_argument('--batch', type = int, default = 1 << 14, help = 'candidate tweakeys per batch')
+  parser.add_argument('--max-batches', type = int, default = 64, help = 'batches sampled from a large kernel')
+  parser.add_argument('--exhaustive', type = int, default = 20, help = 'enumerate the kernels up to this dimension')
+  parser.add_argument('--seed', type = int, default = 0)
+  args = parser.parse_args()
+
+  split = Split(*args.args[:6])
+  if args.mzn is not None:
+    os.makedirs(args.mzn, exist_ok = True)
+  failed = 0
+  print('='*110)
+  for path in solutions(args.sol):
+    start = time.perf_counter()
+    pattern, skipped = pattern_of(load(path), split)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if args.mzn is not None:
+      write_mzn(pattern, os.path.join(args.mzn, name + '.mzn'), comment = 'pattern of {} ({} {})'.format(
+        os.path.basename(path), args.entry, ' '.join(map(str, args.args))))
+    tk, stats = check(pattern, batch = args.batch, max_batches = args.max_batches, exhaustive = args.exhaustive, seed = args.seed)
+    elapsed = time.perf_counter() - start
+    # NOTE: without a BCT condition only the trails are instantiated, not the contradiction
+    found = ('found' if pattern.bct else 'partial') if tk is not None else 'none (proof)' if stats['exhaustive'] else 'none'
+    print('|| {:36} | {:62} || dim {:3} | {:12} | {:.3f} s ||'.format(name[:36], repr(pattern), stats['dim'], found, elapsed))
+    for note in skipped:
+      print('||   skipped: {} ||'.format(note))
+    if tk is not None:
+      verify.print_instantiation(tk, pattern)
+    failed += tk is None or not pattern.bct
+  print('='*110)
+  # NOTE: exit status 1 if a pattern has no instantiation or no contradiction (pipeline stage)
+  sys.exit(1 if failed else 0)
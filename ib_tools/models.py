@@ -0,0 +1,46 @@
+import hashlib
+import importlib.util
+import os
+
+'''
+=====================================================================
+Registry of the model generators.
+  The generators are standalone scripts (some file names contain
+  spaces), so they are loaded from their path instead of imported.
+  entry: (path from the repository root, class name)
+=====================================================================
+'''
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODELS = {
+  # IB_DandJ(key_size, round_Eb, round_Eu, round_Em, round_El, round_Ef, setX, pgP)
+  'JandD':      ('Deoxys_and_Joltik/pattern/_IB_JandD.py', 'IB_DandJ'),
+  'JandD_v2':   ('Deoxys_and_Joltik/pattern/v2_tradeoff_TMD/_IB_JandD v2.py', 'IB_DandJ'),
+  # IB_DandJ(key_size, round_Eb, round_Dis, round_Ef, setX, pgP)
+  'JandD_v3':   ('Deoxys_and_Joltik/pattern/v3_arbitrary_contradiction/_v3_IB_Deoxys_Joltik.py', 'IB_DandJ'),
+  'JandD_v4':   ('Deoxys_and_Joltik/pattern/v4_3diff.trail/_v4_IB_Deoxys_Joltik_releaseEb.py', 'IB_DandJ'),
+  # IB_ForkSKINNY(b_size, Vs, ri, r0, r1, rEb, rEu, rEl, rEf, Vx, cP)
+  'ForkSKINNY': ('SKINNY_family/pattern/_IB_ForkSKINNY (TK2).py', 'IB_ForkSKINNY'),
+  'SKINNYe':    ('SKINNY_family/pattern/_IB_SKINNYe v2 (TK4) .py', 'IB_ForkSKINNY'),
+  # IB_ForkSKINNY(b_size, Vs, rEb, rDis, rEf, Vx, cP)
+  'SKINNYe_v3': ('SKINNY_family/pattern/v3_arbitrary_contradiction/v3_IB_SKINNYe v2 (TK4) .py', 'IB_ForkSKINNY'),
+  'SKINNYe_v4': ('SKINNY_family/pattern/v4_3diff.trail/v4_IB_SKINNYe v2 (TK4) .py', 'IB_ForkSKINNY'),
+}
+
+_loaded = {}
+
+def load_class(entry):
+  ''' Load the generator class of a registered entry '''
+  if entry not in _loaded:
+    path, cls_name = MODELS[entry]
+    spec = importlib.util.spec_from_file_location('ib_model_' + entry, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _loaded[entry] = getattr(module, cls_name)
+  return _loaded[entry]
+
+
+def source_hash(entry):
+  ''' sha256 of the generator source (invalidates everything derived from a built model) '''
+  with open(os.path.join(ROOT, MODELS[entry][0]), 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
@@ -0,0 +1,283 @@
+import argparse
+import codecs
+import os
+import re
+import sys
+
+import numpy as np
+
+from ib_tools import schedule, verify
+from ib_tools.models import ROOT
+
+'''
+=====================================================================
+Streaming reader of the MiniZinc outputs of the verification models
+(Deoxys*/Joltik*.txt, SKINNYe v2.txt)
+  Encoding: BOM (UTF-16 LE/BE, UTF-8) or UTF-16 LE without BOM
+            (every other byte 0), else UTF-8/ASCII
+  The text is tokenized by chunks (no full read), the values go
+  straight into NumPy arrays:
+    name = arrayNd(a..b, ..., [v, ...]);   (any N)
+    name = [| 0: 1: ... | 0: v, ... | ... |];   (2D tables, labels
+                                                 = index base)
+    name = [v, ...];  name = v;  (true/false = 1/0)
+  one solution per "----------" block ("==========" ends the search)
+  validate() checks a solution against the pattern that produced it:
+    bits:     the bit arrays (dz, ustk, utk, ...) against the *_int
+    schedule: the stk of every round recomputed from the round-0
+              tweakey differences (ib_tools.schedule)
+    pattern:  Deoxys, the conditions of the .mzn (ib_tools.verify):
+              MC^-1 of the stk against dz, every condition satisfied
+  the CLI exits with status 1 if a check fails
+=====================================================================
+'''
+
+TOKEN = re.compile(r'\s*(?:(-?\d+)|([A-Za-z_]\w*)|(\[\||\|\]|\.\.|-{10,}|={10,}|[=\[\](),;:|]))')
+MARGIN = 256
+
+
+def encoding(path):
+  ''' Encoding of a MiniZinc output (BOM, else UTF-16 LE if every other byte is 0, else UTF-8) '''
+  with open(path, 'rb') as f:
+    head = f.read(64)
+  if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+    return 'utf-16'
+  if head.startswith(codecs.BOM_UTF8):
+    return 'utf-8-sig'
+  if len(head) > 1 and head[1::2].count(0) == len(head[1::2]):
+    return 'utf-16-le'
+  return 'utf-8'
+
+
+def _tokens(f, size = 1 << 16):
+  ''' (kind, value) of the text stream f read by chunks, kind 'int', 'name' or 'sym' '''
+  buf, pos, eof = '', 0, False
+  while True:
+    # NOTE: a margin of unread text so that no token is cut at the end of the chunk
+    if not eof and len(buf) - pos < MARGIN:
+      chunk = f.read(size)
+      buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+      continue
+    m = TOKEN.match(buf, pos)
+    if m is None:
+      if buf[pos:].strip():
+        raise ValueError('unexpected text: {!r}'.format(buf[pos:pos + 40]))
+      return
+    pos = m.end()
+    if m.group(1) is not None:
+      yield 'int', int(m.group(1))
+    elif m.group(2) is not None:
+      name = m.group(2)
+      yield ('int', int(name == 'true')) if name in ['true', 'false'] else ('name', name)
+    else:
+      yield 'sym', m.group(3)
+
+
+class _Stream:
+  ''' Tokens with one token of lookahead '''
+
+  def __init__(self, tokens):
+    self.tokens, self.ahead = tokens, None
+
+  def next(self):
+    if self.ahead is not None:
+      token, self.ahead = self.ahead, None
+      return token
+    return next(self.tokens, (None, None))
+
+  def peek(self):
+    if self.ahead is None:
+      self.ahead = next(self.tokens, (None, None))
+    return self.ahead
+
+  def expect(self, sym):
+    kind, value = self.next()
+    if (kind, value) != ('sym', sym):
+      raise ValueError('expected {!r}, got {!r}'.format(sym, value))
+
+
+def _values(stream, end):
+  ''' Integers separated by commas up to the symbol end (consumed) '''
+  while True:
+    kind, value = stream.next()
+    if kind == 'int':
+      yield value
+    elif (kind, value) == ('sym', end):
+      return
+    elif (kind, value) != ('sym', ','):
+      raise ValueError('unexpected {!r} in a list'.format(value))
+
+
+def _array_nd(stream, n):
+  ''' arrayNd(a..b, ..., [values]) after "arrayNd" -> (array, base) '''
+  stream.expect('(')
+  shape, base = [], []
+  for _ in range(n):
+    low = stream.next()[1]
+    stream.expect('..')
+    high = stream.next()[1]
+    stream.expect(',')
+    shape.append(high - low + 1)
+    base.append(low)
+  stream.expect('[')
+  values = np.fromiter(_values(stream, ']'), dtype = np.int64)
+  stream.expect(')')
+  if values.size != np.prod(shape):
+    raise ValueError('{} values for the shape {}'.format(values.size, shape))
+  return values.reshape(shape), tuple(base)
+
+
+def _table(stream):
+  ''' [| 0: 1: ... | 0: v, ... |] after "[|" -> (array, base), the labels give the base (default 1) '''
+  header, rows = [], []
+  labels, values = [], []
+  while True:
+    kind, value = stream.next()
+    if kind == 'int':
+      if stream.peek() == ('sym', ':'):
+        stream.next()
+        labels.append(value)
+      else:
+        values.append(value)
+    elif kind == 'sym' and value in ['|', '|]']:
+      # NOTE: a segment of labels only is the header (column labels)
+      if values:
+        rows.append((labels[0] if labels else None, values))
+      elif labels:
+        header = labels
+      labels, values = [], []
+      if value == '|]':
+        break
+    elif (kind, value) != ('sym', ','):
+      raise ValueError('unexpected {!r} in a table'.format(value))
+  base = (rows[0][0] if rows and rows[0][0] is not None else 1, header[0] if header else 1)
+  return np.array([row for _, row in rows], dtype = np.int64), base
+
+
+def iter_arrays(path):
+  ''' (solution, name, array, base) of a MiniZinc output, read by chunks '''
+  with open(path, encoding = encoding(path)) as f:
+    stream = _Stream(_tokens(f))
+    solution = 0
+    while True:
+      kind, value = stream.next()
+      if kind is None:
+        return
+      if kind == 'sym' and value.startswith('-'):
+        solution += 1
+        continue
+      if kind == 'sym' and value.startswith('='):
+        continue
+      if kind != 'name':
+        raise ValueError('expected a name, got {!r}'.format(value))
+      name = value
+      stream.expect('=')
+      kind, value = stream.next()
+      m = re.fullmatch(r'array(\d)d', value) if kind == 'name' else None
+      if m:
+        array, base = _array_nd(stream, int(m.group(1)))
+      elif (kind, value) == ('sym', '[|'):
+        array, base = _table(stream)
+      elif (kind, value) == ('sym', '['):
+        array, base = np.fromiter(_values(stream, ']'), dtype = np.int64), (1,)
+      elif kind == 'int':
+        array, base = np.array(value), ()
+      else:
+        raise ValueError('unsupported value of {}: {!r}'.format(name, value))
+      stream.expect(';')
+      yield solution, name, array, base
+
+
+def read_solutions(path):
+  ''' [{name: array}] per solution of a MiniZinc output '''
+  solutions = []
+  for solution, name, array, _ in iter_arrays(path):
+    while len(solutions) <= solution:
+      solutions.append({})
+    solutions[solution][name] = array
+  return [s for s in solutions if s]
+
+
+def _bits(array):
+  ''' [..., bits] (bit i = 2^i) -> int [...] '''
+  return (array << np.arange(array.shape[-1])).sum(axis = -1)
+
+
+def cipher_of(arrays):
+  ''' Schedule of the arrays of a solution: Deoxys (*_int), SKINNY64 (uSTK) or Joltik '''
+  if 'utk1_int' in arrays:
+    return 'Deoxys'
+  if 'uSTK' in arrays:
+    return 'SKINNY64'
+  if 'utk1' in arrays and 'ustk' in arrays:
+    return 'Joltik'
+  raise ValueError('unknown verification output (arrays {})'.format(', '.join(sorted(arrays))))
+
+
+def validate(arrays, model = None):
+  '''
+  Check a solution {name: array} (model: the .mzn that produced it, Deoxys: its pattern conditions).
+  Return [(check, ok)]
+  '''
+  rows = []
+  # bits
+  for name, array in arrays.items():
+    if name + '_int' in arrays:
+      rows.append(('bits {} = {}_int'.format(name, name), bool((_bits(array) == arrays[name + '_int']).all())))
+    for k in range(len(array) if array.ndim == 4 else 0):
+      if '{}{}_int'.format(name, k + 1) in arrays:
+        rows.append(('bits {}[{}] = {}{}_int'.format(name, k + 1, name, k + 1),
+                     bool((_bits(array[k]) == arrays['{}{}_int'.format(name, k + 1)]).all())))
+  # schedule
+  cipher = cipher_of(arrays)
+  suffix = '_int' if cipher == 'Deoxys' else ''
+  tk = {}
+  for t in verify.TRAILS:
+    stk_name = t + ('STK' if cipher == 'SKINNY64' else 'stk' + suffix)
+    names = ['{}tk{}{}'.format(t, k, suffix) for k in range(1, 5) if '{}tk{}{}'.format(t, k, suffix) in arrays]
+    tk[t] = np.stack([arrays[name][0] for name in names]).astype(np.uint8)
+    expected = arrays[stk_name]
+    # NOTE: SKINNYe v2 constrains the STK of the rounds 0..totR-1 only (the last row is free)
+    if cipher == 'SKINNY64':
+      expected = expected[:-1]
+    stk = schedule.evaluate(tk[t][np.newaxis], len(expected) - 1, cipher)[0][0]
+    rows.append(('schedule {} (TK{})'.format(stk_name, len(names)), bool((stk == expected).all())))
+    # NOTE: TKk alone (the other TK zero) gives its cells of every round on the stk cells
+    for k, name in enumerate(names):
+      alone = np.zeros_like(tk[t])
+      alone[k] = tk[t][k]
+      values = schedule.evaluate(alone[np.newaxis], len(arrays[name]) - 1, cipher)[0][0]
+      rows.append(('schedule {}'.format(name), bool((values == arrays[name][:, :values.shape[1]]).all())))
+  # pattern
+  if model is not None and cipher == 'Deoxys':
+    pattern = verify.read_pattern(model)
+    both = np.stack([tk[t] for t in verify.TRAILS])[np.newaxis]
+    _, dz = verify.evaluate(both, pattern)
+    cells = sorted(verify._covered(pattern))
+    rows.append(('MC^-1(stk) = dz_int ({} cells)'.format(len(cells)),
+                 all(dz[0, r, c] == arrays['dz_int'][r, c] for r, c in cells)))
+    rows.append(('conditions of {}'.format(os.path.basename(model)), bool(verify.satisfied(both, pattern)[0])))
+  return rows
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Read and validate the MiniZinc outputs of the verification models')
+  parser.add_argument('outputs', nargs = '*', help = 'MiniZinc outputs (default: the .txt of the verification models)')
+  parser.add_argument('--model', default = None, help = 'the .mzn of the output (default: same name, .mzn)')
+  args = parser.parse_args()
+
+  outputs = args.outputs or [os.path.join(ROOT, d, f) for d in ['Deoxys_and_Joltik/verification', 'SKINNY_family/verification']
+                             for f in sorted(os.listdir(os.path.join(ROOT, d))) if f.endswith('.txt') and not f.startswith('_')]
+  failed = 0
+  print('='*110)
+  for path in outputs:
+    model = args.model or os.path.splitext(path)[0] + '.mzn'
+    for i, arrays in enumerate(read_solutions(path)):
+      print('|| {} [{}] ({}, {} arrays) ||'.format(os.path.basename(path), i, encoding(path), len(arrays)))
+      for check, ok in validate(arrays, model if os.path.exists(model) else None):
+        print('||   {:80} | {:3} ||'.format(check, 'yes' if ok else 'NO'))
+        failed += not ok
+  print('='*110)
+  # NOTE: exit status 1 if a check fails (pipeline stage)
+  sys.exit(1 if failed else 0)
@@ -0,0 +1,145 @@
+import argparse
+import ast
+import contextlib
+import os
+
+import gurobipy as gp
+
+from ib_tools import cache
+from ib_tools.models import load_class
+from ib_tools.sweep import _collect, solve_pool, write_table
+
+'''
+=====================================================================
+Pareto front of (Tc, Dc, Mc) by epsilon-constraint
+  (the multi-objective of the models only gives the point minimizing
+  Tc first, see "Discussion about multi-objective optimization")
+  Grid point (x, Mc_cap): min Tc (> T32 > Dc > Mc) s.t. Mc <= Mc_cap,
+  one hierarchical multi-objective solve of the model (Gurobi)
+  NOTE: Dc = n + z/2 (+2) is fixed by x (2^z = xln2) in JandD_v2 and
+        SKINNYe_v4, the Dc axis of the grid is x (Tc >= T4 = k - x)
+  1. Solve the grid points in a process pool (sweep.solve_pool), one
+     wave per Mc_cap (tightest first), the x of a wave in parallel
+  2. Each point is warm-started from the .sol of a solved neighbour:
+     the tighter Mc_cap with the same x (previous wave, a feasible
+     start), else the neighbouring x already solved in the wave
+  3. Keep the non-dominated (Tc, Dc, Mc)
+=====================================================================
+'''
+
+OBJECTIVES = ['Tc', 'Dc', 'Mc']
+
+
+def _solve_point(entry, args, Mc_cap, out_dir, threads, time_limit, start, cache_dir, Tc_cutoff = None):
+  ''' Worker: build (or load from the cache) and solve one grid point, the solution is written to <name>.sol '''
+  name = os.path.join(out_dir, '{}_x{}_Mc{}'.format(entry, args[-2], '-' if Mc_cap is None else Mc_cap))
+  with open(name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    if cache_dir is not None:
+      model = cache.load_model(entry, args, cache_dir)[0]
+    else:
+      model = load_class(entry)(*args).ib_model(solve = False)
+    model.setParam('LogToConsole', 0)
+    model.setParam('LogFile', name + '.log')
+    model.setParam('Threads', threads)
+    if time_limit is not None:
+      model.setParam('TimeLimit', time_limit)
+    if Mc_cap is not None:
+      model.getVarByName('Mc').UB = Mc_cap
+    if Tc_cutoff is not None:
+      model.getVarByName('Tc').UB = Tc_cutoff
+    if start is not None:
+      # NOTE: read() matches the variables by name, the built model may have pending updates
+      model.update()
+      model.read(start)
+    try:
+      model.optimize(load_class(entry).stop_at_T4(model))
+    except gp.GurobiError:
+      pass
+    row = _collect(model, ['Tc', 'T32', 'Dc', 'Mc'])
+    row['sol'] = None
+    if model.SolCount > 0:
+      row['sol'] = name + '.sol'
+      model.write(row['sol'])
+  return row
+
+
+def pareto_filter(rows):
+  ''' Mark the rows with a solution that no other row dominates on (Tc, Dc, Mc) '''
+  points = [row for row in rows if row['Tc'] is not None]
+  for row in rows:
+    row['pareto'] = row['Tc'] is not None and not any(
+      all(q[k] <= row[k] for k in OBJECTIVES) and any(q[k] < row[k] for k in OBJECTIVES) for q in points)
+  return rows
+
+
+def pareto(entry, args, xs, Mc_caps = (None,), workers = None, threads = 1, out_dir = './pareto',
+           time_limit = None, cache_dir = None):
+  '''
+  Epsilon-constraint grid of load_class(entry)(*args) over x in xs (args[-2], i.e. setX/Vx) and Mc <= Mc_cap.
+  Mc_caps: None = no cap
+  Return one row (dict) per grid point, sorted by (Dc, Mc, Tc), with 'pareto' = non-dominated.
+  '''
+  if workers is None:
+    workers = max(1, os.cpu_count() // threads)
+  os.makedirs(out_dir, exist_ok = True)
+  xs = sorted(xs)
+  # NOTE: tightest cap first, its solution is a feasible start of the looser caps
+  Mc_caps = sorted(Mc_caps, key = lambda cap: (cap is None, cap))
+  done = {}
+
+  def start_of(i, j):
+    ''' .sol of the first solved neighbour of (xs[i], Mc_caps[j]) '''
+    for n in [(i, j - 1), (i - 1, j), (i + 1, j), (i, j + 1)]:
+      if n in done and done[n]['sol'] is not None:
+        return done[n]['sol']
+    return None
+
+  def jobs(j):
+    # NOTE: evaluated lazily by solve_pool, every job sees the neighbours finished before its submission
+    for i, x in enumerate(xs):
+      point_args = (*args[:-2], x, args[-1])
+      yield (i, j), _solve_point, (entry, point_args, Mc_caps[j], out_dir, threads, time_limit, start_of(i, j), cache_dir)
+
+  rows = []
+  # NOTE: one wave per cap, all the points of the previous wave are solved before the next one is submitted
+  for j in range(len(Mc_caps)):
+    for (i, j), _, result in solve_pool(jobs(j), workers, prune = False):
+      done[(i, j)] = result
+      row = {'x': xs[i], 'Mc_cap': Mc_caps[j]}
+      row.update(result)
+      rows.append(row)
+      print('|| x = {:4} | Mc <= {:6} | status = {:2} | Tc = {} | Dc = {} | Mc = {} ||'.format(
+        xs[i], '-' if Mc_caps[j] is None else Mc_caps[j], row['status'], row['Tc'], row['Dc'], row['Mc']))
+  rows.sort(key = lambda row: (row['Tc'] is None, row['Dc'], row['Mc'], row['Tc']))
+  return pareto_filter(rows)
+
+
+def print_table(rows):
+  print('='*90)
+  print('||   x  | Mc cap || status ||     Tc     |     Dc     |     Mc     |     T32    || pareto || time(s) ||')
+  print('-'*90)
+  for row in rows:
+    print('|| {:4} | {:6} || {:6} || '.format(row['x'], '-' if row['Mc_cap'] is None else row['Mc_cap'], row['status']) +
+          ' | '.join('{:10}'.format('-' if row[k] is None else round(row[k], 2)) for k in ['Tc', 'Dc', 'Mc', 'T32']) +
+          ' || {:6} || {:7} ||'.format('*' if row['pareto'] else '', row['time']))
+  print('='*90)
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Pareto front of (Tc, Dc, Mc) by epsilon-constraint')
+  parser.add_argument('entry', help = 'registered model (ib_tools.models), e.g. JandD_v2, SKINNYe_v4')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, x (args[-2]) is replaced by the grid')
+  parser.add_argument('--x', type = int, nargs = '+', required = True, help = 'x of the grid (Dc axis)')
+  parser.add_argument('--Mc', type = float, nargs = '+', default = [None], help = 'caps of Mc (default: no cap)')
+  parser.add_argument('--workers', type = int, default = None, help = 'default: cpu_count // threads')
+  parser.add_argument('--threads', type = int, default = 1, help = 'Gurobi threads per worker')
+  parser.add_argument('--time-limit', type = float, default = None, help = 'per grid point (s)')
+  parser.add_argument('--cache', nargs = '?', const = cache.CACHE_DIR, default = None,
+                      help = 'reuse the built models (default dir: {})'.format(cache.CACHE_DIR))
+  parser.add_argument('--out', default = './pareto', help = 'directory of the logs/solutions/table')
+  args = parser.parse_args()
+
+  rows = pareto(args.entry, args.args, args.x, args.Mc, args.workers, args.threads, args.out, args.time_limit, args.cache)
+  print_table(rows)
+  write_table(rows, os.path.join(args.out, 'pareto_{}_{}.csv'.format(args.entry, '-'.join(map(str, args.args)))))
@@ -0,0 +1,167 @@
+import argparse
+import ast
+import contextlib
+import hashlib
+import json
+import os
+import re
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from ib_tools import cache
+from ib_tools.models import load_class
+from ib_tools.staged import _restore, objectives
+from ib_tools.warmstart import write_sol
+
+'''
+=====================================================================
+Enumeration of all optimal (Tc <= Tc* + delta) patterns, streamed to
+a .jsonl file (one line per pattern) while the solver runs
+  1. Tc* of the model (solved first, or given)
+  2. Tc <= Tc* + delta, no objective, every solution found (MIPSOL) is
+     a pattern: written, then cut off by a lazy no-good constraint on
+     its truncated trails, the solver goes on with the next one
+  3. Until INFEASIBLE (all patterns enumerated) or the limit
+  NOTE: a pattern is the set of active cells of the truncated trails
+        and their fixed/unknown state (PATTERN: [ul]DW..DZ, the lower
+        case [ul]dw..dz that define cFF and the dz conditions, and
+        [ul]LANE), the auxiliary variables (KR counting, Det, stk,
+        ...) are not part of it. The no-good cuts
+        off all solutions with the same trails at once, the canonical
+        hash (sorted active names) drops the ones found in parallel
+  NOTE: the solution pool of Gurobi (PoolSearchMode 2) keeps every
+        solution in memory, the rejected solutions here never enter
+        it, only the hashes are kept (and the file can be resumed)
+=====================================================================
+'''
+
+PATTERN = r'^[ul][Dd][WXYZwxyz]\d?\[|^[ul]LANE\d?\['
+
+
+def pattern_hash(active):
+  ''' Canonical hash of a pattern (names of its active cells, in any order) '''
+  return hashlib.sha256('\n'.join(sorted(active)).encode()).hexdigest()[:32]
+
+
+def _no_good(variables, names, active):
+  ''' At least one cell of the pattern variables differs from the pattern '''
+  return gp.quicksum(1 - v if name in active else v for v, name in zip(variables, names)) >= 1
+
+
+def read_patterns(path):
+  ''' Patterns (dicts) of a .jsonl written by stream_patterns '''
+  with open(path) as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+
+def stream_patterns(model, path, Tc = None, delta = 0, pattern = PATTERN, limit = None, sol_dir = None, stop = None):
+  '''
+  Append every pattern of the built model within delta of the optimal Tc to path (.jsonl), the patterns already
+  in path are skipped (resume).
+  Tc:      optimal Tc, None: solved first (stop: callback factory of this solve, e.g. ib.stop_at_T4)
+  pattern: regex of the names of the truncated trail variables
+  limit:   stop after this number of new patterns
+  sol_dir: also write the full solution of each pattern to <sol_dir>/<hash>.sol
+  Return (number of new patterns, True if the enumeration is complete)
+  '''
+  if Tc is None:
+    model.optimize(stop(model) if stop is not None else None)
+    if model.SolCount == 0:
+      return 0, False
+    Tc = model.getVarByName('Tc').X
+  everything = model.getVars()
+  variables = [v for v in everything if re.match(pattern, v.VarName)]
+  names = [v.VarName for v in variables]
+  complexity = [model.getVarByName(name) for name in ['Tc', 'T32', 'Dc']]
+  if sol_dir is not None:
+    os.makedirs(sol_dir, exist_ok = True)
+
+  seen = set()
+  known = []
+  if os.path.exists(path):
+    for p in read_patterns(path):
+      seen.add(p['hash'])
+      known.append(model.addConstr(_no_good(variables, names, set(p['active'])), name = 'known'))
+
+  objs = objectives(model)
+  Tc_var = complexity[0]
+  UB = Tc_var.UB
+  params = {'LazyConstraints': 1, 'PoolSolutions': 1}
+  saved = {param: model.getParamInfo(param)[2] for param in params}
+  count = [0]
+
+  with open(path, 'a') as f:
+
+    def callback(model, where):
+      if where != GRB.Callback.MIPSOL:
+        return
+      values = model.cbGetSolution(variables)
+      active = {name for name, value in zip(names, values) if value > 0.5}
+      # NOTE: the solution is rejected in any case, the next one is searched
+      model.cbLazy(_no_good(variables, names, active))
+      h = pattern_hash(active)
+      if h in seen:
+        return
+      seen.add(h)
+      row = dict(zip(['Tc', 'T32', 'Dc'], model.cbGetSolution(complexity)))
+      f.write(json.dumps({'hash': h, **row, 'active': sorted(active)}) + '\n')
+      f.flush()
+      if sol_dir is not None:
+        write_sol(dict(zip([v.VarName for v in everything], model.cbGetSolution(everything))),
+                  os.path.join(sol_dir, h + '.sol'), comment = 'Tc = {}'.format(row['Tc']))
+      count[0] += 1
+      print('| pattern {:5} | {} | Tc = {} |'.format(len(seen), h, row['Tc']))
+      if limit is not None and count[0] >= limit:
+        model.terminate()
+
+    try:
+      model.NumObj = 0
+      model.update()
+      model.setObjective(gp.LinExpr())
+      Tc_var.UB = Tc + delta
+      for param, value in params.items():
+        model.setParam(param, value)
+      model.optimize(callback)
+      complete = model.Status == GRB.INFEASIBLE
+    finally:
+      for param, value in saved.items():
+        model.setParam(param, value)
+      Tc_var.UB = UB
+      model.remove(known)
+      _restore(model, objs, [])
+  return count[0], complete
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Enumeration of all optimal patterns (streamed to a .jsonl)')
+  parser.add_argument('entry', help = 'registered model (ib_tools.models), e.g. JandD, JandD_v2, SKINNYe_v4')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, e.g. 256 2 3 1 3 2 16 True')
+  parser.add_argument('--Tc', type = float, default = None, help = 'optimal Tc (default: solved first)')
+  parser.add_argument('--delta', type = float, default = 0, help = 'patterns with Tc <= Tc* + delta')
+  parser.add_argument('--limit', type = int, default = None, help = 'maximum number of new patterns')
+  parser.add_argument('--threads', type = int, default = 0, help = 'Gurobi threads (0: all)')
+  parser.add_argument('--time-limit', type = float, default = None, help = 'of each solve (s)')
+  parser.add_argument('--sol', action = 'store_true', help = 'also write the solution of each pattern (<out>/sol/<hash>.sol)')
+  parser.add_argument('--cache', nargs = '?', const = cache.CACHE_DIR, default = None,
+                      help = 'reuse the built model (default dir: {})'.format(cache.CACHE_DIR))
+  parser.add_argument('--out', default = './patterns', help = 'directory of the log/patterns')
+  args = parser.parse_args()
+
+  os.makedirs(args.out, exist_ok = True)
+  if args.cache is not None:
+    model = cache.load_model(args.entry, args.args, args.cache)[0]
+  else:
+    model = load_class(args.entry)(*args.args).ib_model(solve = False)
+  name = os.path.join(args.out, '{}_{}'.format(args.entry, '-'.join(map(str, args.args))))
+  model.setParam('LogFile', name + '.log')
+  model.setParam('Threads', args.threads)
+  if args.time_limit is not None:
+    model.setParam('TimeLimit', args.time_limit)
+  with open(name + '.out', 'a') as f, contextlib.redirect_stdout(f):
+    model.setParam('LogToConsole', 0)
+    count, complete = stream_patterns(model, name + '.jsonl', args.Tc, args.delta, limit = args.limit,
+                                      sol_dir = os.path.join(args.out, 'sol') if args.sol else None,
+                                      stop = load_class(args.entry).stop_at_T4)
+  print('|| {} new patterns in {}.jsonl ({}) ||'.format(count, name, 'complete' if complete else 'not complete'))
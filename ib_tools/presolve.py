@@ -0,0 +1,249 @@
+import argparse
+import ast
+import json
+import os
+import re
+
+from gurobipy import GRB
+import numpy as np
+import scipy.sparse as sp
+
+from ib_tools.models import load_class
+
+'''
+=====================================================================
+Fixing and aliasing pass on the built models (before Gurobi)
+  Most variables of the generators are forced by the boundary
+  conditions (uDetW[-1,i] == 1, ldetEQZ[end_round_l-1,i] == 1, the
+  stk/LANE marks, ...) or equal to another one (udw[r,i] == udx[r+1,i],
+  SC/SR equalities, udy0 == udz0 on the non-key half, ...).
+  1. Fix: bound propagation of the linear rows on the integer
+     variables until a fixpoint, lb == ub is a forced value
+  2. Alias: rows a*x + b*y == c with |a| == |b| after the fixing,
+     x = +-y + const, one variable of each class is kept (union-find)
+  3. Substitute the fixed/aliased variables in the other rows, remove
+     them with the alias rows and the rows left empty
+  NOTE: the variables of the objectives, general and quadratic
+        constraints and the ones matching `protect` (default: the
+        scalars Tc, T4, Dc, ...) are kept, so the callbacks and
+        ib_tools find them by name
+  NOTE: the RHS of the rows of x (set_x) may be merged into other rows,
+        reduce a model built with its final x
+  Reduction.expand() gives the values of the removed variables back
+=====================================================================
+'''
+
+PROTECT = r'^[^\[]*$'
+
+
+class Reduction:
+  '''
+  Removed variables of a reduced model:
+    fixed  {name: value}
+    alias  {name: (kept name, a, b)}, name = a * kept + b
+  '''
+
+  def __init__(self, fixed, alias, removed_constrs = 0):
+    self.fixed, self.alias, self.removed_constrs = fixed, alias, removed_constrs
+
+  def __repr__(self):
+    return 'Reduction({} fixed, {} aliased variables, {} constraints removed)'.format(
+      len(self.fixed), len(self.alias), self.removed_constrs)
+
+  def expand(self, values):
+    ''' {name: value} of the reduced model -> {name: value} of the full model '''
+    full = dict(values)
+    full.update(self.fixed)
+    for name, (kept, a, b) in self.alias.items():
+      full[name] = a * full[kept] + b
+    return full
+
+  def save(self, path):
+    with open(path, 'w') as f:
+      json.dump({'fixed': self.fixed, 'alias': self.alias, 'removed_constrs': self.removed_constrs}, f)
+
+  @classmethod
+  def load(cls, path):
+    with open(path) as f:
+      data = json.load(f)
+    return cls(data['fixed'], {name: tuple(v) for name, v in data['alias'].items()}, data['removed_constrs'])
+
+
+def _special(model):
+  ''' Indices of the variables of the objectives, general and quadratic constraints (never removed) '''
+  idx = set()
+  for i in range(model.NumObj):
+    expr = model.getObjective(index = i) if model.NumObj > 1 else model.getObjective()
+    idx.update(expr.getVar(k).index for k in range(expr.size()))
+  for gc in model.getGenConstrs():
+    kind = gc.GenConstrType
+    if kind == GRB.GENCONSTR_AND:
+      res, vars = model.getGenConstrAnd(gc)
+    elif kind == GRB.GENCONSTR_OR:
+      res, vars = model.getGenConstrOr(gc)
+    elif kind == GRB.GENCONSTR_MAX:
+      res, vars, _ = model.getGenConstrMax(gc)
+    elif kind == GRB.GENCONSTR_MIN:
+      res, vars, _ = model.getGenConstrMin(gc)
+    elif kind == GRB.GENCONSTR_ABS:
+      res, var = model.getGenConstrAbs(gc)
+      vars = [var]
+    elif kind == GRB.GENCONSTR_INDICATOR:
+      res, _, expr, _, _ = model.getGenConstrIndicator(gc)
+      vars = [expr.getVar(k) for k in range(expr.size())]
+    else:
+      raise ValueError('general constraint type {} not supported'.format(kind))
+    idx.update(v.index for v in [res] + list(vars))
+  for qc in model.getQConstrs():
+    quad = model.getQCRow(qc)
+    lin = quad.getLinExpr()
+    idx.update(quad.getVar1(k).index for k in range(quad.size()))
+    idx.update(quad.getVar2(k).index for k in range(quad.size()))
+    idx.update(lin.getVar(k).index for k in range(lin.size()))
+  return idx
+
+
+def _fix(A, sense, rhs, lb, ub, integer, passes = 100):
+  ''' Bound propagation of the rows on the integer variables, return the tightened (lb, ub) '''
+  rows = sp.vstack([A[sense != '>'], -A[sense != '<']]).tocoo()
+  b = np.concatenate([rhs[sense != '>'], -rhs[sense != '<']])
+  a, i, j = rows.data, rows.row, rows.col
+  lb, ub = lb.copy(), ub.copy()
+  for _ in range(passes):
+    # NOTE: minimum activity of each row <= b, an infinite bound makes it -inf (no tightening from it)
+    low = np.where(a > 0, a * lb[j], a * ub[j])
+    minact = np.bincount(i, weights = np.where(np.isfinite(low), low, 0), minlength = len(b))
+    infinite = np.bincount(i, weights = ~np.isfinite(low), minlength = len(b))
+    ok = (infinite[i] == 0) & integer[j]
+    slack = b[i] - (minact[i] - np.where(ok, low, 0))
+    new_ub, new_lb = ub.copy(), lb.copy()
+    pos, neg = ok & (a > 0), ok & (a < 0)
+    np.minimum.at(new_ub, j[pos], np.floor(slack[pos] / a[pos] + 1e-9))
+    np.maximum.at(new_lb, j[neg], np.ceil(slack[neg] / a[neg] - 1e-9))
+    if (new_lb > new_ub).any():
+      raise ValueError('infeasible bounds after propagation')
+    if (new_ub == ub).all() and (new_lb == lb).all():
+      break
+    lb, ub = new_lb, new_ub
+  return lb, ub
+
+
+def reduce(model, protect = PROTECT):
+  '''
+  Fix and alias the forced variables of the built model in place.
+  protect: regex of the names of variables never removed
+  Return the Reduction (also model._reduction)
+  '''
+  model.update()
+  variables, constrs = model.getVars(), model.getConstrs()
+  names = model.getAttr('VarName', variables)
+  A = model.getA().tocsr()
+  sense = np.array(model.getAttr('Sense', constrs))
+  rhs = np.array(model.getAttr('RHS', constrs), dtype = float)
+  lb = np.array(model.getAttr('LB', variables), dtype = float)
+  ub = np.array(model.getAttr('UB', variables), dtype = float)
+  integer = np.array([t != GRB.CONTINUOUS for t in model.getAttr('VType', variables)], dtype = bool)
+  keep = np.array([re.match(protect, name) is not None for name in names])
+  keep[list(_special(model))] = True
+
+  # 1. Fix
+  lb_fix, ub_fix = _fix(A, sense, rhs, lb, ub, integer)
+  fixed = integer & (lb_fix == ub_fix) & ~keep
+
+  # 2. Alias
+  n = len(variables)
+  parent, alpha, beta = np.arange(n), np.ones(n), np.zeros(n)
+  bound = np.stack([lb, ub], axis = 1)
+
+  def find(x):
+    ''' (root, a, b) with x = a * root + b '''
+    a, b = 1.0, 0.0
+    while parent[x] != x:
+      a, b = a * alpha[x], a * beta[x] + b
+      x = parent[x]
+    return x, a, b
+
+  const = A[:, fixed] @ lb_fix[fixed]
+  free = A[:, ~fixed].tocsr()
+  free_idx = np.nonzero(~fixed)[0]
+  removed_rows = []
+  for r in np.nonzero((sense == '=') & (np.diff(free.indptr) == 2))[0]:
+    (x, y), (c1, c2) = free_idx[free.indices[free.indptr[r]:free.indptr[r + 1]]], free.data[free.indptr[r]:free.indptr[r + 1]]
+    if abs(c1) != abs(c2):
+      continue
+    (rx, ax, bx), (ry, ay, by) = find(x), find(y)
+    if rx == ry or (keep[rx] and keep[ry]):
+      continue
+    # c1 (ax Rx + bx) + c2 (ay Ry + by) = rhs - const, the child is not protected
+    if keep[rx]:
+      (rx, ax, bx, c1), (ry, ay, by, c2) = (ry, ay, by, c2), (rx, ax, bx, c1)
+    a = -(c2 * ay) / (c1 * ax)
+    b = (rhs[r] - const[r] - c1 * bx - c2 * by) / (c1 * ax)
+    if abs(a) != 1 or (integer[rx] and (not integer[ry] or b != round(b))):
+      continue
+    low, high = sorted([(bound[rx, 0] - b) * a, (bound[rx, 1] - b) * a])
+    low, high = max(low, bound[ry, 0]), min(high, bound[ry, 1])
+    if low > high:
+      continue
+    parent[rx], alpha[rx], beta[rx] = ry, a, b
+    bound[ry] = [low, high]
+    removed_rows.append(r)
+
+  # 3. Substitute: x = T x' + offset
+  roots = [find(x) for x in range(n)]
+  aliased = np.array([roots[x][0] != x for x in range(n)]) & ~fixed
+  removed = fixed | aliased
+  T = sp.csr_matrix((np.array([roots[x][1] for x in range(n)])[~fixed],
+                     (np.nonzero(~fixed)[0], np.array([roots[x][0] for x in range(n)])[~fixed])), shape = (n, n))
+  offset = np.where(fixed, lb_fix, np.array([roots[x][2] for x in range(n)]))
+  A_new = (A @ T).tocsr()
+  rhs_new = rhs - A @ offset
+  empty = np.diff(A_new.indptr) == 0
+  for r in np.nonzero(empty)[0]:
+    if (sense[r] == '<' and rhs_new[r] < -1e-9) or (sense[r] == '>' and rhs_new[r] > 1e-9) or (sense[r] == '=' and abs(rhs_new[r]) > 1e-9):
+      raise ValueError('constraint {} infeasible after the fixing'.format(constrs[r].ConstrName))
+  drop = empty.copy()
+  drop[removed_rows] = True
+
+  changed = sp.csr_matrix(A_new - A.multiply((~removed)[np.newaxis, :])).tocoo()
+  changed.eliminate_zeros()
+  values = np.asarray(A_new[changed.row, changed.col]).ravel()
+  for r, x, value in zip(changed.row, changed.col, values):
+    if not drop[r]:
+      model.chgCoeff(constrs[r], variables[x], value)
+  moved = np.nonzero((rhs_new != rhs) & ~drop)[0]
+  model.setAttr('RHS', [constrs[r] for r in moved], rhs_new[moved].tolist())
+  tightened = np.nonzero(~removed & ((bound[:, 0] != lb) | (bound[:, 1] != ub)))[0]
+  model.setAttr('LB', [variables[x] for x in tightened], bound[tightened, 0].tolist())
+  model.setAttr('UB', [variables[x] for x in tightened], bound[tightened, 1].tolist())
+
+  reduction = Reduction({names[x]: float(lb_fix[x]) for x in np.nonzero(fixed)[0]},
+                        {names[x]: (names[roots[x][0]], roots[x][1], roots[x][2]) for x in np.nonzero(aliased)[0]},
+                        int(drop.sum()))
+  model.remove([constrs[r] for r in np.nonzero(drop)[0]] + [variables[x] for x in np.nonzero(removed)[0]])
+  model.update()
+  model._reduction = reduction
+  return reduction
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Fixing and aliasing pass on a built model')
+  parser.add_argument('entry', help = 'registered model (ib_tools.models), e.g. JandD, SKINNYe_v4')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, e.g. 256 2 3 1 3 2 16 True')
+  parser.add_argument('--write', default = None, help = 'write the reduced model (e.g. xxx.lp.bz2) and its reduction (xxx.json)')
+  args = parser.parse_args()
+
+  model = load_class(args.entry)(*args.args).ib_model(solve = False)
+  before = [model.NumVars, model.NumConstrs, model.NumNZs]
+  reduction = reduce(model)
+  after = [model.NumVars, model.NumConstrs, model.NumNZs]
+  print('='*90)
+  print('|| {:>10} | {:>10} | {:>10} ||'.format('', 'before', 'after'))
+  for name, b, a in zip(['vars', 'constrs', 'nonzeros'], before, after):
+    print('|| {:>10} | {:10} | {:10} ||'.format(name, b, a))
+  print('|| {} ||'.format(reduction))
+  print('='*90)
+  if args.write is not None:
+    model.write(args.write)
+    reduction.save(os.path.join(os.path.dirname(args.write), os.path.basename(args.write).split('.')[0] + '.json'))
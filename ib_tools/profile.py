@@ -0,0 +1,40 @@
+import argparse
+import ast
+import json
+
+from ib_tools.models import MODELS, load_class
+
+'''
+=====================================================================
+Build profile of one registered model (no solving)
+  python -m ib_tools.profile SKINNYe_v4 64 4 6 22 5 60 True
+  -> JSON report of ib_model() (see IB_Model._profile in ib_tools.result) and
+     the sections sorted by build time
+=====================================================================
+'''
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Build profile of ib_model()')
+  parser.add_argument('entry', choices = sorted(MODELS))
+  parser.add_argument('args', nargs = '+', help = 'constructor arguments (Python literals)')
+  parser.add_argument('--out', default = None, help = 'JSON report (default: <entry>_profile.json)')
+  args = parser.parse_args()
+
+  ib = load_class(args.entry)(*[ast.literal_eval(a) for a in args.args])
+  ib.profile = args.out or args.entry + '_profile.json'
+  ib.ib_model(solve = False)
+
+  with open(ib.profile) as f:
+    report = json.load(f)
+  total = sum(row['time'] for row in report['blocks'])
+  print('='*100)
+  print('|| {:56} || {:>8} | {:>7} | {:>7} | {:>9} ||'.format('section', 'time(s)', 'vars', 'constrs', 'nonzeros'))
+  print('-'*100)
+  for section, row in sorted(report['sections'].items(), key = lambda item: -item[1]['time']):
+    print('|| {:56} || {:8.3f} | {:7} | {:7} | {:9} ||'.format(section[:56], row['time'], row['vars'], row['constrs'], row['nonzeros']))
+  print('-'*100)
+  print('|| {:56} || {:8.3f} | {:7} | {:7} | {:9} ||'.format('total', total, ib.model.NumVars,
+        ib.model.NumConstrs + ib.model.NumQConstrs + ib.model.NumGenConstrs, ib.model.NumNZs))
+  print('='*100)
+  print('Report: ' + ib.profile)
@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+'''
+=====================================================================
+Truncated reachability of the AES-like rounds of Deoxys-BC/Joltik-BC
+  pattern: uint16 mask of the 16 active cells (cell i = bit i, column
+           c = cells 4c..4c+3, as in IB_DandJ)
+  set:     bool array [65536], set[m] = pattern m is reachable
+  Round r (as DW[r-1] => DX[r] => DY[r] => DZ[r] => DW[r] in IB_DandJ):
+    ATK: cell of stk sure active:  0 -> 1, 1 -> 0/1
+         cell of stk maybe active: 0/1 -> 0/1 (cancelled or not)
+    SC:  identity on the patterns
+    SR:  DZ[i] = DY[SRpermutation_rev[i]]
+    MC:  MDS (branch number 5), active column of weight w -> any column
+         of weight >= 5 - w (MC^-1 too)
+  Miss in the middle: the forward set of the input pattern a and the
+  backward set of the output pattern b do not meet, a -/-> b
+  NOTE: the sets are exact with the stk fixed (sure), a maybe stk is an
+        over-approximation: an empty intersection is still a
+        contradiction, a non-empty one is not a proof of possibility
+=====================================================================
+'''
+
+FULL = 1 << 16
+SRpermutation_rev = [0, 5, 10, 15, 4, 9, 14, 3, 8, 13, 2, 7, 12, 1, 6, 11]
+h = [1, 6, 11, 12, 5, 10, 15, 0, 9, 14, 3, 4, 13, 2, 7, 8]
+
+_patterns = np.arange(FULL, dtype = np.uint32)
+_weight = np.array([bin(m).count('1') for m in range(16)])
+
+
+def _SR_table():
+  ''' SR_TABLE[m] = SR(m) '''
+  table = np.zeros(FULL, dtype = np.uint32)
+  for i in range(16):
+    table |= ((_patterns >> SRpermutation_rev[i]) & 1) << i
+  return table
+
+
+def _MC_table():
+  ''' MC_TABLE[c, c'] = column pattern c' reachable from c '''
+  table = np.zeros((16, 16), dtype = bool)
+  table[0, 0] = True
+  for c in range(1, 16):
+    table[c, 1:] = _weight[1:] >= 5 - _weight[c]
+  return table
+
+
+SR_TABLE = _SR_table()
+MC_TABLE = _MC_table()
+
+
+def hTable(rounds):
+  ''' hTable[i][r]: cell of the lane i in the stk of round r (h^-r(i), period 8) '''
+  h_rev = [h.index(i) for i in range(16)]
+  table = [[i] for i in range(16)]
+  for row in table:
+    for _ in range(1, rounds):
+      row.append(h_rev[row[-1]])
+  return table
+
+
+def stk_masks(lanes, rounds, start = 0, sure = False):
+  '''
+  stk of the rounds start..start+rounds-1 for the active lanes (uint16 mask of the lanes of stk[0]):
+  [(sure, maybe)] per round, sure = False: every lane may be cancelled (the Type1 cancellations)
+  '''
+  table = hTable(start + rounds)
+  masks = []
+  for r in range(start, start + rounds):
+    mask = sum(1 << table[i][r] for i in range(16) if lanes >> i & 1)
+    masks.append((mask, 0) if sure else (0, mask))
+  return masks
+
+
+def single(m):
+  ''' Set of the pattern m '''
+  s = np.zeros(FULL, dtype = bool)
+  s[m] = True
+  return s
+
+
+def atk(s, stk):
+  sure, maybe = stk
+  for i in range(16):
+    bit = 1 << i
+    if sure & bit:
+      # NOTE: 0 -> 1 only, 1 -> 0/1 (the relation is symmetric, backward too)
+      s = s[_patterns ^ bit] | (s & ((_patterns & bit) != 0))
+    elif maybe & bit:
+      s = s | s[_patterns ^ bit]
+  return s
+
+
+def sr(s, inverse = False):
+  if inverse:
+    return s[SR_TABLE]
+  out = np.zeros(FULL, dtype = bool)
+  out[SR_TABLE[s]] = True
+  return out
+
+
+def mc(s):
+  ''' MC (and MC^-1), column by column '''
+  for c in range(4):
+    shift = 4 * c
+    idx = np.nonzero(s)[0].astype(np.uint32)
+    rest = idx & ~np.uint32(0xF << shift)
+    column = (idx >> shift) & 0xF
+    out = np.zeros(FULL, dtype = bool)
+    for image in range(16):
+      keep = MC_TABLE[column, image]
+      out[rest[keep] | np.uint32(image << shift)] = True
+    s = out
+  return s
+
+
+def forward(s, stks):
+  '''
+  Forward set after len(stks) rounds from the set s (of DW[r-1]), stks: [(sure, maybe)] per round
+  Return [set of DW[r]] per round
+  '''
+  sets = []
+  for stk in stks:
+    s = mc(sr(atk(s, stk)))
+    sets.append(s)
+  return sets
+
+
+def backward(s, stks):
+  '''
+  Backward set before len(stks) rounds from the set s (of DW[r]), stks: [(sure, maybe)] of these rounds (in order)
+  Return [set of DW[r-1]] per round (last round first)
+  '''
+  sets = []
+  for stk in reversed(stks):
+    s = atk(sr(mc(s), inverse = True), stk)
+    sets.append(s)
+  return sets
+
+
+def cells(s):
+  '''
+  (cells active in some pattern, cells active in every pattern) of the set s, as uint16 masks,
+  e.g. the DW[r,i] of a trail from s outside the first mask can be fixed to 0 (UB = 0)
+  '''
+  idx = np.nonzero(s)[0]
+  if len(idx) == 0:
+    return 0, 0
+  return int(np.bitwise_or.reduce(idx)), int(np.bitwise_and.reduce(idx))
+
+
+def weight_patterns(weights):
+  ''' Nonzero patterns with a weight in weights '''
+  return [m for w in weights for m in (sum(1 << i for i in c) for c in itertools.combinations(range(16), w))]
+
+
+def contradictions(inputs, outputs, stks_u, stks_l):
+  '''
+  Miss in the middle after len(stks_u) rounds forward from each input pattern and len(stks_l) rounds
+  backward from each output pattern.
+  Return bool array [len(inputs), len(outputs)], True = the two sets do not meet (impossible)
+  '''
+  F = np.array([forward(single(a), stks_u)[-1] if stks_u else single(a) for a in inputs], dtype = np.float32)
+  B = np.array([backward(single(b), stks_l)[-1] if stks_l else single(b) for b in outputs], dtype = np.float32)
+  return (F @ B.T) == 0
+
+
+def has_contradiction(round_u, round_l, weights = (1,), lanes_u = 0, lanes_l = 0, start_u = 0):
+  '''
+  Quick check of a split: is there a miss in the middle of round_u + round_l rounds with input/output
+  patterns of the given weights (lanes_u/lanes_l: active lanes of the upper/lower tweakey difference,
+  cancellations allowed)
+  '''
+  stks_u = stk_masks(lanes_u, round_u, start_u)
+  stks_l = stk_masks(lanes_l, round_l, start_u + round_u)
+  patterns = weight_patterns(weights)
+  return bool(contradictions(patterns, patterns, stks_u, stks_l).any())
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Truncated reachability / miss in the middle of the AES-like rounds (Deoxys/Joltik)')
+  parser.add_argument('round_u', type = int, help = 'forward rounds')
+  parser.add_argument('round_l', type = int, help = 'backward rounds')
+  parser.add_argument('--weights', type = int, nargs = '+', default = [1], help = 'weights of the input/output patterns')
+  parser.add_argument('--lanes-u', type = lambda v: int(v, 0), default = 0, help = 'active lanes of the upper tweakey (mask)')
+  parser.add_argument('--lanes-l', type = lambda v: int(v, 0), default = 0, help = 'active lanes of the lower tweakey (mask)')
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  patterns = weight_patterns(args.weights)
+  found = contradictions(patterns, patterns, stk_masks(args.lanes_u, args.round_u),
+                         stk_masks(args.lanes_l, args.round_l, args.round_u))
+  elapsed = time.perf_counter() - start
+  print('='*90)
+  for a, b in zip(*np.nonzero(found)):
+    print('|| {:016b} -/-> {:016b} ||'.format(patterns[a], patterns[b]))
+  print('-'*90)
+  print('|| {} contradictions of {} pairs, {} + {} rounds ({:.3f} s) ||'.format(
+    int(found.sum()), found.size, args.round_u, args.round_l, elapsed))
+  print('='*90)
@@ -0,0 +1,190 @@
+import json
+import re
+import threading
+import time
+
+import gurobipy as gp
+from gurobipy import GRB
+import numpy as np
+
+'''
+=====================================================================
+Shared by the generators (Deoxys_and_Joltik/pattern, SKINNY_family/
+pattern), imported instead of pasted in each of them
+  IB_Result: solution of ib_model() in memory (.npz save/load)
+  IB_Model:  mixin of the generator classes (self.model, self.name,
+             self.export, self.profile, self.stop_T4)
+    stop_at_T4(model)  callback stopping the pass of Tc at T4
+    _export()          opt-in export of the model/solution files
+    _profile(block)    build profiler of ib_model() (JSON report)
+=====================================================================
+'''
+
+class IB_Result:
+  '''
+  Solution of ib_model() in memory (no parsing of the .sol):
+    status, name, x   Gurobi status, model name and x of the model
+    scalars           {name: value} of the variables without index (Tc, T32, Dc, rb, ...)
+    trails            {name: np.array [round, cell]} of the variables X[r,i],
+                      row k is the round first[name] + k (e.g. first['uDW'] = -1)
+    cells             {name: np.array [cell]} of the variables X[i]
+  NOTE: binary (int8) / integer (int32) / continuous (float64) arrays, -1 = no variable
+  '''
+  _indexed = re.compile(r'^([^\[]+)\[(-?\d+)(?:,(\d+))?\]$')
+
+  def __init__(self, model, x):
+    self.status, self.name, self.x = model.Status, model.ModelName, x
+    self.scalars, self.trails, self.first, self.cells = {}, {}, {}, {}
+    if model.SolCount == 0:
+      return
+    variables = model.getVars()
+    indexed = {}
+    for name, vtype, value in zip(model.getAttr('VarName', variables), model.getAttr('VType', variables),
+                                  model.getAttr('X', variables)):
+      m = self._indexed.match(name)
+      if m is None:
+        self.scalars[name] = value
+      else:
+        indexed.setdefault((m.group(1), m.group(3) is None), []).append(
+          (int(m.group(2)), int(m.group(3) or 0), vtype, value))
+    for (name, vector), rows in indexed.items():
+      r, i, vtype, value = zip(*rows)
+      dtype = np.int8 if set(vtype) == {GRB.BINARY} else (np.float64 if GRB.CONTINUOUS in vtype else np.int32)
+      value = np.array(value)
+      if dtype != np.float64:
+        value = np.rint(value)
+      if vector:
+        self.cells[name] = np.full(max(r) + 1, -1, dtype)
+        self.cells[name][list(r)] = value
+      else:
+        self.first[name] = min(r)
+        self.trails[name] = np.full((max(r) - min(r) + 1, max(i) + 1), -1, dtype)
+        self.trails[name][np.array(r) - min(r), list(i)] = value
+
+  def __getitem__(self, name):
+    for values in [self.trails, self.cells, self.scalars]:
+      if name in values:
+        return values[name]
+    raise KeyError(name)
+
+  def __repr__(self):
+    return 'IB_Result({}, status = {}, x = {}, Tc = {})'.format(self.name, self.status, self.x, self.scalars.get('Tc'))
+
+  def round(self, name, r):
+    ''' Cells of X[r,:] '''
+    return self.trails[name][r - self.first[name]]
+
+  def save(self, path):
+    ''' .npz with the keys scalars/<name>, trails/<name>, first/<name>, cells/<name> (see load) '''
+    arrays = {'status': self.status, 'name': self.name, 'x': self.x}
+    for kind in ['scalars', 'trails', 'first', 'cells']:
+      for name, value in getattr(self, kind).items():
+        arrays[kind + '/' + name] = value
+    np.savez_compressed(path, **arrays)
+
+  @classmethod
+  def load(cls, path):
+    result = cls.__new__(cls)
+    result.scalars, result.trails, result.first, result.cells = {}, {}, {}, {}
+    with np.load(path) as f:
+      for key in f.files:
+        value = f[key] if f[key].ndim else f[key].item()
+        if '/' in key:
+          kind, name = key.split('/', 1)
+          getattr(result, kind)[name] = value
+        else:
+          setattr(result, key, value)
+    return result
+
+
+class IB_Model:
+  '''
+  Mixin of the generators: the solve tools around self.model (see the module docstring).
+  The generator sets self.profile, self._block, self.export, self._writer and self.stop_T4 in __init__
+  '''
+
+  '''
+  =====================
+  Callback of optimize(): T4 = k - x is a constant lower bound of Tc, so an incumbent
+  with Tc == T4 is optimal for Tc, its pass is stopped at once (T32 is still minimized).
+  The terms T0..T32 equal to Tc are printed and kept in model._binding
+  =====================
+  '''
+  @staticmethod
+  def stop_at_T4(model):
+    model.update()
+    terms = {name: model.getVarByName(name) for name in ['T0', 'T1', 'T2', 'T31', 'T32', 'T4', 'Tc']}
+    multi = model.NumObj > 1
+    stage = [0] # objectives already optimized, None once Tc is stopped
+
+    def callback(model, where):
+      if where == GRB.Callback.MULTIOBJ:
+        stage[0] = model.cbGet(GRB.Callback.MULTIOBJ_OBJCNT)
+      elif where == GRB.Callback.MIPSOL and stage[0] == 0:
+        value = dict(zip(terms, model.cbGetSolution(list(terms.values()))))
+        if value['Tc'] <= value['T4'] + 1e-6:
+          stage[0] = None
+          model._binding = [name for name in terms if name not in ['T4', 'Tc'] and value[name] >= value['Tc'] - 1e-6]
+          print('| Tc = T4 = {} (lower bound reached), binding: {} |'.format(value['T4'], ', '.join(model._binding) or 'T4 only'))
+          if multi:
+            model.cbStopOneMultiObj(0)
+          else:
+            model.terminate()
+    return callback
+
+  '''
+  =====================
+  Opt-in export of the files of self.export, e.g. ['.lp.gz', '.sol']
+  (compressed by Gurobi: .gz/.bz2/.7z/.zip):
+    model (.lp/.mps): written from a copy in a background thread while the solve runs
+    solution (.sol):  written after the solve
+  =====================
+  '''
+  def _export(self, solved = False):
+    files = [self.name + suffix for suffix in (self.export or []) if suffix.startswith('.sol') == solved]
+    if not solved:
+      if files:
+        # NOTE: a Gurobi environment must not be used by two threads, the copy gets its own one
+        env = gp.Env(empty = True)
+        env.setParam('OutputFlag', 0)
+        env.start()
+        copy = self.model.copy(env)
+        self._writer = threading.Thread(target = lambda: [copy.write(f) for f in files])
+        self._writer.start()
+      return
+    if self.model.SolCount > 0:
+      for f in files:
+        self.model.write(f)
+    if self._writer is not None:
+      self._writer.join()
+      self._writer = None
+
+  '''
+  =====================
+  Build profiler of ib_model(), enabled by self.profile = <JSON report path>:
+    wall time, vars, constrs (linear, quadratic and general) and nonzeros added by each block
+  =====================
+  '''
+  def _profile(self, block, section = False):
+    if self.profile is None:
+      return
+    self.model.update()
+    now = [time.perf_counter(), self.model.NumVars,
+           self.model.NumConstrs + self.model.NumQConstrs + self.model.NumGenConstrs, self.model.NumNZs]
+    if self._block is None:
+      self._report = []
+    else:
+      last, before = self._block
+      self._report.append(dict(zip(['section', 'block', 'time', 'vars', 'constrs', 'nonzeros'],
+                                   [self._section, last, round(now[0] - before[0], 4)] + [a - b for a, b in zip(now[1:], before[1:])])))
+    if section:
+      self._section = block
+    self._block = None if block is None else (block, now)
+    if block is None:
+      sections = {}
+      for row in self._report:
+        total = sections.setdefault(row['section'], {'time': 0, 'vars': 0, 'constrs': 0, 'nonzeros': 0})
+        for k in total:
+          total[k] = round(total[k] + row[k], 4)
+      with open(self.profile, 'w') as f:
+        json.dump({'model': self.name, 'sections': sections, 'blocks': self._report}, f, indent = 2)
@@ -0,0 +1,235 @@
+import argparse
+import time
+
+import numpy as np
+
+from ib_tools.bct import GF16_POLY, mul_table
+
+'''
+=====================================================================
+Bitsliced batch evaluator of the tweakey schedules (TK1..TK4)
+  planes: uint64 [s, 16, bits, W], bit j of word w of plane (k, c, b)
+          = bit b of cell c of TKk+1 of the candidate 64*w + j
+  One round: the cells are permuted (new[c] = old[perm[c]]), the
+  LFSRs of TK2..TK4 are XORs of bit planes on their cells, and
+    stk    = XOR of the TK planes (on the stk cells)
+    active = OR of the bit planes of stk, uint64 [cells, W]
+  i.e. 64 candidate tweakey differences per word operation, the
+  per-round STK difference masks of millions of candidates at once
+  Schedules (as in the verification models and generators):
+    Deoxys:   8-bit cells, h, LFSR2/LFSR3 on every cell, stk 0..15
+    Joltik:   4-bit cells, h, x2/x4 in GF(2^4) on every cell
+    SKINNY64: 4-bit cells, P_T (hTable = P_T^-1), LFSR2/3/4 on the
+              cells 0..7, stk = cells 0..7
+  screen() keeps the candidates with given stk cells zero / active
+  (LANE, cancellations), lanes() counts the cancellations of the
+  differences of one lane
+  NOTE: the LFSRs are linear, their bit matrices are derived from the
+        cell tables (ValueError otherwise)
+=====================================================================
+'''
+
+# Deoxys/Joltik: tk[r+1, c] = tk[r, h[c]]
+h = [1, 6, 11, 12, 5, 10, 15, 0, 9, 14, 3, 4, 13, 2, 7, 8]
+# SKINNY: tk[r+1, c] = tk[r, P_T[c]]
+P_T = [9, 15, 8, 13, 10, 14, 12, 11, 0, 1, 2, 3, 4, 5, 6, 7]
+
+_x = np.arange(256)
+# NOTE: bit i of a cell is 2^i as in the models ("<<" to ">>" for LFSR2)
+LFSR2 = (((_x << 1) & 0xff) | (((_x >> 7) ^ (_x >> 5)) & 1)).astype(np.uint8)
+LFSR3 = ((_x >> 1) | (((_x ^ (_x >> 6)) & 1) << 7)).astype(np.uint8)
+
+SCHEDULES = {
+  'Deoxys':   {'bits': 8, 'perm': h, 'lfsr': [None, LFSR2, LFSR3], 'lfsr_cells': 16, 'stk_cells': 16},
+  'Joltik':   {'bits': 4, 'perm': h, 'lfsr': [None, mul_table(2, GF16_POLY, 4), mul_table(4, GF16_POLY, 4)],
+               'lfsr_cells': 16, 'stk_cells': 16},
+  # NOTE: LFSR2/LFSR3/LFSR4 tables of SKINNYe v2.mzn
+  'SKINNY64': {'bits': 4, 'perm': P_T, 'lfsr': [None, [0, 2, 4, 6, 9, 11, 13, 15, 1, 3, 5, 7, 8, 10, 12, 14],
+                                                [0, 8, 1, 9, 2, 10, 3, 11, 12, 4, 13, 5, 14, 6, 15, 7],
+                                                [0, 4, 9, 13, 3, 7, 10, 14, 2, 6, 11, 15, 1, 5, 8, 12]],
+               'lfsr_cells': 8, 'stk_cells': 8},
+}
+
+ALL = np.uint64(0xFFFFFFFFFFFFFFFF)
+# NOTE: bit j of the index of the candidate inside a word (bitsliced counter)
+_LOW = [np.uint64(v) for v in [0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0,
+                               0xFF00FF00FF00FF00, 0xFFFF0000FFFF0000, 0xFFFFFFFF00000000]]
+
+
+def bit_matrix(table, bits):
+  ''' M [bits, bits], bit i of table[x] = XOR of the bits j of x with M[i, j] (table linear over GF(2)) '''
+  table = np.asarray(table) if table is not None else np.arange(1 << bits)
+  M = np.array([[(table[1 << j] >> i) & 1 for j in range(bits)] for i in range(bits)], dtype = np.uint8)
+  x = np.arange(1 << bits)
+  image = np.bitwise_xor.reduce(np.where((x[:, np.newaxis] >> np.arange(bits)) & 1, table[1 << np.arange(bits)], 0), axis = 1)
+  if (image != table[x]).any():
+    raise ValueError('the LFSR table is not linear')
+  return M
+
+
+def pack(tk, bits):
+  ''' tk uint8 [n, s, 16] -> planes uint64 [s, 16, bits, W] '''
+  tk = np.asarray(tk, dtype = np.uint8)
+  n, s, cells = tk.shape
+  W = -(-n // 64)
+  planes = np.zeros((s, cells, bits, W), dtype = np.uint64)
+  for k in range(s):
+    for c in range(cells):
+      plane = np.zeros((bits, W * 64), dtype = np.uint8)
+      plane[:, :n] = (tk[np.newaxis, :, k, c] >> np.arange(bits)[:, np.newaxis]) & 1
+      planes[k, c] = np.packbits(plane, axis = 1, bitorder = 'little').view('<u8')
+  return planes
+
+
+def unpack(planes, n):
+  ''' planes uint64 [..., bits, W] -> values uint8 [n, ...] '''
+  bits = planes.shape[-2]
+  flat = np.unpackbits(np.ascontiguousarray(planes).view(np.uint8), axis = -1, bitorder = 'little')[..., :n]
+  values = (flat.astype(np.uint8) << np.arange(bits, dtype = np.uint8)[:, np.newaxis]).sum(axis = -2, dtype = np.uint8)
+  return np.moveaxis(values, -1, 0)
+
+
+def counter(start, W, nbits):
+  ''' Planes uint64 [nbits, W] of the bits of the indices start..start+64W-1 (start multiple of 64) '''
+  w = np.arange(W, dtype = np.uint64) + np.uint64(start // 64)
+  out = np.empty((nbits, W), dtype = np.uint64)
+  for j in range(nbits):
+    out[j] = _LOW[j] if j < 6 else np.where((w >> np.uint64(j - 6)) & np.uint64(1), ALL, np.uint64(0))
+  return out
+
+
+def matrices(cipher, s):
+  spec = SCHEDULES[cipher]
+  return [None if table is None else bit_matrix(table, spec['bits']) for table in spec['lfsr'][:s]]
+
+
+def _apply(M, planes):
+  ''' Bit matrix M on the planes [..., bits, W] '''
+  return np.stack([np.bitwise_xor.reduce(planes[..., np.nonzero(row)[0], :], axis = -2) for row in M], axis = -2)
+
+
+def advance(planes, cipher, Ms = None):
+  ''' One round of the schedule on the planes [s, 16, bits, W] '''
+  spec = SCHEDULES[cipher]
+  if Ms is None:
+    Ms = matrices(cipher, len(planes))
+  planes = planes[:, spec['perm']]
+  cells = spec['lfsr_cells']
+  for k, M in enumerate(Ms):
+    if M is not None:
+      planes[k, :cells] = _apply(M, planes[k, :cells])
+  return planes
+
+
+def stk(planes, cipher):
+  ''' stk planes [stk cells, bits, W] '''
+  return np.bitwise_xor.reduce(planes[:, :SCHEDULES[cipher]['stk_cells']], axis = 0)
+
+
+def run(planes, rounds, cipher, values = False):
+  '''
+  stk difference masks of the rounds 0..rounds: active uint64 [rounds + 1, stk cells, W]
+  (values True: also the stk planes [rounds + 1, stk cells, bits, W])
+  '''
+  Ms = matrices(cipher, len(planes))
+  active, stks = [], []
+  for r in range(rounds + 1):
+    if r:
+      planes = advance(planes, cipher, Ms)
+    s = stk(planes, cipher)
+    active.append(np.bitwise_or.reduce(s, axis = 1))
+    if values:
+      stks.append(s)
+  return (np.array(active), np.array(stks)) if values else np.array(active)
+
+
+def masks(active, n):
+  ''' active uint64 [rounds, cells, W] -> masks uint16 [n, rounds], bit c = stk cell c nonzero '''
+  bits = np.unpackbits(np.ascontiguousarray(active).view(np.uint8), axis = -1, bitorder = 'little')[..., :n]
+  return (bits.astype(np.uint16) << np.arange(active.shape[1], dtype = np.uint16)[:, np.newaxis]).sum(axis = 1, dtype = np.uint16).T
+
+
+def screen(active, zero = (), nonzero = ()):
+  ''' uint64 [W]: the candidates with the stk cells zero ((r, c) in zero) and active ((r, c) in nonzero) '''
+  ok = np.full(active.shape[-1], ALL)
+  for r, c in zero:
+    ok &= ~active[r, c]
+  for r, c in nonzero:
+    ok &= active[r, c]
+  return ok
+
+
+def selected(ok, n):
+  ''' Indices of the candidates set in the plane ok [W] '''
+  return np.nonzero(np.unpackbits(ok.view(np.uint8), bitorder = 'little')[:n])[0]
+
+
+def evaluate(tk, rounds, cipher):
+  ''' tk uint8 [n, s, 16] -> (stk uint8 [n, rounds + 1, stk cells], masks uint16 [n, rounds + 1]) '''
+  spec = SCHEDULES[cipher]
+  active, stks = run(pack(tk, spec['bits']), rounds, cipher, values = True)
+  return unpack(stks, len(tk)), masks(active, len(tk))
+
+
+def positions(cipher, rounds, cell = 0):
+  ''' Cell of the lane starting at cell in each round 0..rounds '''
+  perm = SCHEDULES[cipher]['perm']
+  out = [cell]
+  for _ in range(rounds):
+    out.append(perm.index(out[-1]))
+  return out
+
+
+def lanes(cipher, s, rounds, cell = 0, chunk = 1 << 20):
+  '''
+  All the nonzero differences of one lane (TK1..TKs at cell of round 0), bitsliced by chunks.
+  Return {number of cancelled rounds (lane in the stk cells, stk cell zero): number of differences}
+  '''
+  spec = SCHEDULES[cipher]
+  bits = spec['bits']
+  nbits = s * bits
+  total = 1 << nbits
+  pos = positions(cipher, rounds, cell)
+  seen = [r for r in range(rounds + 1) if pos[r] < spec['stk_cells']]
+  Ms = matrices(cipher, s)
+  W = max(1, min(chunk, total) // 64)
+  count = {}
+  for start in range(0, total, 64 * W):
+    # NOTE: only the lane is nonzero, its planes [s, bits, W] follow pos (the other cells stay zero)
+    lane = counter(start, W, nbits).reshape(s, bits, W)
+    zero = []
+    for r in range(rounds + 1):
+      if r and pos[r] < spec['lfsr_cells']:
+        lane = np.stack([lane[k] if M is None else _apply(M, lane[k]) for k, M in enumerate(Ms)])
+      if r in seen:
+        zero.append(~np.bitwise_or.reduce(np.bitwise_xor.reduce(lane, axis = 0), axis = 0))
+    n = min(64 * W, total - start)
+    cancelled = np.unpackbits(np.array(zero).view(np.uint8), axis = -1, bitorder = 'little')[:, :n].sum(axis = 0)
+    if start == 0:
+      cancelled = cancelled[1:]
+    for k, v in zip(*np.unique(cancelled, return_counts = True)):
+      count[int(k)] = count.get(int(k), 0) + int(v)
+  return count
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Bitsliced tweakey schedule: cancellations of the differences of one lane')
+  parser.add_argument('cipher', choices = sorted(SCHEDULES))
+  parser.add_argument('s', type = int, help = 'number of TK (TK1..TKs)')
+  parser.add_argument('rounds', type = int)
+  parser.add_argument('--cell', type = int, default = 0, help = 'lane (cell of round 0)')
+  parser.add_argument('--chunk', type = int, default = 1 << 20, help = 'candidates per bitsliced batch')
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  count = lanes(args.cipher, args.s, args.rounds, args.cell, args.chunk)
+  elapsed = time.perf_counter() - start
+  total = sum(count.values())
+  print('='*90)
+  print('|| {} TK{}, lane {}, rounds 0..{}: {} differences ({:.3f} s, {:.1f} M/s) ||'.format(
+    args.cipher, args.s, args.cell, args.rounds, total, elapsed, total / elapsed / 1e6))
+  print('-'*90)
+  for k in sorted(count):
+    print('|| {:2} cancelled rounds | {:10} differences ||'.format(k, count[k]))
+  print('='*90)
@@ -0,0 +1,156 @@
+import argparse
+import ast
+import contextlib
+import os
+
+import gurobipy as gp
+
+from ib_tools import cache
+from ib_tools.models import load_class
+
+'''
+=====================================================================
+Staged solve of the multi-objective models (Tc > T32 > Dc > Mc ...)
+  Gurobi's hierarchical solve has no budget per objective, a stalled
+  low priority pass holds the result of the passes before it.
+  1. Read the objectives of the built model, one stage per priority
+     (objectives of the same priority are blended with their weights)
+  2. Solve the stages in decreasing priority, each with its own
+     parameters (TimeLimit, MIPGap, ...)
+  3. Fix the incumbent of stage k as a bound (with the ObjNAbsTol/
+     ObjNRelTol degradation of Gurobi) and warm-start stage k+1
+  NOTE: the bound is the incumbent, not the proven optimum, of a stage
+        stopped by its budget
+  NOTE: the objectives of the model are restored at the end (which
+        discards the solution), the incumbent of every stage is
+        reported by `report` and/or written as .sol
+=====================================================================
+'''
+
+def objectives(model):
+  ''' [(priority, weight, abstol, reltol, name, LinExpr)] of the objectives of the model '''
+  model.update()
+  objs = []
+  for i in range(model.NumObj):
+    model.params.ObjNumber = i
+    objs.append((model.ObjNPriority, model.ObjNWeight, model.ObjNAbsTol, model.ObjNRelTol, model.ObjNName,
+                 model.getObjective(index = i)))
+  return objs
+
+
+def stages(objs):
+  ''' Objectives grouped by priority, highest priority first '''
+  priorities = sorted({obj[0] for obj in objs}, reverse = True)
+  return [[obj for obj in objs if obj[0] == p] for p in priorities]
+
+
+def _restore(model, objs, bounds):
+  model.remove(bounds)
+  model.NumObj = 0
+  model.update()
+  for i, (priority, weight, abstol, reltol, name, expr) in enumerate(objs):
+    model.setObjectiveN(expr, index = i, priority = priority, weight = weight, abstol = abstol, reltol = reltol, name = name)
+  model.update()
+
+
+def solve_staged(model, budgets = None, stop = None, report = None, sol_prefix = None):
+  '''
+  Solve the stages of a built multi-objective model one after the other.
+  budgets:    [{param: value}] per stage (e.g. [{'TimeLimit': 3600}, {'TimeLimit': 600, 'MIPGap': 0.01}]),
+              a missing/None entry keeps the parameters of the model
+  stop:       callback factory of the first stage, e.g. ib.stop_at_T4
+  report:     report(k, model) called with the incumbent of stage k (e.g. to keep ib.result())
+  sol_prefix: write the incumbent of stage k to <sol_prefix>_stage<k>.sol
+  Return one row (dict) per solved stage, the values of all objectives at its incumbent included.
+  NOTE: stops at the first stage without solution (infeasible, budget hit before an incumbent)
+  '''
+  budgets = budgets or []
+  objs = objectives(model)
+  sense = model.ModelSense
+  variables = model.getVars()
+  bounds, rows = [], []
+  try:
+    for k, stage in enumerate(stages(objs)):
+      model.NumObj = 0
+      model.update()
+      model.setObjective(gp.quicksum(weight * expr for _, weight, _, _, _, expr in stage))
+      budget = (budgets[k] if k < len(budgets) else None) or {}
+      saved = {param: model.getParamInfo(param)[2] for param in budget}
+      for param, value in budget.items():
+        model.setParam(param, value)
+      try:
+        model.optimize(stop(model) if stop is not None and k == 0 else None)
+      finally:
+        for param, value in saved.items():
+          model.setParam(param, value)
+
+      row = {'stage': k, 'objectives': '+'.join(obj[4] for obj in stage), 'status': model.Status,
+             'time': round(model.Runtime, 1), 'value': None, 'bound': None}
+      if model.SolCount > 0:
+        row['value'], row['bound'] = model.ObjVal, model.ObjBound
+        row.update({name: expr.getValue() for _, _, _, _, name, expr in objs})
+      rows.append(row)
+      print('|| stage {} | {:24} | status = {:2} | value = {} | bound = {} | time = {} ||'.format(
+        k, row['objectives'], row['status'], row['value'], row['bound'], row['time']))
+      if model.SolCount == 0:
+        break
+      if report is not None:
+        report(k, model)
+      if sol_prefix is not None:
+        model.write('{}_stage{}.sol'.format(sol_prefix, k))
+
+      # Fix stage k (allowed degradation as in Gurobi's hierarchical solve), warm-start stage k+1
+      start = model.getAttr('X', variables)
+      _, _, abstol, reltol, _, _ = stage[0]
+      tol = max(abstol, reltol * abs(row['value']))
+      objective = gp.quicksum(weight * expr for _, weight, _, _, _, expr in stage)
+      bounds.append(model.addConstr(sense * objective <= sense * row['value'] + tol, name = 'stage{}'.format(k)))
+      model.setAttr('Start', variables, start)
+  finally:
+    _restore(model, objs, bounds)
+  return rows
+
+
+def print_table(rows):
+  names = [key for key in rows[0] if key not in ['stage', 'objectives', 'status', 'time', 'value', 'bound']] if rows else []
+  print('='*90)
+  print('|| stage | objectives               || status || ' + ' | '.join('{:>8}'.format(name[-8:]) for name in names) + ' || time(s) ||')
+  print('-'*90)
+  for row in rows:
+    print('|| {stage:5} | {objectives:24} || {status:6} || '.format(**row) +
+          ' | '.join('{:8}'.format('-' if row.get(name) is None else round(row[name], 2)) for name in names) +
+          ' || {:7} ||'.format(row['time']))
+  print('='*90)
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Staged solve of a multi-objective IB model (one budget per priority)')
+  parser.add_argument('entry', help = 'registered model (ib_tools.models), e.g. JandD_v2, SKINNYe_v4')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, e.g. 256 2 3 1 3 2 16 True')
+  parser.add_argument('--time', type = float, nargs = '+', default = [], help = 'TimeLimit of each stage (s)')
+  parser.add_argument('--gap', type = float, nargs = '+', default = [], help = 'MIPGap of each stage')
+  parser.add_argument('--threads', type = int, default = 0, help = 'Gurobi threads (0: all)')
+  parser.add_argument('--no-stop', action = 'store_true', help = 'do not stop the first stage at Tc == T4')
+  parser.add_argument('--cache', nargs = '?', const = cache.CACHE_DIR, default = None,
+                      help = 'reuse the built model (default dir: {})'.format(cache.CACHE_DIR))
+  parser.add_argument('--out', default = './staged', help = 'directory of the log/solutions')
+  args = parser.parse_args()
+
+  os.makedirs(args.out, exist_ok = True)
+  if args.cache is not None:
+    model = cache.load_model(args.entry, args.args, args.cache)[0]
+  else:
+    model = load_class(args.entry)(*args.args).ib_model(solve = False)
+  name = os.path.join(args.out, '{}_{}'.format(args.entry, '-'.join(map(str, args.args))))
+  model.setParam('LogFile', name + '.log')
+  model.setParam('Threads', args.threads)
+  budgets = [{} for _ in range(max(len(args.time), len(args.gap)))]
+  for k, value in enumerate(args.time):
+    budgets[k]['TimeLimit'] = value
+  for k, value in enumerate(args.gap):
+    budgets[k]['MIPGap'] = value
+  with open(name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    model.setParam('LogToConsole', 0)
+    rows = solve_staged(model, budgets, None if args.no_stop else load_class(args.entry).stop_at_T4, sol_prefix = name)
+  print_table(rows)
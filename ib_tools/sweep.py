@@ -0,0 +1,201 @@
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import functools
+import multiprocessing
+import os
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from ib_tools import cache
+from ib_tools.models import load_class
+
+'''
+=====================================================================
+Round-split sweep of IB_DandJ (Deoxys_and_Joltik/pattern/_IB_JandD.py)
+  1. Enumerate all (round_Eb, round_Eu, round_Em, round_El, round_Ef)
+     of a given total round number
+  2. Solve each (x, split) in a process pool (Threads per worker)
+     NOTE: jobs are submitted lazily with the best Tc found so far as
+           cutoff, dominated splits stop early (status INFEASIBLE)
+  3. Collect Tc/T32/Dc of all splits into one table
+=====================================================================
+'''
+
+def enumerate_splits(total_rounds, Eb_range = range(1, 4), Ef_range = range(1, 4), round_Em = 1):
+  '''
+  All splits with sum(split) == total_rounds.
+  NOTE: Em is the 1-r BCT layer in the middle, Eu and El need at least one round.
+  '''
+  splits = []
+  for rEb in Eb_range:
+    for rEf in Ef_range:
+      rDis = total_rounds - rEb - rEf - round_Em
+      for rEu in range(1, rDis):
+        splits.append((rEb, rEu, round_Em, rDis - rEu, rEf))
+  return splits
+
+
+def _collect(model, names = ('Tc', 'T32', 'Dc')):
+  row = {'status': model.Status, 'time': round(model.Runtime, 1)}
+  for name in names:
+    row[name] = model.getVarByName(name).X if model.SolCount > 0 else None
+  return row
+
+
+def _solve_split(entry, args, split, out_dir, threads, time_limit, Tc_cutoff = None, start = None, cache_dir = None):
+  ''' Worker: build and solve one split, Gurobi log and table go to out_dir (no .lp/.sol export, ib.export = None) '''
+  if cache_dir is not None:
+    return _solve_cached(entry, args, split, out_dir, threads, time_limit, Tc_cutoff, start, cache_dir)
+  ib = load_class(entry)(*args)
+  ib.name = os.path.join(out_dir, os.path.basename(ib.name) + '_' + '-'.join(str(r) for r in split) + '_x' + str(ib.tx))
+  with open(ib.name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    ib.model.setParam('LogToConsole', 0)
+    ib.model.setParam('LogFile', ib.name + '.log')
+    ib.model.setParam('Threads', threads)
+    if time_limit is not None:
+      ib.model.setParam('TimeLimit', time_limit)
+    try:
+      ib.ib_model(Tc_cutoff, start)
+    except gp.GurobiError:
+      pass # Gurobi error (e.g. license limits), the row has no solution
+  return _collect(ib.model)
+
+
+def _solve_cached(entry, args, split, out_dir, threads, time_limit, Tc_cutoff, start, cache_dir):
+  ''' Worker: same as _solve_split with the built model of ib_tools.cache (no printed table) '''
+  name = os.path.join(out_dir, '{}_{}_x{}'.format(entry, '-'.join(str(r) for r in split), args[-2]))
+  with open(name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    model = cache.load_model(entry, args, cache_dir)[0]
+    model.setParam('LogToConsole', 0)
+    model.setParam('LogFile', name + '.log')
+    model.setParam('Threads', threads)
+    if time_limit is not None:
+      model.setParam('TimeLimit', time_limit)
+    if Tc_cutoff is not None:
+      model.getVarByName('Tc').UB = Tc_cutoff
+    if start is not None:
+      model.read(start)
+    try:
+      model.optimize(load_class(entry).stop_at_T4(model))
+    except gp.GurobiError:
+      pass
+  return _collect(model)
+
+
+def solve_pool(jobs, workers, Tc_cutoff = None, prune = True):
+  '''
+  Solve the jobs (key, worker, args) in a process pool, worker(*args, cutoff) returns a row (dict with 'Tc').
+  prune: pass the best Tc so far as cutoff to the next jobs
+  Yield (key, cutoff, row) in the order the jobs finish.
+  '''
+  jobs = iter(jobs)
+  best = Tc_cutoff
+  # NOTE: spawn, a forked Gurobi environment is not safe
+  with concurrent.futures.ProcessPoolExecutor(workers, mp_context = multiprocessing.get_context('spawn')) as pool:
+    futures = {}
+
+    def submit():
+      ''' Submit the next job with the current cutoff, False if there is none left '''
+      job = next(jobs, None)
+      if job is None:
+        return False
+      key, worker, args = job
+      cutoff = best if prune else None
+      futures[pool.submit(worker, *args, cutoff)] = (key, cutoff)
+      return True
+
+    # NOTE: keep only `workers` jobs in flight, so that every new job gets the latest cutoff
+    for _ in range(workers):
+      if not submit():
+        break
+    while futures:
+      done, _ = concurrent.futures.wait(futures, return_when = concurrent.futures.FIRST_COMPLETED)
+      for future in done:
+        key, cutoff = futures.pop(future)
+        row = future.result()
+        if row['Tc'] is not None and (best is None or row['Tc'] < best):
+          best = row['Tc']
+        yield key, cutoff, row
+        submit()
+
+
+def sweep(key_size, total_rounds, setX, pgP, workers = None, threads = 1, out_dir = './sweep',
+          time_limit = None, prune = True, Tc_cutoff = None, start = None, cache_dir = None, **split_range):
+  '''
+  Solve all splits of IB_DandJ(key_size, *split, x, pgP) for every x in setX (int or list) in parallel.
+  prune:     pass the best Tc so far to the next jobs (a split that cannot reach it is pruned)
+  Tc_cutoff: initial cutoff (e.g. best Tc of a previous sweep)
+  start:     .sol used as (partial) MIP start of every split
+  cache_dir: load/store the built models in this cache (ib_tools.cache)
+  Return one row (dict) per (x, split), sorted by Tc.
+  '''
+  assert(key_size in [128, 192, 256, 384]), 'ERROR: key_size not in Joltik-BC/Deoxys-BC'
+  if workers is None:
+    workers = max(1, os.cpu_count() // threads)
+  os.makedirs(out_dir, exist_ok = True)
+
+  setX = [setX] if isinstance(setX, int) else list(setX)
+  worker = functools.partial(_solve_split, start = start, cache_dir = cache_dir)
+  jobs = (((x, split), worker, ('JandD', (key_size, *split, x, pgP), split, out_dir, threads, time_limit))
+          for x in setX for split in enumerate_splits(total_rounds, **split_range))
+  rows = []
+  for (x, split), cutoff, result in solve_pool(jobs, workers, Tc_cutoff, prune):
+    row = {'x': x, **dict(zip(['Eb', 'Eu', 'Em', 'El', 'Ef'], split)), 'cutoff': cutoff}
+    row.update(result)
+    rows.append(row)
+    pruned = row['status'] == GRB.INFEASIBLE and cutoff is not None
+    print('|| x = {:4} | {:17} | status = {:2} | Tc = {} ||{}'.format(
+      x, str(split), row['status'], row['Tc'], ' pruned (Tc > {})'.format(cutoff) if pruned else ''))
+  rows.sort(key = lambda row: (row['Tc'] is None, row['Tc'], row['T32']))
+  return rows
+
+
+def print_table(rows):
+  print('='*90)
+  print('||   x  | Eb | Eu | Em | El | Ef || status ||     Tc     |     T32    |     Dc     || time(s) ||')
+  print('-'*90)
+  for row in rows:
+    print('|| {x:4} | {Eb:2} | {Eu:2} | {Em:2} | {El:2} | {Ef:2} || {status:6} || '.format(**row) +
+          ' | '.join('{:10}'.format('-' if row[k] is None else round(row[k], 2)) for k in ['Tc', 'T32', 'Dc']) +
+          ' || {:7} ||'.format(row['time']))
+  print('='*90)
+
+
+def write_table(rows, path):
+  ''' .csv of the rows (columns: the keys of the first row) '''
+  # NOTE: no row (e.g. a round total without a valid split), no file
+  if not rows:
+    return
+  with open(path, 'w', newline = '') as f:
+    writer = csv.DictWriter(f, fieldnames = list(rows[0].keys()))
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Round-split sweep of IB_DandJ')
+  parser.add_argument('key_size', type = int, help = '128/192 (Joltik-BC), 256/384 (Deoxys-BC)')
+  parser.add_argument('rounds', type = int, help = 'total number of rounds')
+  parser.add_argument('setX', type = int, nargs = '+', help = 'one or more x')
+  parser.add_argument('--pgP', action = 'store_true', help = 'chosen plaintext (default: chosen ciphertext)')
+  parser.add_argument('--workers', type = int, default = None, help = 'default: cpu_count // threads')
+  parser.add_argument('--threads', type = int, default = 1, help = 'Gurobi threads per worker')
+  parser.add_argument('--time-limit', type = float, default = None, help = 'per split (s)')
+  parser.add_argument('--max-Eb', type = int, default = 3)
+  parser.add_argument('--max-Ef', type = int, default = 3)
+  parser.add_argument('--no-prune', action = 'store_true', help = 'solve every split to optimality')
+  parser.add_argument('--cutoff', type = float, default = None, help = 'initial Tc cutoff')
+  parser.add_argument('--start', default = None, help = '.sol as MIP start of every split')
+  parser.add_argument('--cache', nargs = '?', const = cache.CACHE_DIR, default = None,
+                      help = 'reuse the built models (default dir: {})'.format(cache.CACHE_DIR))
+  parser.add_argument('--out', default = './sweep', help = 'directory of the logs/table')
+  args = parser.parse_args()
+
+  rows = sweep(args.key_size, args.rounds, args.setX, args.pgP, args.workers, args.threads, args.out, args.time_limit,
+               not args.no_prune, args.cutoff, args.start, args.cache, Eb_range = range(1, args.max_Eb + 1), Ef_range = range(1, args.max_Ef + 1))
+  print_table(rows)
+  write_table(rows, os.path.join(args.out, 'sweep_{}_{}r_x{}.csv'.format(args.key_size, args.rounds, '-'.join(map(str, args.setX)))))
@@ -0,0 +1,171 @@
+import argparse
+import ast
+import contextlib
+import os
+import re
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from ib_tools import cache
+from ib_tools.models import load_class
+from ib_tools.pool import PATTERN
+from ib_tools.sweep import _collect, solve_pool, write_table
+
+'''
+=====================================================================
+Two-level search: distinguisher first, key recovery second
+  1. Distinguisher level: the joint model with only the distinguisher
+     variables integral (DISTINGUISHER: the truncated trails of
+     ib_tools.pool.PATTERN, upper and lower case, the key
+     cancellations stk/can and the contradiction cFF), the key
+     recovery variables (Det, Fr, Gstk, Type, counts, ...) are
+     relaxed. Its solution pool (PoolSearchMode 2) gives the top-k
+     distinct distinguishers (solutions differing only in relaxed
+     variables are one distinguisher for the pool)
+  2. Key-recovery level: the joint model with the distinguisher of one
+     candidate fixed, the candidates are solved in a process pool in
+     increasing relaxed Tc, with the best Tc so far as cutoff
+  3. Best candidate. It is the optimum of the joint model if every
+     candidate is solved and its Tc is <= the bound of the
+     distinguishers not enumerated (PoolObjBound)
+  NOTE: the generators build the distinguisher and the key recovery in
+        one ib_model(), the first level relaxes the key recovery of the
+        joint model instead of building a separate small model
+  NOTE: the trail variables also cover the Eb/Ef extension of the
+        distinguisher, it is fixed with it
+=====================================================================
+'''
+
+DISTINGUISHER = PATTERN + r'|^[ul](stk|can)\d?\[|^cFF\['
+
+def candidates(model, k, pattern = DISTINGUISHER):
+  '''
+  Top-k distinguishers of the built model with the key recovery relaxed.
+  Return ([(relaxed Tc, active distinguisher variables)] in increasing relaxed Tc, lower bound of Tc of the other distinguishers)
+  NOTE: the model is modified (relaxed, single objective Tc), use a copy to keep it
+  '''
+  model.update()
+  trail = [re.match(pattern, v.VarName) is not None for v in model.getVars()]
+  for v, is_trail in zip(model.getVars(), trail):
+    if not is_trail and v.VType != GRB.CONTINUOUS:
+      v.VType = GRB.CONTINUOUS
+  model.NumObj = 0
+  model.update()
+  model.setObjective(model.getVarByName('Tc'))
+  model.setParam('PoolSearchMode', 2)
+  model.setParam('PoolSolutions', k)
+  model.optimize()
+  found = []
+  variables = [v for v, is_trail in zip(model.getVars(), trail) if is_trail]
+  for n in range(model.SolCount):
+    model.setParam('SolutionNumber', n)
+    active = [v.VarName for v, value in zip(variables, model.getAttr('Xn', variables)) if value > 0.5]
+    found.append((model.PoolObjVal, active))
+  found.sort(key = lambda c: c[0])
+  # NOTE: fewer than k solutions at the optimum, every distinguisher is enumerated
+  rest = float('inf') if model.Status == GRB.OPTIMAL and model.SolCount < k else model.PoolObjBound
+  return found, rest
+
+
+def _solve_candidate(entry, args, active, out_dir, name, threads, time_limit, cache_dir, pattern, Tc_cutoff = None):
+  ''' Worker: the joint model with the distinguisher variables fixed to active, the solution is written to <name>.sol '''
+  name = os.path.join(out_dir, name)
+  with open(name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    if cache_dir is not None:
+      model = cache.load_model(entry, args, cache_dir)[0]
+    else:
+      model = load_class(entry)(*args).ib_model(solve = False)
+    model.setParam('LogToConsole', 0)
+    model.setParam('LogFile', name + '.log')
+    model.setParam('Threads', threads)
+    if time_limit is not None:
+      model.setParam('TimeLimit', time_limit)
+    active = set(active)
+    for v in model.getVars():
+      if re.match(pattern, v.VarName):
+        v.LB = v.UB = 1 if v.VarName in active else 0
+    if Tc_cutoff is not None:
+      model.getVarByName('Tc').UB = Tc_cutoff
+    try:
+      model.optimize(load_class(entry).stop_at_T4(model))
+    except gp.GurobiError:
+      pass
+    row = _collect(model)
+    if model.SolCount > 0:
+      model.write(name + '.sol')
+  return row
+
+
+def two_level(entry, args, k = 16, workers = None, threads = 1, out_dir = './twolevel', time_limit = None,
+              cache_dir = None, pattern = DISTINGUISHER):
+  '''
+  Two-level search of load_class(entry)(*args) over the top-k distinguishers.
+  Return (one row (dict) per solved candidate sorted by Tc, True if the first row is the optimum of the joint model)
+  '''
+  if workers is None:
+    workers = max(1, os.cpu_count() // threads)
+  os.makedirs(out_dir, exist_ok = True)
+  base = '{}_{}'.format(entry, '-'.join(map(str, args)))
+
+  # 1. Distinguisher level
+  if cache_dir is not None:
+    model = cache.load_model(entry, args, cache_dir)[0]
+  else:
+    model = load_class(entry)(*args).ib_model(solve = False)
+  model.setParam('LogToConsole', 0)
+  model.setParam('LogFile', os.path.join(out_dir, base + '_trails.log'))
+  if time_limit is not None:
+    model.setParam('TimeLimit', time_limit)
+  found, rest = candidates(model, k, pattern)
+  print('|| {} candidate distinguishers, Tc >= {} for the others ||'.format(len(found), rest))
+
+  # 2. Key-recovery level
+  # NOTE: a pruned candidate (INFEASIBLE with cutoff) cannot beat the best Tc
+  jobs = (((c, relaxed), _solve_candidate, (entry, args, active, out_dir, '{}_c{}'.format(base, c), threads, time_limit,
+                                            cache_dir, pattern)) for c, (relaxed, active) in enumerate(found))
+  rows = []
+  for (c, relaxed), cutoff, result in solve_pool(jobs, workers):
+    row = {'candidate': c, 'relaxed': relaxed, 'cutoff': cutoff}
+    row.update(result)
+    rows.append(row)
+    print('|| candidate {:3} | relaxed Tc = {} | status = {:2} | Tc = {} ||'.format(c, relaxed, row['status'], row['Tc']))
+
+  # 3. Best candidate
+  rows.sort(key = lambda row: (row['Tc'] is None, row['Tc'], row['T32']))
+  optimal = (bool(rows) and rows[0]['Tc'] is not None and rows[0]['Tc'] <= rest and
+             all(row['status'] in [GRB.OPTIMAL, GRB.INFEASIBLE] for row in rows))
+  return rows, optimal
+
+
+def print_table(rows, optimal):
+  print('='*90)
+  print('|| candidate |  relaxed   || status ||     Tc     |     T32    |     Dc     || time(s) ||')
+  print('-'*90)
+  for row in rows:
+    print('|| {candidate:9} | {relaxed:10.2f} || {status:6} || '.format(**row) +
+          ' | '.join('{:10}'.format('-' if row[k] is None else round(row[k], 2)) for k in ['Tc', 'T32', 'Dc']) +
+          ' || {:7} ||'.format(row['time']))
+  print('-'*90)
+  print('|| best: {} ||'.format('optimum of the joint model' if optimal else 'not proven optimal (increase k)'))
+  print('='*90)
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Two-level search: top-k distinguishers, then key recovery of each one')
+  parser.add_argument('entry', help = 'registered model (ib_tools.models), e.g. JandD, SKINNYe_v4')
+  parser.add_argument('args', type = ast.literal_eval, nargs = '+', help = 'constructor arguments, e.g. 256 2 3 1 3 2 16 True')
+  parser.add_argument('-k', type = int, default = 16, help = 'number of candidate distinguishers')
+  parser.add_argument('--workers', type = int, default = None, help = 'default: cpu_count // threads')
+  parser.add_argument('--threads', type = int, default = 1, help = 'Gurobi threads per worker')
+  parser.add_argument('--time-limit', type = float, default = None, help = 'per solve (s)')
+  parser.add_argument('--cache', nargs = '?', const = cache.CACHE_DIR, default = None,
+                      help = 'reuse the built models (default dir: {})'.format(cache.CACHE_DIR))
+  parser.add_argument('--out', default = './twolevel', help = 'directory of the logs/solutions/table')
+  args = parser.parse_args()
+
+  rows, optimal = two_level(args.entry, args.args, args.k, args.workers, args.threads, args.out, args.time_limit, args.cache)
+  print_table(rows, optimal)
+  if rows:
+    write_table(rows, os.path.join(args.out, 'twolevel_{}_{}.csv'.format(args.entry, '-'.join(map(str, args.args)))))
@@ -0,0 +1,326 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from ib_tools.bct import AES_POLY, contradictions, mul_table
+from ib_tools.models import ROOT
+from ib_tools.schedule import LFSR2, LFSR3, h
+
+'''
+=====================================================================
+Native related-tweakey instantiation checker of Deoxys-BC (replaces
+the CP solve of Deoxys*_*r.mzn)
+  Pattern: the conditions of the MODEL part of a verification model
+    stk:  ustk/lstk[r, c] = 0 or >= 1
+    _MC:  stk[r+1, col] = MC(dz[r, col]), i.e. dz = MC^-1(stk[r+1])
+    dz:   dz[r, c] = 0 or >= 1 (cells of the _MC columns, the other
+          dz cells are free in the model)
+    BCT:  dz[r, c] in contr_BCT_table[ustk/lstk[r', c']]
+  Schedule (uint8 arrays, upper and lower tweakey):
+    tk1[r+1, c] = tk1[r, h[c]], tk2[r+1, c] = LFSR2(tk2[r, h[c]]),
+    tk3[r+1, c] = LFSR3(tk3[r, h[c]]), stk[r] = tk1 ^ tk2 (^ tk3)
+  1. Kernel: stk and dz are GF(2)-linear in the bits of the round-0
+     tweakey differences, the "= 0" conditions are a linear system
+     (evaluated on the unit vectors, Gaussian elimination)
+  2. Batches: random (or all, small kernel) elements of the kernel,
+     schedule and MC^-1 (GF(2^8) multiplication tables) on uint8
+     arrays, the ">= 1" and BCT conditions checked for the batch
+  NOTE: a kernel of dimension <= exhaustive is enumerated completely,
+        no instantiation found is then a proof; a larger one is
+        sampled (not found after max_batches is not a proof)
+=====================================================================
+'''
+
+TRAILS = ['u', 'l']
+INV_MC = [[14, 11, 13, 9], [9, 14, 11, 13], [13, 9, 14, 11], [11, 13, 9, 14]]
+
+MUL = {c: mul_table(c, AES_POLY, 8).astype(np.uint8) for c in [9, 11, 13, 14]}
+
+
+class Pattern:
+  '''
+  Conditions of a verification model:
+    s, rounds (tR)
+    stk  {(trail, r, c): active}, trail 'u'/'l', active False: = 0, True: >= 1
+    mc   [(trail, r, col)]
+    dz   {(r, c): active}
+    bct  [((r, c) of dz, (trail, r, c) of stk)]
+  '''
+
+  def __init__(self, s, rounds, stk = None, mc = None, dz = None, bct = None):
+    self.s, self.rounds = s, rounds
+    self.stk, self.mc, self.dz, self.bct = stk or {}, mc or [], dz or {}, bct or []
+
+  def __repr__(self):
+    return 'Pattern(TK{}, {} rounds, {} stk, {} MC, {} dz, {} BCT conditions)'.format(
+      self.s, self.rounds, len(self.stk), len(self.mc), len(self.dz), len(self.bct))
+
+
+def _cells(text):
+  ''' [4,9,14] or 0..15 -> list of cells '''
+  if '..' in text:
+    low, high = text.split('..')
+    return list(range(int(low), int(high) + 1))
+  return [int(c) for c in text.strip('[] ').split(',')]
+
+
+def _active(op, value, atom):
+  if (op, value) not in [('=', 0), ('>=', 1)]:
+    raise ValueError('unsupported condition: {}'.format(atom))
+  return op == '>='
+
+
+def _conjuncts(text):
+  ''' Split a /\\ b /\\ ... outside the parentheses '''
+  parts, depth, start = [], 0, 0
+  for i, ch in enumerate(text):
+    depth += {'(': 1, '[': 1, ')': -1, ']': -1}.get(ch, 0)
+    if depth == 0 and text.startswith('/\\', i):
+      parts.append(text[start:i])
+      start = i + 2
+  return [part.strip() for part in parts + [text[start:]]]
+
+
+def read_pattern(path):
+  ''' Pattern of the MODEL part of a verification model (Deoxys*.mzn) '''
+  with open(path) as f:
+    text = re.sub(r'%[^\n]*', '', f.read())
+  s = int(re.search(r'\bint:\s*s\s*=\s*(\d+)', text).group(1))
+  rounds = int(re.search(r'\bint:\s*tR\s*=\s*(\d+)', text).group(1))
+  pattern = Pattern(s, rounds)
+  for statement in text.split(';'):
+    statement = statement.strip()
+    if not statement.startswith('constraint'):
+      continue
+    body = statement[len('constraint'):].strip()
+    # NOTE: the schedule, bin to int, ... are forall(r ...)/forall(i ...)
+    if re.match(r'forall\s*\(\s*[ri]\s+in', body):
+      continue
+    for part in _conjuncts(body):
+      loop = re.fullmatch(r'forall\s*\(\s*c\s+in\s+([^)]*?)\s*\)\s*\((.*)\)', part, re.S)
+      cells, part = (_cells(loop.group(1)), loop.group(2)) if loop else ([None], part)
+      for c in cells:
+        for atom in _conjuncts(part):
+          atom = re.sub(r'\bc\b', str(c), atom) if c is not None else atom
+          m = re.fullmatch(r'([ul])stk_int\[(\d+),\s*(\d+)\]\s*(>=|=)\s*(\d+)', atom)
+          if m:
+            pattern.stk[(m.group(1), int(m.group(2)), int(m.group(3)))] = _active(m.group(4), int(m.group(5)), atom)
+            continue
+          m = re.fullmatch(r'dz_int\[(\d+),\s*(\d+)\]\s*(>=|=)\s*(\d+)', atom)
+          if m:
+            pattern.dz[(int(m.group(1)), int(m.group(2)))] = _active(m.group(3), int(m.group(4)), atom)
+            continue
+          m = re.fullmatch(r'_MC\(\s*(\d+)\s*,\s*(\d+)\s*,\s*dz_int\s*,\s*dz\s*,\s*([ul])stk\s*\)', atom)
+          if m:
+            pattern.mc.append((m.group(3), int(m.group(1)), int(m.group(2))))
+            continue
+          m = re.fullmatch(r'dz_int\[(\d+),\s*(\d+)\]\s*in\s*\[\s*contr_BCT_table\[([ul])stk_int\[(\d+),\s*(\d+)\]\s*,\s*i\].*', atom)
+          if m:
+            pattern.bct.append(((int(m.group(1)), int(m.group(2))), (m.group(3), int(m.group(4)), int(m.group(5)))))
+            continue
+          raise ValueError('unsupported constraint in {}: {}'.format(path, atom))
+  # NOTE: evaluate() only defines the dz of the _MC columns, another BCT condition would always fail
+  covered = _covered(pattern)
+  for (r, c), _ in pattern.bct:
+    if (r, c) not in covered:
+      raise ValueError('BCT condition on dz_int[{},{}] not defined by a _MC in {}'.format(r, c, path))
+  return pattern
+
+
+def schedule(tk, rounds):
+  '''
+  tk uint8 [batch, s, 16] (TK1, TK2, (TK3) differences of round 0) -> stk uint8 [batch, rounds + 1, 16]
+  '''
+  tk = np.array(tk, dtype = np.uint8)
+  stk = np.empty((len(tk), rounds + 1, 16), dtype = np.uint8)
+  for r in range(rounds + 1):
+    stk[:, r] = np.bitwise_xor.reduce(tk, axis = 1)
+    tk = tk[:, :, h]
+    tk[:, 1] = LFSR2[tk[:, 1]]
+    if tk.shape[1] > 2:
+      tk[:, 2] = LFSR3[tk[:, 2]]
+  return stk
+
+
+def inv_mix_column(column):
+  ''' MC^-1 of the columns uint8 [..., 4] '''
+  out = np.zeros_like(column)
+  for i, row in enumerate(INV_MC):
+    for j, c in enumerate(row):
+      out[..., i] ^= MUL[c][column[..., j]]
+  return out
+
+
+def evaluate(tk, pattern):
+  '''
+  tk uint8 [batch, 2, s, 16] (upper, lower) -> (stk uint8 [batch, 2, rounds + 1, 16],
+  dz uint8 [batch, rounds, 16], 0 outside the _MC columns)
+  '''
+  stk = np.stack([schedule(tk[:, t], pattern.rounds) for t in range(2)], axis = 1)
+  dz = np.zeros((len(tk), pattern.rounds, 16), dtype = np.uint8)
+  for trail, r, col in pattern.mc:
+    dz[:, r, 4*col:4*col + 4] = inv_mix_column(stk[:, TRAILS.index(trail), r + 1, 4*col:4*col + 4])
+  return stk, dz
+
+
+def _covered(pattern):
+  ''' dz cells defined by a _MC '''
+  return {(r, 4*col + i) for _, r, col in pattern.mc for i in range(4)}
+
+
+def _zeros(stk, dz, pattern):
+  ''' uint8 [batch, k]: the cells that must be 0 (linear in tk) '''
+  out = [stk[:, TRAILS.index(t), r, c] for (t, r, c), active in pattern.stk.items() if not active]
+  covered = _covered(pattern)
+  out += [dz[:, r, c] for (r, c), active in pattern.dz.items() if not active and (r, c) in covered]
+  # NOTE: two _MC of the same dz column (upper and lower) make the two stk columns equal
+  seen = {}
+  for t, r, col in pattern.mc:
+    if (r, col) in seen and seen[(r, col)] != t:
+      out += [stk[:, 0, r + 1, 4*col + i] ^ stk[:, 1, r + 1, 4*col + i] for i in range(4)]
+    seen[(r, col)] = t
+  return np.stack(out, axis = 1) if out else np.zeros((len(stk), 0), dtype = np.uint8)
+
+
+def _nonzeros(stk, dz, pattern):
+  ''' uint8 [batch, k]: the cells that must be >= 1 '''
+  out = [stk[:, TRAILS.index(t), r, c] for (t, r, c), active in pattern.stk.items() if active]
+  covered = _covered(pattern)
+  out += [dz[:, r, c] for (r, c), active in pattern.dz.items() if active and (r, c) in covered]
+  return np.stack(out, axis = 1) if out else np.zeros((len(stk), 0), dtype = np.uint8)
+
+
+def satisfied(tk, pattern, table = None):
+  ''' bool [batch]: the instantiations tk uint8 [batch, 2, s, 16] satisfying every condition of the pattern '''
+  if table is None:
+    table = contradictions('Deoxys')
+  stk, dz = evaluate(tk, pattern)
+  ok = (_zeros(stk, dz, pattern) == 0).all(axis = 1) & (_nonzeros(stk, dz, pattern) != 0).all(axis = 1)
+  for (r, c), (t, r2, c2) in pattern.bct:
+    ok &= table[stk[:, TRAILS.index(t), r2, c2], dz[:, r, c]]
+  return ok
+
+
+def _unit(pattern):
+  ''' uint8 [n, 2, s, 16]: the n = 2*s*128 unit vectors (bit i % 8 of byte i // 8) '''
+  n = 2 * pattern.s * 16 * 8
+  bits = np.eye(n, dtype = np.uint8)
+  return np.packbits(bits, axis = 1, bitorder = 'little').reshape(n, 2, pattern.s, 16)
+
+
+def nullspace(M):
+  ''' Basis uint8 [d, n] of {x : M x = 0} over GF(2), M [m, n] '''
+  M = (np.asarray(M) & 1).astype(bool)
+  m, n = M.shape
+  pivots = []
+  for col in range(n):
+    row = len(pivots)
+    if row == m:
+      break
+    hits = np.nonzero(M[row:, col])[0]
+    if not len(hits):
+      continue
+    M[[row, row + hits[0]]] = M[[row + hits[0], row]]
+    mask = M[:, col].copy()
+    mask[row] = False
+    M[mask] ^= M[row]
+    pivots.append(col)
+  free = [c for c in range(n) if c not in set(pivots)]
+  basis = np.zeros((len(free), n), dtype = np.uint8)
+  for i, f in enumerate(free):
+    basis[i, f] = 1
+    basis[i, pivots] = M[:len(pivots), f]
+  return basis
+
+
+def kernel(pattern):
+  ''' Basis uint8 [d, 2*s*128] of the tweakey bits satisfying the "= 0" conditions '''
+  unit = _unit(pattern)
+  stk, dz = evaluate(unit, pattern)
+  zeros = _zeros(stk, dz, pattern)
+  # NOTE: row (cell k, bit b) of the system = bit b of the image of each unit vector
+  M = np.unpackbits(zeros[:, :, np.newaxis], axis = 2, bitorder = 'little').reshape(len(unit), -1).T
+  return nullspace(M)
+
+
+def find(pattern, batch = 1 << 14, max_batches = 64, exhaustive = 20, seed = 0):
+  '''
+  First instantiation of the pattern.
+  Return (tk uint8 [2, s, 16] (upper, lower tweakey differences of round 0) or None,
+  stats {'dim', 'tried', 'exhaustive'}), exhaustive True: None is a proof
+  '''
+  basis = kernel(pattern)
+  d = len(basis)
+  table = contradictions('Deoxys')
+  stats = {'dim': d, 'tried': 0, 'exhaustive': d <= exhaustive}
+  shape = (2, pattern.s, 16)
+  # NOTE: the kernel is {0}, the zero tweakey is the only candidate
+  if d == 0:
+    tk = np.zeros((1,) + shape, dtype = np.uint8)
+    stats['tried'] = 1
+    return (tk[0] if satisfied(tk, pattern, table)[0] else None), stats
+  # NOTE: a ">= 1" cell zero on every basis vector is zero on the whole kernel
+  stk, dz = evaluate(np.packbits(basis, axis = 1, bitorder = 'little').reshape((d,) + shape), pattern)
+  if (_nonzeros(stk, dz, pattern) == 0).all(axis = 0).any():
+    stats['exhaustive'] = True
+    return None, stats
+  rng = np.random.default_rng(seed)
+  total = 1 << d if stats['exhaustive'] else batch * max_batches
+  for start in range(0, total, batch):
+    if stats['exhaustive']:
+      idx = np.arange(start, min(start + batch, total), dtype = np.int64)
+      coefs = ((idx[:, np.newaxis] >> np.arange(d)) & 1).astype(np.float32)
+    else:
+      coefs = rng.integers(0, 2, (batch, d)).astype(np.float32)
+    bits = (coefs @ basis.astype(np.float32)).astype(np.int64) & 1
+    tk = np.packbits(bits.astype(np.uint8), axis = 1, bitorder = 'little').reshape((len(bits),) + shape)
+    ok = satisfied(tk, pattern, table)
+    stats['tried'] += len(tk)
+    hits = np.nonzero(ok)[0]
+    if len(hits):
+      return tk[hits[0]], stats
+  return None, stats
+
+
+def print_instantiation(tk, pattern):
+  stk, dz = evaluate(tk[np.newaxis], pattern)
+  print('='*90)
+  for t, trail in enumerate(TRAILS):
+    for k in range(pattern.s):
+      print('|| {}tk{}[0]: {} ||'.format(trail, k + 1, ' '.join('{:3}'.format(v) for v in tk[t, k])))
+  print('-'*90)
+  rounds = sorted({(t, r) for t, r, _ in pattern.stk} | {(t, r + 1) for t, r, _ in pattern.mc} |
+                  {(t, r) for _, (t, r, _) in pattern.bct})
+  for trail, r in rounds:
+    print('|| {}stk[{:2}]: {} ||'.format(trail, r, ' '.join('{:3}'.format(v) for v in stk[0, TRAILS.index(trail), r])))
+  for r in sorted({r for _, r, _ in pattern.mc}):
+    print('|| dz[{:2}]:   {} ||'.format(r, ' '.join('{:3}'.format(v) for v in dz[0, r])))
+  print('='*90)
+
+
+if __name__ == '__main__':
+
+  MODELS = ['Deoxys_and_Joltik/verification/{}.mzn'.format(m)
+            for m in ['Deoxys256_10r', 'Deoxys256_11r', 'Deoxys384_13r', 'Deoxys384_14r']]
+  parser = argparse.ArgumentParser(description = 'Native related-tweakey instantiation checker of the Deoxys verification models')
+  parser.add_argument('models', nargs = '*', default = MODELS, help = 'verification models (default: the Deoxys*.mzn)')
+  parser.add_argument('--batch', type = int, default = 1 << 14, help = 'candidate tweakeys per batch')
+  parser.add_argument('--max-batches', type = int, default = 64, help = 'batches sampled from a large kernel')
+  parser.add_argument('--exhaustive', type = int, default = 20, help = 'enumerate the kernels up to this dimension')
+  parser.add_argument('--seed', type = int, default = 0)
+  args = parser.parse_args()
+
+  for path in args.models:
+    start = time.perf_counter()
+    pattern = read_pattern(path if os.path.isabs(path) else os.path.join(ROOT, path))
+    tk, stats = find(pattern, args.batch, args.max_batches, args.exhaustive, args.seed)
+    elapsed = time.perf_counter() - start
+    print('|| {} | {} ||'.format(os.path.basename(path), pattern))
+    print('|| kernel dim {dim}, {tried} candidates, '.format(**stats) +
+          ('no instantiation{} ||'.format(' (proof)' if stats['exhaustive'] else '') if tk is None else 'found ||') +
+          ' ({:.3f} s)'.format(elapsed))
+    if tk is not None:
+      print_instantiation(tk, pattern)
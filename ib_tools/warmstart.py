@@ -0,0 +1,86 @@
+import argparse
+import re
+
+'''
+=====================================================================
+MIP starts from solved patterns (.sol)
+  ib.ib_model(start = 'xxx.sol') reads a .sol as MIP start, variables
+  are matched by name. When the round split differs, the round index
+  (first index, e.g. uDX[r,i]) of the old solution has to be shifted
+  before, e.g. one more round of Eb:
+    python -m ib_tools.warmstart old.sol new.sol --shift 1
+  Names without a match in the new model are ignored by Gurobi, the
+  partial start is completed by Gurobi (StartNodeLimit).
+=====================================================================
+'''
+
+_indexed = re.compile(r'^([^\[]+)\[(-?\d+),(.*)\]$')
+
+
+def read_sol(path):
+  ''' {name: value} of a .sol file (comment lines skipped) '''
+  sol = {}
+  with open(path) as f:
+    for line in f:
+      if line.startswith('#') or not line.strip():
+        continue
+      name, value = line.rsplit(None, 1)
+      sol[name] = float(value)
+  return sol
+
+
+def write_sol(sol, path, comment = None):
+  with open(path, 'w') as f:
+    if comment is not None:
+      f.write('# {}\n'.format(comment))
+    for name, value in sol.items():
+      f.write('{} {}\n'.format(name, int(value) if value == int(value) else value))
+
+
+def shift_rounds(sol, shift, prefixes = None, keep_scalar = True):
+  '''
+  Shift the round index of the variables X[r,...] by `shift`.
+  prefixes:    only shift the names starting with one of them (e.g. ['u'] for the upper trail),
+               the other indexed names are kept as they are
+  keep_scalar: keep the names without index (rb, mb', Tc, ...)
+  NOTE: the index -1 (input difference of Eb, e.g. uDW[-1,i]) is not a round and is kept.
+  '''
+  shifted = {}
+  for name, value in sol.items():
+    m = _indexed.match(name)
+    if m is None:
+      if keep_scalar:
+        shifted[name] = value
+      continue
+    var, r, rest = m.group(1), int(m.group(2)), m.group(3)
+    if r >= 0 and (prefixes is None or var.startswith(tuple(prefixes))):
+      r += shift
+    shifted['{}[{},{}]'.format(var, r, rest)] = value
+  return shifted
+
+
+def set_start(model, sol):
+  ''' Set the Start of the variables of model from {name: value}, return the number of matched names '''
+  model.update()
+  n = 0
+  for name, value in sol.items():
+    var = model.getVarByName(name)
+    if var is not None:
+      var.Start = value
+      n += 1
+  return n
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Shift the round index of a .sol for a MIP start of another split')
+  parser.add_argument('sol')
+  parser.add_argument('out')
+  parser.add_argument('--shift', type = int, default = 0, help = 'added to the round index')
+  parser.add_argument('--prefix', nargs = '+', default = None, help = 'only shift these names (e.g. u for the upper trail)')
+  parser.add_argument('--no-scalar', action = 'store_true', help = 'drop the non indexed variables (complexities, ...)')
+  args = parser.parse_args()
+
+  sol = shift_rounds(read_sol(args.sol), args.shift, args.prefix, not args.no_scalar)
+  write_sol(sol, args.out, 'MIP start from {} (round shift {})'.format(args.sol, args.shift))
+  print('{} values written to {}'.format(len(sol), args.out))
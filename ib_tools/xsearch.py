@@ -0,0 +1,109 @@
+import argparse
+import contextlib
+import math
+import os
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from ib_tools.models import load_class
+
+'''
+=====================================================================
+Search of x (setX/Vx) minimizing Tc for a given split
+  The model is built (and solved) once with x0, every other x only
+  changes the RHS of D/Dc, Qc, T32 and T4 (ib.set_x) and re-solves.
+  1. Bracket: step from x0 towards decreasing Tc, doubling the step,
+     until Tc increases
+  2. Bisect:  smallest x of the bracket with Tc(x) <= Tc(x+1)
+  NOTE: Tc(x) = max(terms increasing in x, k - x) is assumed unimodal,
+        on a plateau the smallest x (smallest D and T32) is kept
+=====================================================================
+'''
+
+def _Tc(model):
+  if model.SolCount > 0 and model.Status in [GRB.OPTIMAL, GRB.TIME_LIMIT, GRB.INTERRUPTED]:
+    return model.getVarByName('Tc').X
+  return math.inf
+
+
+def search_x(ib, x0, x_lo = 1, x_hi = None, step = 8, Tc_cutoff = None, start = None):
+  '''
+  ib:    generator instance built with x0 (ib_model() not yet called)
+  start: .sol used as MIP start of the first solve
+  Return (best x, its Tc, {x: Tc} of all solved x), the model is left solved with the best x.
+  '''
+  if x_hi is None:
+    x_hi = getattr(ib, 'key_size', None) or ib.k_size
+  try:
+    ib.ib_model(Tc_cutoff, start)
+  except gp.GurobiError:
+    pass # Gurobi error (e.g. license limits), no Tc with x0
+  Tc = {x0: _Tc(ib.model)}
+  current = [x0]
+
+  def f(x):
+    if x not in Tc:
+      ib.set_x(x)
+      ib.model.optimize(ib.stop_at_T4(ib.model) if ib.stop_T4 else None)
+      Tc[x] = _Tc(ib.model)
+      current[0] = x
+      print('|| x = {:4} | Tc = {} ||'.format(x, Tc[x]))
+    return Tc[x]
+
+  # 1. Bracket
+  d = 1 if x0 < x_hi and f(x0 + 1) < f(x0) else -1
+  a = b = x0
+  while True:
+    c = min(x_hi, max(x_lo, b + d * step))
+    if c == b or f(c) > f(b) or (d > 0 and f(c) == f(b)):
+      break
+    a, b, step = b, c, 2 * step
+  lo, hi = min(a, c), max(a, c)
+
+  # 2. Bisect
+  while lo < hi:
+    mid = (lo + hi) // 2
+    if f(mid) <= f(mid + 1):
+      hi = mid
+    else:
+      lo = mid + 1
+
+  best = min(Tc, key = lambda x: (Tc[x], x))
+  if current[0] != best:
+    ib.set_x(best)
+    ib.model.optimize(ib.stop_at_T4(ib.model) if ib.stop_T4 else None)
+  if ib.model.SolCount > 0:
+    ib.model.write(ib.name + '_x{}.sol'.format(best))
+  return best, Tc[best], Tc
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(description = 'Search of x for one split of IB_DandJ')
+  parser.add_argument('key_size', type = int, help = '128/192 (Joltik-BC), 256/384 (Deoxys-BC)')
+  parser.add_argument('split', type = int, nargs = 5, metavar = 'R', help = 'round_Eb round_Eu round_Em round_El round_Ef')
+  parser.add_argument('x0', type = int, help = 'initial x')
+  parser.add_argument('--pgP', action = 'store_true', help = 'chosen plaintext (default: chosen ciphertext)')
+  parser.add_argument('--step', type = int, default = 8, help = 'initial bracketing step')
+  parser.add_argument('--x-min', type = int, default = 1)
+  parser.add_argument('--x-max', type = int, default = None, help = 'default: key_size')
+  parser.add_argument('--threads', type = int, default = 0, help = 'Gurobi threads (0: all)')
+  parser.add_argument('--start', default = None, help = '.sol as MIP start')
+  parser.add_argument('--out', default = './xsearch', help = 'directory of the logs/solutions')
+  args = parser.parse_args()
+
+  os.makedirs(args.out, exist_ok = True)
+  ib = load_class('JandD')(args.key_size, *args.split, args.x0, args.pgP)
+  ib.name = os.path.join(args.out, os.path.basename(ib.name) + '_' + '-'.join(str(r) for r in args.split))
+  ib.model.setParam('LogFile', ib.name + '.log')
+  ib.model.setParam('Threads', args.threads)
+  with open(ib.name + '.out', 'w') as f, contextlib.redirect_stdout(f):
+    ib.model.setParam('LogToConsole', 0)
+    best, Tc, all_Tc = search_x(ib, args.x0, args.x_min, args.x_max, args.step, start = args.start)
+  print('='*40)
+  for x in sorted(all_Tc):
+    print('|| x = {:4} | Tc = {:8} ||'.format(x, round(all_Tc[x], 2)))
+  print('-'*40)
+  print('|| best x = {:4} | Tc = {:8} ||'.format(best, round(Tc, 2)))
+  print('='*40)